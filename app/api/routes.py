@@ -2,16 +2,32 @@ import os
 import uuid
 import json
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Depends, Header
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from celery.result import AsyncResult
-from app.tasks.processing_tasks import process_video
+from app.tasks.processing_tasks import ingest_upload_task, process_video
 from app.config import load_mockup_config  # A helper function to load your mockups configuration
 from app.config.logging import get_logger
-from app.services.storage import storage
+from minio.error import S3Error
+from app.services.storage import MISSING_OBJECT_CODES, storage
+from app.services.ingest import MezzanineNotReady, UploadNotFound, fetch_mezzanine
+from app.services.poster import POSTER_FORMATS, PosterRenderer
 from app.config.exceptions import APIError
+from app.config.quality import QUALITY_FULL, QUALITY_TIERS, quality_profile
+from app.config.renditions import RENDITIONS, parse_renditions
+from app.config.encoder_profiles import ENCODER_PROFILES
 
 router = APIRouter()
 
+# Shared by every poster request of this API process (see PosterRenderer).
+# Posters read the mezzanine built by the upload's ingest task, never
+# transcoding in the request (see fetch_mezzanine).
+poster_renderer = PosterRenderer(fetch_video=lambda key, path: fetch_mezzanine(key, storage, path))
+
+# Seconds a client should wait before asking again for a poster of an
+# upload that is still being ingested.
+POSTER_RETRY_AFTER = 2
+
 # API Key validation
 async def verify_token(x_api_key: str = Header(None)) -> None:
     """Verify the API key from the X-API-Key header."""
@@ -92,7 +108,10 @@ async def list_templates():
 async def submit_job(
     mockup_id: str = Form(...),
     scene_order: str = Form(...),  # Expected to be a JSON string
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    quality: str = Form(QUALITY_FULL),
+    renditions: str = Form(""),
+    encoder_profile: str = Form("")
 ):
     """
     Endpoint to submit a video processing job.
@@ -101,10 +120,39 @@ async def submit_job(
       - mockup_id: Identifier for the desired mockup.
       - scene_order: JSON string specifying the scene order and timings.
       - file: The user's source video file.
+      - quality: "full" (default) or "preview" for a fast low-resolution
+        draft, rendered on its own worker queue.
+      - renditions: Optional comma-separated output renditions (e.g.
+        "1080p,720p,teaser_webm"), all encoded from one composite pass.
+        Without it the job delivers one full-size MP4.
+      - encoder_profile: Optional named encoder settings (e.g. "fast" or
+        "archive"); defaults to the mockup's, then the server's.
     
     Returns:
       A JSON response containing the job ID.
     """
+    if quality not in QUALITY_TIERS:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_QUALITY",
+            detail=f"Invalid quality; expected one of {', '.join(QUALITY_TIERS)}"
+        )
+    try:
+        rendition_names = parse_renditions(renditions)
+    except ValueError:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_RENDITION",
+            detail=f"Invalid renditions; expected any of {', '.join(RENDITIONS)}"
+        )
+
+    if encoder_profile and encoder_profile not in ENCODER_PROFILES:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_ENCODER_PROFILE",
+            detail=f"Invalid encoder profile; expected one of {', '.join(ENCODER_PROFILES)}"
+        )
+
     # Save the uploaded user video to MinIO
     object_name = f"uploads/{uuid.uuid4()}.mp4"
     temp_path = f"/tmp/{uuid.uuid4()}.mp4"
@@ -136,13 +184,140 @@ async def submit_job(
             detail="Invalid scene order JSON"
         )
     
-    task = process_video.delay(
-        mockup_id=mockup_id,
-        scene_order_json=scene_order,
-        video_key=video_key
+    task = process_video.apply_async(
+        kwargs={
+            "mockup_id": mockup_id,
+            "scene_order_json": scene_order,
+            "video_key": video_key,
+            "quality": quality,
+            "renditions": rendition_names or None,
+            "encoder_profile": encoder_profile or None,
+        },
+        queue=quality_profile(quality)["queue"]
+    )
+    
+    return {
+        "job_id": task.id,
+        "video_key": video_key,
+        "quality": quality,
+        "renditions": rendition_names,
+        "message": "Job submitted successfully"
+    }
+
+@router.post("/uploads", dependencies=[Depends(verify_token)])
+async def upload_video(file: UploadFile = File(...)):
+    """
+    Upload a user video without starting a job, e.g. to request posters
+    of it while editing the scene order.
+    
+    Returns:
+      A JSON response containing the video_key to pass to /poster.
+    """
+    object_name = f"uploads/{uuid.uuid4()}.mp4"
+    temp_path = f"/tmp/{uuid.uuid4()}.mp4"
+    
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(await file.read())
+        video_key = storage.put_object(object_name, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    # Normalise it in the background before posters and jobs need it
+    ingest_upload_task.delay(video_key)
+    return {"video_key": video_key}
+
+def poster_render_error(request: Request, error: Exception) -> APIError:
+    """Logs a failed poster render; the error's details stay out of the response."""
+    logger = get_logger(correlation_id=request.headers.get("X-Correlation-ID", str(uuid.uuid4())))
+    logger.error("poster_render_failed", error=str(error), exc_info=error)
+    return APIError(
+        status_code=500,
+        error_code="POSTER_RENDER_ERROR",
+        detail="Failed to render the poster"
     )
+
+@router.get("/poster/{mockup_id}/{scene_id}/{frame}", dependencies=[Depends(verify_token)])
+async def get_poster(
+    request: Request,
+    mockup_id: str,
+    scene_id: str,
+    frame: int,
+    video_key: str,
+    format: str = "jpeg",
+    offset: float = 0.0,
+    quality: str = QUALITY_FULL
+):
+    """
+    Render a single frame of a scene composited with an uploaded user video.
     
-    return {"job_id": task.id, "message": "Job submitted successfully"}
+    Expects:
+      - mockup_id, scene_id: The scene to render.
+      - frame: The scene's template frame index.
+      - video_key: The uploaded user video (from /uploads or /submit-job).
+      - format: "jpeg" (default) or "png".
+      - offset: Seconds into the user video at which the scene starts.
+      - quality: "full" (default) or "preview" for a low-resolution still.
+    
+    Returns:
+      The image. Posters are cached, so scrubbing back is instant. While a
+      new upload is still being prepared, 409 VIDEO_NOT_READY with a
+      Retry-After header; 404 VIDEO_NOT_FOUND for an unknown or expired
+      video_key.
+    """
+    config = load_mockup_config()
+    if mockup_id not in config:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_MOCKUP",
+            detail="Invalid mockup identifier"
+        )
+    if format not in POSTER_FORMATS or quality not in QUALITY_TIERS:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_POSTER_REQUEST",
+            detail=f"Invalid format or quality; expected one of {', '.join(POSTER_FORMATS)} "
+                   f"and one of {', '.join(QUALITY_TIERS)}"
+        )
+    
+    try:
+        data = await run_in_threadpool(
+            poster_renderer.render,
+            config[mockup_id],
+            mockup_id,
+            scene_id,
+            frame,
+            video_key,
+            format,
+            offset,
+            quality
+        )
+    except MezzanineNotReady as e:
+        raise APIError(
+            status_code=409,
+            error_code="VIDEO_NOT_READY",
+            detail=str(e),
+            headers={"Retry-After": str(POSTER_RETRY_AFTER)}
+        )
+    except (UploadNotFound, S3Error) as e:
+        if isinstance(e, S3Error) and e.code not in MISSING_OBJECT_CODES:
+            raise poster_render_error(request, e)
+        raise APIError(
+            status_code=404,
+            error_code="VIDEO_NOT_FOUND",
+            detail=f"Video {video_key} not found"
+        )
+    except ValueError as e:
+        raise APIError(
+            status_code=400,
+            error_code="INVALID_POSTER_REQUEST",
+            detail=str(e)
+        )
+    except Exception as e:
+        raise poster_render_error(request, e)
+    
+    return Response(content=data, media_type=POSTER_FORMATS[format][1])
 
 @router.get("/job-status/{job_id}")
 async def get_job_status(job_id: str):
@@ -152,12 +327,17 @@ async def get_job_status(job_id: str):
     if task_result.ready():
         if task_result.successful():
             result = task_result.get()
-            # Generate presigned URL for the final video
+            # Generate presigned URLs for the final video and its renditions
             download_url = storage.get_presigned_url(result["output_path"])
-            return {
+            response = {
                 "status": "SUCCESS",
                 "download_url": download_url
             }
+            if result.get("renditions"):
+                response["renditions"] = {
+                    name: storage.get_presigned_url(key) for name, key in result["renditions"].items()
+                }
+            return response
         else:
             return {
                 "status": "FAILURE",
@@ -0,0 +1,64 @@
+import os
+
+# Named libx264 encoder profiles. A job picks one by name, else its mockup's
+# "encoder_profile", else ENCODER_PROFILE from the environment. Use
+# tests/perf/encode_profiles.py to compare them on a real scene (speed,
+# size, SSIM/PSNR) before changing the default.
+#
+# Keys: preset, crf, tune, gop (keyframe interval in frames), maxrate and
+# bufsize (caps on the CRF bitrate, e.g. "8M"), threads (libx264 threads;
+# absent means the worker's CPU limit, see app.config.resources) and
+# audio_codec/audio_bitrate for outputs that carry sound.
+ENCODER_PROFILE_ENV = "ENCODER_PROFILE"
+DEFAULT_ENCODER_PROFILE = "balanced"
+
+ENCODER_PROFILES = {
+    "balanced": {
+        "preset": "medium",
+        "crf": 23,
+        "audio_codec": "aac",
+        "audio_bitrate": "192k",
+    },
+    "fast": {
+        "preset": "veryfast",
+        "crf": 23,
+        "audio_codec": "aac",
+        "audio_bitrate": "192k",
+    },
+    "archive": {
+        "preset": "slow",
+        "crf": 18,
+        "audio_codec": "aac",
+        "audio_bitrate": "256k",
+    },
+    "streaming": {
+        "preset": "medium",
+        "crf": 23,
+        "tune": "film",
+        "gop": 48,
+        "maxrate": "8M",
+        "bufsize": "16M",
+        "audio_codec": "aac",
+        "audio_bitrate": "128k",
+    },
+}
+
+# Keys of a profile that are FrameEncoder arguments.
+ENCODER_ARGS = ("preset", "crf", "tune", "gop", "maxrate", "bufsize", "threads")
+
+def default_encoder_profile() -> str:
+    return os.getenv(ENCODER_PROFILE_ENV, DEFAULT_ENCODER_PROFILE)
+
+def encoder_profile(name: str = None) -> dict:
+    """
+    Returns a copy of the settings of an encoder profile (the default one
+    when name is None). Raises ValueError for unknown names.
+    """
+    name = name or default_encoder_profile()
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"Invalid encoder profile: {name}; expected one of {', '.join(ENCODER_PROFILES)}")
+    return dict(ENCODER_PROFILES[name])
+
+def encoder_options(name: str = None) -> dict:
+    """The FrameEncoder arguments of an encoder profile."""
+    return {key: value for key, value in encoder_profile(name).items() if key in ENCODER_ARGS}
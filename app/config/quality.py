@@ -0,0 +1,43 @@
+import os
+
+# Render quality tiers. "full" is the deliverable; "preview" is a fast
+# draft for iterating on scene order: template proxies at a fraction of the
+# resolution, optionally a lower frame rate, ultrafast encoding and its own
+# Celery queue so drafts never wait behind full renders.
+QUALITY_FULL = "full"
+QUALITY_PREVIEW = "preview"
+
+PREVIEW_SCALE_ENV = "PREVIEW_SCALE"
+PREVIEW_FPS_ENV = "PREVIEW_FPS"
+PREVIEW_QUEUE_ENV = "PREVIEW_QUEUE"
+DEFAULT_QUEUE = "celery"  # Celery's default queue
+
+def _profiles():
+    preview_fps = os.getenv(PREVIEW_FPS_ENV, "12")
+    return {
+        QUALITY_FULL: {
+            "scale": 1.0,
+            "fps": None,  # the template's frame rate
+            "encoder_options": {},
+            "queue": DEFAULT_QUEUE,
+        },
+        QUALITY_PREVIEW: {
+            "scale": float(os.getenv(PREVIEW_SCALE_ENV, "0.25")),
+            "fps": int(preview_fps) if preview_fps else None,
+            "encoder_options": {"preset": "ultrafast", "crf": 28},
+            "queue": os.getenv(PREVIEW_QUEUE_ENV, "preview"),
+        },
+    }
+
+QUALITY_TIERS = (QUALITY_FULL, QUALITY_PREVIEW)
+
+def quality_profile(quality: str) -> dict:
+    """
+    Returns the settings of a quality tier: "scale" (of the template
+    resolution), "fps" (None keeps the template's), "encoder_options" for
+    FrameEncoder and the Celery "queue" its jobs run on.
+    """
+    profiles = _profiles()
+    if quality not in profiles:
+        raise ValueError(f"Invalid quality: {quality}; expected one of {', '.join(QUALITY_TIERS)}")
+    return profiles[quality]
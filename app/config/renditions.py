@@ -0,0 +1,63 @@
+# Output renditions a job can deliver. Every rendition is encoded from the
+# same composited frames in one ffmpeg process (a split/scale graph), so
+# decoding and compositing are paid once however many formats are asked for.
+# Sizes are output heights, never upscaled; widths keep the aspect ratio.
+RENDITIONS = {
+    "1080p": {
+        "extension": "mp4",
+        "height": 1080,
+        "codec": "libx264",
+        "preset": "medium",
+        "crf": 20,
+        "pix_fmt": "yuv420p",
+        "audio": True,  # carries the user's soundtrack (teasers are silent)
+    },
+    "720p": {
+        "extension": "mp4",
+        "height": 720,
+        "codec": "libx264",
+        "preset": "medium",
+        "crf": 23,
+        "pix_fmt": "yuv420p",
+        "audio": True,
+    },
+    "teaser_webm": {
+        "extension": "webm",
+        "height": 480,
+        "fps": 12,
+        "duration": 6,  # seconds from the start of the timeline
+        "codec": "libvpx-vp9",
+        # Without it libvpx-vp9 encodes the RGB frames as gbrp (profile 1),
+        # which Safari and hardware decoders do not play.
+        "pix_fmt": "yuv420p",
+        "args": ["-b:v", "0", "-crf", "36", "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1"],
+    },
+    "teaser_webp": {
+        "extension": "webp",
+        "height": 360,
+        "fps": 10,
+        "duration": 4,
+        "codec": "libwebp_anim",
+        # No pix_fmt: libwebp converts the RGB frames to lossy (4:2:0) VP8
+        # itself, smaller than from ffmpeg's yuv420p.
+        "args": ["-loop", "0", "-quality", "60"],
+    },
+}
+
+def rendition_profile(name: str) -> dict:
+    """
+    Returns the settings of a rendition: file "extension", output "height",
+    optional "fps" and "duration" (seconds) limits, the ffmpeg "codec"
+    with its "pix_fmt" (if it needs one) and "preset"/"crf" (libx264) or
+    extra "args", and whether it gets the user's "audio".
+    """
+    if name not in RENDITIONS:
+        raise ValueError(f"Invalid rendition: {name}; expected one of {', '.join(RENDITIONS)}")
+    return RENDITIONS[name]
+
+def parse_renditions(value: str) -> list:
+    """Parses a comma-separated list of rendition names, validating each."""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    for name in names:
+        rendition_profile(name)
+    return list(dict.fromkeys(names))
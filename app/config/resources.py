@@ -0,0 +1,50 @@
+import math
+import os
+
+# Optional override for the number of CPUs a worker may use
+CPU_LIMIT_ENV = "CPU_LIMIT"
+
+def _cgroup_cpu_quota():
+    """Return the cgroup CPU quota in CPUs (e.g. 2.0 for docker's cpus: "2.0"), or None."""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1: quota of -1 means unlimited
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def cpu_limit() -> int:
+    """
+    Number of CPUs this process can actually use.
+
+    Honours the CPU_LIMIT environment variable, then the container's cgroup
+    quota, then the scheduler affinity mask.
+    """
+    override = os.getenv(CPU_LIMIT_ENV)
+    if override:
+        return max(1, int(override))
+
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        available = min(available, math.ceil(quota))
+    return max(1, available)
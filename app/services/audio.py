@@ -0,0 +1,94 @@
+# app/services/audio.py
+
+import os
+import subprocess as sp
+from typing import Any, Dict, List, Optional, Tuple
+from moviepy.config import get_setting
+from app.config.logging import get_logger
+from app.services.media_probe import probe_streams
+from app.services.scene_processor import scene_frame_count
+
+logger = get_logger(component="audio")
+
+# Audio codecs the MP4 muxer takes as they are.
+MP4_COPY_CODECS = ("aac", "mp3", "alac", "opus")
+# Audio running this much past the end of the video is not worth a re-encode.
+TRIM_TOLERANCE = 0.05
+
+
+def audio_spans(scene_jobs: List[Dict[str, Any]], fps: int = 24) -> List[Tuple[float, float]]:
+    """
+    The (start, end) seconds of the user's video that a job's scenes show,
+    in timeline order, with adjacent spans merged.
+    """
+    spans: List[Tuple[float, float]] = []
+    for job in scene_jobs:
+        start = job["user_video_offset"]
+        end = start + scene_frame_count(job["scene_timing"]) / fps
+        if spans and abs(spans[-1][1] - start) < 1e-6:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def mux_user_audio(
+    video_path: str,
+    user_video_path: str,
+    spans: List[Tuple[float, float]],
+    audio_codec: str = "aac",
+    audio_bitrate: Optional[str] = None,
+) -> bool:
+    """
+    Adds the user's soundtrack for spans (see audio_spans) to the rendered
+    video at video_path, in place; the video stream is copied. The audio is
+    stream copied when it already lines up with the timeline (one span from
+    the start, not running past its end) and re-encoded once, trimmed and
+    joined, otherwise. Returns False, leaving the video untouched, when the
+    upload has no audio.
+    """
+    info = probe_streams(user_video_path)
+    if info is None or info["audio"] is None:
+        return False
+    audio = info["audio"]
+    duration = float(audio.get("duration") or info["format"].get("duration") or 0)
+    copy = (
+        len(spans) == 1
+        and spans[0][0] == 0
+        and duration <= spans[0][1] + TRIM_TOLERANCE
+        and audio.get("codec_name") in MP4_COPY_CODECS
+    )
+
+    root, extension = os.path.splitext(video_path)
+    muxed_path = f"{root}.audio{extension}"
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y",
+        "-loglevel", "error",
+        "-i", video_path,
+        "-i", user_video_path,
+        "-map", "0:v:0",
+    ]
+    if copy:
+        cmd += ["-map", "1:a:0", "-c:a", "copy"]
+    else:
+        labels = [f"[s{index}]" for index in range(len(spans))]
+        graph = [f"[1:a:0]asplit={len(spans)}{''.join(labels)}" if len(spans) > 1 else "[1:a:0]anull[s0]"]
+        for index, (start, end) in enumerate(spans):
+            graph.append(f"{labels[index]}atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{index}]")
+        graph.append("".join(f"[a{index}]" for index in range(len(spans))) + f"concat=n={len(spans)}:v=0:a=1[audio]")
+        cmd += ["-filter_complex", ";".join(graph), "-map", "[audio]", "-c:a", audio_codec]
+        if audio_bitrate:
+            cmd += ["-b:a", audio_bitrate]
+    cmd += ["-c:v", "copy", "-movflags", "+faststart", muxed_path]
+
+    try:
+        sp.run(cmd, stdin=sp.DEVNULL, capture_output=True, check=True)
+    except sp.CalledProcessError as e:
+        error = e.stderr.decode("utf8", errors="replace").strip()
+        logger.error("audio_mux_failed", file=video_path, error=error)
+        if os.path.exists(muxed_path):
+            os.remove(muxed_path)
+        raise OSError(f"Failed to mux audio into {video_path}: {error}")
+    os.replace(muxed_path, video_path)
+    logger.info("user_audio_muxed", file=video_path, method="copy" if copy else "reencode", spans=len(spans))
+    return True
@@ -0,0 +1,161 @@
+# app/services/corner_pin_track.py
+
+import os
+import sys
+import json
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+from app.config.logging import get_logger
+from app.services.effects.perspective_transformations import scale_corners
+
+logger = get_logger(component="corner_pin_track")
+
+CORNER_KEYS = ("ul", "ur", "lr", "ll")
+# Bump when the compiled layout or the corner scaling changes.
+TRACK_FORMAT_VERSION = 1
+
+UNIT_SQUARE = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+
+# (path, mtime_ns) -> CornerPinTrack, so each worker compiles or loads a
+# track once per version of the file.
+_tracks: Dict[Tuple[str, int], "CornerPinTrack"] = {}
+
+
+class CornerPinTrack:
+    """
+    A corner pin track compiled for frame-indexed lookups.
+
+    corners is an (N, 4, 2) float32 array of scaled ul/ur/lr/ll points (already
+    truncated to whole pixels, like the JSON path), valid an (N,) bool array of
+    the frames that were tracked, and homographies an (N, 3, 3) float64 array
+    mapping the unit square onto each frame's quad (NaN where it cannot be
+    computed).
+    """
+
+    def __init__(self, corners: np.ndarray, valid: np.ndarray, homographies: np.ndarray) -> None:
+        self.corners = corners
+        self.valid = valid
+        self.homographies = homographies
+        self.nframes = len(valid)
+
+    def has_frame(self, index: int) -> bool:
+        return 0 <= index < self.nframes and bool(self.valid[index])
+
+    def corner_dict(self, index: int) -> Dict[str, list]:
+        """Scaled corners of a frame in the {"ul": [x, y], ...} form used by the effects."""
+        return {key: [int(x), int(y)] for key, (x, y) in zip(CORNER_KEYS, self.corners[index])}
+
+    def homography(self, index: int, source_size: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        Perspective matrix mapping a source frame of (width, height) onto the
+        frame's quad, or None if the quad is degenerate.
+        """
+        unit = self.homographies[index]
+        if np.isnan(unit).any():
+            return None
+        w, h = source_size
+        return unit @ np.diag([1.0 / w, 1.0 / h, 1.0])
+
+    def scaled(self, factor: float) -> "CornerPinTrack":
+        """The track for an output resolution scaled by factor (e.g. a preview proxy)."""
+        if factor == 1:
+            return self
+        scale = np.diag([factor, factor, 1.0])
+        return CornerPinTrack(self.corners * np.float32(factor), self.valid, scale @ self.homographies)
+
+
+def compile_corner_pin_track(corner_pin_data: Dict[str, dict]) -> CornerPinTrack:
+    """Compiles exported corner pin JSON data (frame number -> corners) into a CornerPinTrack."""
+    frames = {int(k): v for k, v in corner_pin_data.items() if k.isdigit()}
+    count = max(frames, default=-1) + 1
+    corners = np.zeros((count, 4, 2), dtype=np.float32)
+    valid = np.zeros(count, dtype=bool)
+    homographies = np.full((count, 3, 3), np.nan)
+
+    for index, frame_corners in frames.items():
+        scaled = scale_corners(frame_corners)
+        corners[index] = [scaled[key] for key in CORNER_KEYS]
+        valid[index] = True
+        try:
+            homographies[index] = cv2.getPerspectiveTransform(UNIT_SQUARE, corners[index])
+        except cv2.error:
+            pass
+    return CornerPinTrack(corners, valid, homographies)
+
+
+def sidecar_path(path: str) -> str:
+    """Location of the compiled track next to its JSON export."""
+    return os.path.splitext(path)[0] + ".track.npz"
+
+
+def _read_sidecar(path: str, st: os.stat_result) -> Optional[CornerPinTrack]:
+    try:
+        with np.load(sidecar_path(path)) as data:
+            if (
+                int(data["version"]) != TRACK_FORMAT_VERSION
+                or int(data["source_mtime_ns"]) != st.st_mtime_ns
+                or int(data["source_size"]) != st.st_size
+            ):
+                return None
+            return CornerPinTrack(data["corners"], data["valid"], data["homographies"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_sidecar(path: str, track: CornerPinTrack) -> Optional[str]:
+    """Writes the compiled track next to path; returns None if the directory is read-only."""
+    st = os.stat(path)
+    target = sidecar_path(path)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=TRACK_FORMAT_VERSION,
+                source_mtime_ns=st.st_mtime_ns,
+                source_size=st.st_size,
+                corners=track.corners,
+                valid=track.valid,
+                homographies=track.homographies,
+            )
+        os.replace(tmp_path, target)
+    except OSError as e:
+        logger.warning("corner_pin_sidecar_write_failed", file=target, error=str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return target
+
+
+def load_corner_pin_track(path: str) -> CornerPinTrack:
+    """
+    Returns the compiled track for a corner pin JSON export.
+
+    Tracks are cached per process by path and mtime. The binary sidecar is
+    used when it is up to date; otherwise the JSON is compiled once and the
+    sidecar is (re)written for the next process.
+    """
+    st = os.stat(path)
+    cache_key = (os.path.abspath(path), st.st_mtime_ns)
+    track = _tracks.get(cache_key)
+    if track is not None:
+        return track
+
+    track = _read_sidecar(path, st)
+    if track is None:
+        with open(path, "r") as f:
+            track = compile_corner_pin_track(json.load(f))
+        write_sidecar(path, track)
+        logger.info("corner_pin_track_compiled", file=path, frame_count=track.nframes)
+
+    _tracks[cache_key] = track
+    return track
+
+
+if __name__ == "__main__":
+    # Precompile sidecars for exported tracks:
+    #   python -m app.services.corner_pin_track assets/mockup1/*/corner_pin_data.json
+    for json_path in sys.argv[1:]:
+        with open(json_path, "r") as f:
+            print(write_sidecar(json_path, compile_corner_pin_track(json.load(f))))
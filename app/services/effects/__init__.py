@@ -9,3 +9,17 @@ EFFECT_REGISTRY = {
     "gauss_blur": gauss_blur_effect,
     "screen_glow": screen_glow_effect,
 }
+
+# What each effect reads and writes, used by the render plan compiler
+# (app/services/render_plan.py):
+#   inputs: "frame" (the incoming frame), "template" (the scene's template
+#           clips and track) and/or "user" (the user's video).
+#   roi: "corner_quad" if it only changes pixels inside the corner pin
+#        quad's bounding box, "frame" if it may change any pixel.
+#   in_place: whether `out` may be the input frame itself.
+EFFECT_TRAITS = {
+    "corner_pin": {"inputs": ("frame", "template", "user"), "roi": "corner_quad", "in_place": True},
+    "reflections": {"inputs": ("frame", "template"), "roi": "frame", "in_place": True},
+    "gauss_blur": {"inputs": ("frame",), "roi": "frame", "in_place": True},
+    "screen_glow": {"inputs": ("frame",), "roi": "frame", "in_place": True},
+}
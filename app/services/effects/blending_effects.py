@@ -1,37 +1,104 @@
 import cv2
 import numpy as np
+from functools import lru_cache
+from . import kernels
+from .frame_pool import black_frame
+from .tiling import run_stripes, stripe_count
 
-def screen_blend(base, overlay):
+# Blend modes available to effects, as uint8 kernels of (base, layer).
+BLEND_MODES = {
+    "screen": kernels.screen,
+    "multiply": kernels.multiply,
+    "overlay": kernels.overlay,
+    "add": kernels.add,
+}
+
+def screen_blend(base, overlay, out=None, pool=None):
     """
     Applies a screen blend effect between two frames.
     
     For each pixel: result = 1 - (1 - base) * (1 - overlay)
-    Assumes input frames are in the 0-255 range.
+    Assumes input frames are uint8 in the 0-255 range.
+    """
+    return kernels.screen(base, overlay, out=out, pool=pool)
+
+def blend(base, layer, mode, opacity, out=None, pool=None):
+    """
+    Blends layer over base with one of BLEND_MODES at a scalar opacity:
+    floor(base * (1 - opacity) + mode(base, layer) * opacity).
+    """
+    kernel = BLEND_MODES.get(mode)
+    if kernel is None:
+        raise ValueError(f"Unknown blend mode '{mode}'")
+    if opacity >= 1:
+        return kernel(base, layer, out=out, pool=pool)
+    blended = kernel(base, layer, out=pool.get("blend.layer", base.shape) if pool is not None else None, pool=pool)
+    return kernels.mix(base, blended, opacity, out=out)
+
+@lru_cache(maxsize=32)
+def blend_lut(mode, opacity):
+    """
+    The 256 x 256 table of blend(base, layer, mode, opacity), indexed as
+    [base, layer]. Built once per (mode, opacity) by running the kernels
+    over every pair, so lut_blend reproduces blend exactly.
+    """
+    base = np.repeat(np.arange(256, dtype=np.uint8), 256).reshape(256, 256)
+    layer = np.ascontiguousarray(base.T)
+    table = blend(base, layer, mode, opacity)
+    table.flags.writeable = False
+    return table
+
+def lut_blend(base, layer, mode, opacity, out=None):
+    """
+    blend() as a single gather through blend_lut. On full frames the
+    arithmetic kernels are several times faster than a 64K-entry gather, so
+    effects use blend(); the table is the exhaustive reference for a mode.
     """
-    base_f = base.astype(np.float32) / 255.0
-    overlay_f = overlay.astype(np.float32) / 255.0
-    blended = 1 - (1 - base_f) * (1 - overlay_f)
-    return np.clip(blended * 255, 0, 255).astype(np.uint8)
+    index = np.left_shift(base, 8, dtype=np.uint16)
+    np.bitwise_or(index, layer, out=index)
+    return np.take(blend_lut(mode, opacity).ravel(), index, out=out, mode="wrap")
 
-def reflections_effect(frame, t, opacity, context):
+def reflections_effect(frame, t, opacity, context, blend_mode="screen", out=None):
     """
-    Blends the reflections clip over the current frame using a screen blend.
+    Blends the reflections clip over the current frame, by default with a
+    screen blend.
     
     Parameters:
       - frame: The current composite frame.
       - t: Current time in seconds (local scene time).
       - opacity: A float (e.g., 0.5) for blending opacity.
+      - blend_mode: One of BLEND_MODES (screen, multiply, overlay, add).
       - context: Dictionary containing:
             - "reflections_clip": MoviePy clip for reflections.
             - "output_size": (width, height) tuple.
+            - "frame_pool" (optional): FramePool for scratch buffers.
+      - out: Optional destination frame; may be the input frame itself.
     Returns:
       - The updated composite frame with reflections blended.
     """
+    return blend_reflections(frame, reflections_frame(t, context), opacity, context, blend_mode, out=out)
+
+def reflections_frame(t, context):
+    """The reflections clip's frame at t, or black past its end."""
     if t < context["reflections_clip"].duration:
-        refl_frame = context["reflections_clip"].get_frame(t)
-    else:
-        h, w = context["output_size"][1], context["output_size"][0]
-        refl_frame = np.zeros((h, w, 3), dtype=np.uint8)
-    blended = screen_blend(frame, refl_frame)
-    return (frame.astype(np.float32) * (1 - opacity) +
-            blended.astype(np.float32) * opacity).astype(np.uint8)
+        return context["reflections_clip"].get_frame(t)
+    h, w = context["output_size"][1], context["output_size"][0]
+    return black_frame(context, (h, w, 3))
+
+def blend_reflections(frame, refl_frame, opacity, context, blend_mode="screen", out=None):
+    """
+    Blends refl_frame over frame at the given opacity. Every step is
+    per-pixel, so it can be applied to a region of the frame with the same
+    region of refl_frame, and is run in horizontal stripes (see tiling.py).
+    """
+    if out is None:
+        out = np.empty_like(frame)
+
+    def blend_stripe(y0, y1, stripe_context):
+        blend(
+            frame[y0:y1], refl_frame[y0:y1], blend_mode, opacity,
+            out=out[y0:y1], pool=stripe_context.get("frame_pool"),
+        )
+
+    run_stripes(blend_stripe, frame.shape[0], stripe_count(frame.shape, context), context)
+    return out
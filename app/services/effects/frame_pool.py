@@ -0,0 +1,102 @@
+# app/services/effects/frame_pool.py
+
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FramePool:
+    """
+    Per-scene pool of reusable frame buffers.
+
+    Effects draw named scratch buffers from it (``get``) instead of
+    allocating full frames on every call, and the render loop takes each
+    frame's destination from a small ring (``next_output``) so frames still
+    queued in the encoder are never overwritten. The ring must hold at least
+    as many frames as can be in flight downstream, plus the one being drawn.
+    """
+
+    def __init__(self, output_size: Tuple[int, int], ring_size: int = 2) -> None:
+        self.width, self.height = int(output_size[0]), int(output_size[1])
+        self.ring_size = max(1, ring_size)
+        self._buffers: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._ring: List[np.ndarray] = []
+        self._ring_index = 0
+        self._black: Dict[int, np.ndarray] = {}
+        self._stripes: Dict[int, "FramePool"] = {}
+
+    def frame_shape(self, channels: int = 3) -> Tuple[int, ...]:
+        if channels == 1:
+            return (self.height, self.width)
+        return (self.height, self.width, channels)
+
+    def get(self, name: str, shape: Optional[Tuple[int, ...]] = None, dtype=np.uint8) -> np.ndarray:
+        """
+        Returns a contiguous scratch buffer of the given shape (a full frame
+        by default) registered under name. Buffers of varying shapes share
+        one backing allocation per name that only ever grows, so per-frame
+        regions of interest do not allocate. Contents are left over from the
+        previous user; a buffer is only valid until the next call that uses
+        the same name.
+        """
+        shape = tuple(shape) if shape is not None else self.frame_shape()
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        backing = self._buffers.get((name, dtype))
+        if backing is None or backing.size < size:
+            backing = np.empty(size, dtype=dtype)
+            self._buffers[(name, dtype)] = backing
+        return backing[:size].reshape(shape)
+
+    def black(self, channels: int = 3) -> np.ndarray:
+        """A shared, read-only black frame."""
+        frame = self._black.get(channels)
+        if frame is None:
+            frame = np.zeros(self.frame_shape(channels), dtype=np.uint8)
+            frame.flags.writeable = False
+            self._black[channels] = frame
+        return frame
+
+    def stripe(self, index: int) -> "FramePool":
+        """
+        The child pool for tile stripe index (see tiling.py), so stripes of
+        one frame drawn on different threads never share a scratch buffer.
+        """
+        pool = self._stripes.get(index)
+        if pool is None:
+            pool = FramePool((self.width, self.height), ring_size=1)
+            self._stripes[index] = pool
+        return pool
+
+    def next_output(self) -> np.ndarray:
+        """The next destination frame from the ring."""
+        if len(self._ring) < self.ring_size:
+            self._ring.append(np.empty(self.frame_shape(), dtype=np.uint8))
+            return self._ring[-1]
+        frame = self._ring[self._ring_index]
+        self._ring_index = (self._ring_index + 1) % self.ring_size
+        return frame
+
+
+def scratch(context: Dict[str, Any], name: str, shape: Tuple[int, ...], dtype=np.uint8) -> Optional[np.ndarray]:
+    """
+    A pooled scratch buffer from context["frame_pool"], or None when the
+    context has no pool, in which case OpenCV allocates the destination.
+    """
+    pool = context.get("frame_pool") if context else None
+    if pool is None:
+        return None
+    return pool.get(name, shape, dtype)
+
+
+def buffer(context: Dict[str, Any], name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+    """scratch(), or a new array when the context has no pool."""
+    pooled = scratch(context, name, shape, dtype)
+    return pooled if pooled is not None else np.empty(shape, dtype=dtype)
+
+
+def black_frame(context: Dict[str, Any], shape: Tuple[int, ...]) -> np.ndarray:
+    """A black uint8 frame of shape, shared through the pool when there is one."""
+    pool = context.get("frame_pool") if context else None
+    if pool is not None and tuple(shape) == pool.frame_shape(shape[2] if len(shape) == 3 else 1):
+        return pool.black(shape[2] if len(shape) == 3 else 1)
+    return np.zeros(shape, dtype=np.uint8)
@@ -0,0 +1,125 @@
+# app/services/effects/kernels.py
+
+import cv2
+import numpy as np
+
+# Integer compositing kernels for uint8 frames.
+#
+# Products of two uint8 values are formed exactly in uint16, then divided by
+# 255 with an explicit rounding mode, so the kernels reproduce the truncating
+# float32 math of the original effects (within +/-1 LSB of float rounding)
+# without allocating float copies of the frame. Every step is a saturating
+# OpenCV operation, so sums clip to 255 instead of wrapping.
+#
+# Mattes are uint8 arrays where 255 is fully opaque. They must have the same
+# channel count as the frames (see expand_matte).
+#
+# Every kernel takes an optional `out` destination (which may alias an
+# input, the operations are elementwise) and an optional FramePool for its
+# intermediates; without them OpenCV allocates as usual.
+
+# convertScaleAbs rounds to nearest; offsetting by just under half an LSB
+# turns that into an exact floor or ceil of x / 255 for integer x.
+_FLOOR_OFFSET = -127 / 255
+_CEIL_OFFSET = 127 / 255
+
+
+def _scratch(pool, name, like, dtype=np.uint8):
+    """A pooled buffer shaped like `like`, or None to let OpenCV allocate."""
+    if pool is None:
+        return None
+    return pool.get("kernels." + name, like.shape, dtype)
+
+
+def div255_floor(x, out=None):
+    """floor(x / 255) of a uint16 array, as uint8."""
+    return cv2.convertScaleAbs(x, dst=out, alpha=1 / 255, beta=_FLOOR_OFFSET)
+
+
+def div255_ceil(x, out=None):
+    """ceil(x / 255) of a uint16 array, as uint8."""
+    return cv2.convertScaleAbs(x, dst=out, alpha=1 / 255, beta=_CEIL_OFFSET)
+
+
+def multiply_wide(a, b, out=None):
+    """The exact uint16 product of two uint8 arrays."""
+    # NumPy's widening multiply is vectorised; cv2.multiply to CV_16U is not.
+    return np.multiply(a, b, out=out, dtype=np.uint16)
+
+
+def expand_matte(matte, channels=3, out=None):
+    """Repeats a single-channel (H x W) matte to (H x W x channels)."""
+    if matte.ndim == 3:
+        return matte
+    return cv2.merge([matte] * channels, dst=out)
+
+
+def premultiply(frame, matte, out=None, pool=None):
+    """floor(frame * matte / 255): the frame scaled by its matte."""
+    wide = multiply_wide(frame, matte, out=_scratch(pool, "wide", frame, np.uint16))
+    return div255_floor(wide, out=out)
+
+
+def alpha_over(premultiplied, background, matte, out=None, pool=None):
+    """
+    Composites a premultiplied layer over a background:
+    layer + floor(background * (255 - matte) / 255).
+    """
+    inverse = cv2.bitwise_not(matte, dst=_scratch(pool, "inverse", matte))
+    under = premultiply(background, inverse, out=_scratch(pool, "under", background), pool=pool)
+    return cv2.add(premultiplied, under, dst=out)
+
+
+def lerp(foreground, background, matte, out=None, pool=None):
+    """floor((foreground * matte + background * (255 - matte)) / 255)."""
+    inverse = cv2.bitwise_not(matte, dst=_scratch(pool, "inverse", matte))
+    weighted = multiply_wide(foreground, matte, out=_scratch(pool, "wide", foreground, np.uint16))
+    under = multiply_wide(background, inverse, out=_scratch(pool, "wide_under", background, np.uint16))
+    cv2.add(weighted, under, dst=weighted)
+    return div255_floor(weighted, out=out)
+
+
+def screen(base, overlay, out=None, pool=None):
+    """
+    Screen blend: 255 - ceil((255 - base) * (255 - overlay) / 255), which is
+    the truncated float result of 1 - (1 - base) * (1 - overlay).
+    """
+    inverse_base = cv2.bitwise_not(base, dst=_scratch(pool, "inverse", base))
+    inverse_overlay = cv2.bitwise_not(overlay, dst=_scratch(pool, "inverse_overlay", overlay))
+    inverse = multiply_wide(inverse_base, inverse_overlay, out=_scratch(pool, "wide", base, np.uint16))
+    out = div255_ceil(inverse, out=out)
+    return cv2.bitwise_not(out, dst=out)
+
+
+def multiply(base, layer, out=None, pool=None):
+    """Multiply blend: floor(base * layer / 255)."""
+    return premultiply(base, layer, out=out, pool=pool)
+
+
+def add(base, layer, out=None, pool=None):
+    """Linear dodge: base + layer, clipped to 255."""
+    return cv2.add(base, layer, dst=out)
+
+
+def overlay(base, layer, out=None, pool=None):
+    """
+    Overlay blend, keyed on the base: floor(2 * base * layer / 255) where
+    base < 128, else 255 - ceil(2 * (255 - base) * (255 - layer) / 255).
+    """
+    dark = multiply_wide(base, layer, out=_scratch(pool, "wide", base, np.uint16))
+    dark = cv2.convertScaleAbs(dark, dst=_scratch(pool, "overlay_dark", base), alpha=2 / 255, beta=_FLOOR_OFFSET)
+    inverse_base = cv2.bitwise_not(base, dst=_scratch(pool, "inverse", base))
+    inverse_layer = cv2.bitwise_not(layer, dst=_scratch(pool, "inverse_overlay", layer))
+    light = multiply_wide(inverse_base, inverse_layer, out=_scratch(pool, "wide_under", base, np.uint16))
+    # Each half saturates on the other side of the split, where it is discarded.
+    dark_mask = base < 128
+    out = cv2.convertScaleAbs(light, dst=out, alpha=2 / 255, beta=_CEIL_OFFSET)
+    cv2.bitwise_not(out, dst=out)
+    np.copyto(out, dark, where=dark_mask)
+    return out
+
+
+def mix(base, layer, opacity, out=None):
+    """floor(base * (1 - opacity) + layer * opacity) for a scalar opacity."""
+    # addWeighted rounds; the offset makes it truncate like a float cast.
+    return cv2.addWeighted(base, 1 - opacity, layer, opacity, -0.4999, dst=out)
@@ -2,12 +2,23 @@ import cv2
 import numpy as np
 import json
 from app.config.logging import get_logger
-from .blur_effect import gauss_blur_effect
+from .blur_effect import blur_kernel_size, gauss_blur_effect
+from . import kernels
+from .frame_pool import black_frame, buffer, scratch
+from .tiling import run_stripes, stripe_count
 
 # Set up a logger for this module.
 logger = get_logger(component="perspective_transformations")
 
-def apply_corner_pin(frame, corners, output_size):
+# Extra pixels kept around the corner quad's bounding box, so bilinear
+# sampling at its edges stays inside the region of interest.
+WARP_MARGIN = 2
+
+# Coarsest user frame mip level (1/16 of the frame's size) the corner pin
+# will sample from.
+MAX_MIP_LEVEL = 4
+
+def apply_corner_pin(frame, corners, output_size, matrix=None, out=None):
     """
     Applies a perspective (corner pin) transform to the given frame.
     
@@ -15,6 +26,8 @@ def apply_corner_pin(frame, corners, output_size):
         frame: Input frame to transform
         corners: Dictionary containing corner points (ul, ur, lr, ll)
         output_size: Tuple of (width, height) for output frame
+        matrix: Optional precomputed perspective matrix for these corners
+        out: Optional destination frame of the output size
         
     Returns:
         Transformed frame
@@ -26,6 +39,9 @@ def apply_corner_pin(frame, corners, output_size):
         logger.error("Invalid output size", output_size=output_size)
         raise cv2.error("Invalid output size")
         
+    if matrix is not None:
+        return cv2.warpPerspective(frame, matrix, output_size, dst=out)
+    
     h, w = frame.shape[:2]
     logger.debug("Input frame dimensions", height=h, width=w)
     
@@ -42,10 +58,39 @@ def apply_corner_pin(frame, corners, output_size):
     M = cv2.getPerspectiveTransform(src_pts, dst_pts)
     
     # Apply the transformation with better interpolation
-    warped = cv2.warpPerspective(frame, M, output_size)
+    warped = cv2.warpPerspective(frame, M, output_size, dst=out)
     
     return warped
 
+def mip_level(corners, source_size):
+    """
+    Returns the mip level (each halving the frame's size) of a source frame
+    of (width, height) to warp into the corner quad: the coarsest that still
+    has at least one source pixel per quad pixel along the quad's longest
+    edges, up to MAX_MIP_LEVEL. Warping a much larger frame with bilinear
+    sampling skips most of its pixels and aliases.
+    """
+    ul, ur, lr, ll = (np.asarray(corners[key], dtype=np.float64) for key in ('ul', 'ur', 'lr', 'll'))
+    width = max(np.hypot(*(ur - ul)), np.hypot(*(lr - ll)), 1.0)
+    height = max(np.hypot(*(ll - ul)), np.hypot(*(lr - ur)), 1.0)
+    minification = min(source_size[0] / width, source_size[1] / height)
+    if minification < 2:
+        return 0
+    return min(MAX_MIP_LEVEL, int(np.log2(minification)))
+
+def user_frame_mip(user_frame, level, context=None):
+    """
+    The user frame downscaled to a mip level with area averaging, into a
+    pooled scratch buffer when the context has a pool. Level 0 is the frame
+    itself.
+    """
+    if level == 0:
+        return user_frame
+    h, w = user_frame.shape[:2]
+    size = (max(1, round(w / 2 ** level)), max(1, round(h / 2 ** level)))
+    dst = scratch(context, "corner_pin.mip", (size[1], size[0]) + user_frame.shape[2:])
+    return cv2.resize(user_frame, size, dst=dst, interpolation=cv2.INTER_AREA)
+
 def load_corner_pin_data(filepath):
     """
     Loads corner pin tracking data from a JSON file.
@@ -60,146 +105,267 @@ def load_corner_pin_data(filepath):
         logger.error("Failed to load corner pin data", filepath=filepath, error=str(e))
         raise
 
-def corner_pin_effect(frame, t, use_mask, context, blur_enabled=False, blur_sigma=1.5, blur_opacity=0.3):
+def scale_corners(corners):
     """
-    Applies a corner-pin transformation on the user layer and composites it
-    over the current frame. This is the only place where the global user video offset
+    Scales tracked corner points from the After Effects source resolution
+    to the output resolution, truncating to whole pixels.
+    """
+    # Scale the corners using the old version's approach
+    original_resolution = 3840  # Source width from After Effects
+    current_width = 1920        # Target width
+    scale_factor = current_width / original_resolution  # Back to original scaling
+    
+    # Scale both X and Y coordinates with the same factor to maintain aspect ratio
+    scaled_corners = {
+        'ul': [int(corners['ul'][0] * scale_factor), int(corners['ul'][1] * scale_factor)],
+        'ur': [int(corners['ur'][0] * scale_factor), int(corners['ur'][1] * scale_factor)],
+        'lr': [int(corners['lr'][0] * scale_factor), int(corners['lr'][1] * scale_factor)],
+        'll': [int(corners['ll'][0] * scale_factor), int(corners['ll'][1] * scale_factor)]
+    }
+    
+    logger.debug(
+        "Corner pin scaling",
+        original_corners=corners,
+        scaled_corners=scaled_corners,
+        scale_factor=scale_factor,
+        original_resolution=original_resolution,
+        current_width=current_width
+    )
+    return scaled_corners
+
+def corner_pin_roi(scaled_corners, output_size, padding=0):
+    """
+    Returns the (x0, y0, x1, y1) bounding box of the corner quad, grown by
+    padding pixels and clipped to the output frame, or None if it lies
+    entirely outside the frame.
+    """
+    xs = [point[0] for point in scaled_corners.values()]
+    ys = [point[1] for point in scaled_corners.values()]
+    x0 = max(0, min(xs) - padding)
+    y0 = max(0, min(ys) - padding)
+    x1 = min(output_size[0], max(xs) + 1 + padding)
+    y1 = min(output_size[1], max(ys) + 1 + padding)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, y0, x1, y1
+
+def corner_pin_matte(scaled_corners, t, context, roi=None):
+    """
+    Builds the uint8 composite matte for one frame: the corner polygon
+    multiplied by the template's mask clip (if any) at time t. With roi
+    (x0, y0, x1, y1), only that region of the matte is built.
+    
+    The matte only depends on the template, never on the user's video, so
+    it can be baked ahead of rendering (see bake_scene_matte).
+    """
+    h, w = context["output_size"][1], context["output_size"][0]
+    x0, y0, x1, y1 = roi if roi is not None else (0, 0, w, h)
+    corner_mask = scratch(context, "corner_pin.polygon", (y1 - y0, x1 - x0))
+    if corner_mask is None:
+        corner_mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    else:
+        corner_mask.fill(0)
+    pts = np.array([scaled_corners['ul'], scaled_corners['ur'], scaled_corners['lr'], scaled_corners['ll']], dtype=np.int32)
+    pts = (pts - [x0, y0]).astype(np.int32).reshape((-1, 1, 2))
+    cv2.fillConvexPoly(corner_mask, pts, 255)
+    
+    if context.get("mask_clip") is None:
+        return corner_mask
+    if t < context["mask_clip"].duration:
+        matte_mask_frame = context["mask_clip"].get_frame(t)
+    else:
+        matte_mask_frame = black_frame(context, (h, w))
+    matte_mask_frame = matte_mask_frame[y0:y1, x0:x1]
+    if matte_mask_frame.ndim == 3 and matte_mask_frame.shape[2] == 3:
+        matte_mask_gray = cv2.cvtColor(matte_mask_frame, cv2.COLOR_RGB2GRAY)
+    else:
+        matte_mask_gray = matte_mask_frame
+    # The polygon is binary (0 or 255), so the product is the mask inside it
+    # and 0 outside, which is the per-pixel minimum of the two.
+    return cv2.min(matte_mask_gray, corner_mask, dst=corner_mask)
+
+def tracked_corners(index, context):
+    """
+    Returns the scaled corners of a template frame, or None if it was not
+    tracked. Uses the compiled track (context["corner_pin_track"]) when
+    present, otherwise the raw JSON data (context["corner_pin_data"]).
+    """
+    track = context.get("corner_pin_track")
+    if track is not None:
+        return track.corner_dict(index) if track.has_frame(index) else None
+    corners = context.get("corner_pin_data", {}).get(str(index))
+    return scale_corners(corners) if corners is not None else None
+
+def bake_scene_matte(context, frames):
+    """
+    Fills frames (an (N, h, w) uint8 array) with the composite matte of
+    each template frame, as corner_pin_effect would build it at t = n / fps.
+    Frames without tracking data are left empty.
+    """
+    fps = context["fps"]
+    for index in range(frames.shape[0]):
+        scaled_corners = tracked_corners(index, context)
+        if scaled_corners is None:
+            frames[index] = 0
+        else:
+            frames[index] = corner_pin_matte(scaled_corners, index / fps, context)
+
+def corner_pin_region(frame, t, use_mask, context, blur_enabled=False, blur_sigma=1.5, blur_opacity=0.3):
+    """
+    Renders the corner-pinned user layer composited over frame, inside the
+    layer's region of interest only. This is the only place where the global user video offset
     (from context["user_offset"]) is applied to select the correct frame from user_clip.
     
-    Args:
-        frame: Current frame
-        t: Current time
-        use_mask: Whether to use the mask clip
-        context: Context dictionary containing clips and data
-        blur_enabled: Whether to apply blur effect
-        blur_sigma: Sigma value for Gaussian blur
-        blur_opacity: Opacity of the blurred version (0.0 to 1.0)
+    Returns ((x0, y0, x1, y1), pixels), where pixels is a scratch buffer
+    holding the composited region, or None if the frame is left unchanged.
+    Arguments are as for corner_pin_effect.
     """
-    try:
-        fps = context["fps"]
-        # Calculate global time for the user video.
-        global_time = t + context.get("user_offset", 0)
+    fps = context["fps"]
+    # Calculate global time for the user video.
+    global_time = t + context.get("user_offset", 0)
+    
+    # Log the values for debugging
+    logger.debug("Corner pin effect: t=%.3f, user_offset=%.3f, global_time=%.3f", 
+                t, context.get("user_offset", 0), global_time)
+    logger.debug("User clip duration %.3f", context["user_clip"].duration)
+    
+    # Select the frame from user_clip based on the global time.
+    in_clip = global_time < context["user_clip"].duration
+    if in_clip:
+        user_frame = context["user_clip"].get_frame(global_time)
+    else:
+        h, w = context["output_size"][1], context["output_size"][0]
+        user_frame = black_frame(context, (h, w, 3))
+        logger.debug("Using black frame (past user clip duration)")
+    
+    frame_num = str(round(t * fps))
+    scaled_corners = tracked_corners(int(frame_num), context)
+    
+    if scaled_corners is not None:
+        # Sample a user frame downscaled to about the quad's size; the
+        # homography below is built for whichever size is warped.
+        if in_clip:
+            level = mip_level(scaled_corners, (user_frame.shape[1], user_frame.shape[0]))
+            user_frame = user_frame_mip(user_frame, level, context)
         
-        # Log the values for debugging
-        logger.debug("Corner pin effect: t=%.3f, user_offset=%.3f, global_time=%.3f", 
-                    t, context.get("user_offset", 0), global_time)
-        logger.debug("User clip duration %.3f", context["user_clip"].duration)
+        # A compiled track carries the frame's homography; the JSON path
+        # computes it in apply_corner_pin.
+        matrix = None
+        if context.get("corner_pin_track") is not None:
+            matrix = context["corner_pin_track"].homography(
+                int(frame_num), (user_frame.shape[1], user_frame.shape[0])
+            )
         
-        # Select the frame from user_clip based on the global time.
-        if global_time < context["user_clip"].duration:
-            user_frame = context["user_clip"].get_frame(global_time)
-        else:
-            h, w = context["output_size"][1], context["output_size"][0]
-            user_frame = np.zeros((h, w, 3), dtype=np.uint8)
-            logger.debug("Using black frame (past user clip duration)")
+        # Only the quad's bounding box (grown by the blur radius, so the
+        # glow halo fits) can change; everything else is the input frame.
+        padding = WARP_MARGIN
+        if blur_enabled:
+            padding += blur_kernel_size(blur_sigma) // 2
+        roi = corner_pin_roi(scaled_corners, context["output_size"], padding)
+        if roi is None:
+            return None
+        x0, y0, x1, y1 = roi
+        roi_shape = (y1 - y0, x1 - x0, 3)
         
-        frame_num = str(round(t * fps))
+        # Warp straight into the ROI by shifting the corners (and the
+        # track's matrix) by its origin. OpenCV spreads the warp over its
+        # own threads, so unlike the kernels below it is not tiled here.
+        roi_corners = {key: [x - x0, y - y0] for key, (x, y) in scaled_corners.items()}
+        if matrix is not None:
+            matrix = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64) @ matrix
+        warped = apply_corner_pin(
+            user_frame, roi_corners, (x1 - x0, y1 - y0), matrix,
+            out=scratch(context, "corner_pin.warped", roi_shape),
+        )
         
-        if frame_num in context["corner_pin_data"]:
-            corners = context["corner_pin_data"][frame_num]
-            
-            # Scale the corners using the old version's approach
-            original_resolution = 3840  # Source width from After Effects
-            current_width = 1920        # Target width
-            scale_factor = current_width / original_resolution  # Back to original scaling
+        if use_mask:
+            # Use the pre-baked matte for this frame when the scene has one.
+            matte_clip = context.get("matte_clip")
+            if matte_clip is not None and int(frame_num) < matte_clip.nframes:
+                matte = matte_clip.get_frame_index(int(frame_num))[y0:y1, x0:x1]
+            else:
+                matte = corner_pin_matte(scaled_corners, t, context, roi)
+        else:
+            # Opaque wherever the warped user frame has content.
+            matte = warped.any(axis=2).astype(np.uint8) * np.uint8(255)
+        # Everything but the blur is per-pixel, so it runs in horizontal
+        # stripes of the ROI (see tiling.py); the blur tiles itself with a halo.
+        stripes = stripe_count(roi_shape, context)
+        expanded = matte if matte.ndim == 3 else buffer(context, "corner_pin.matte", roi_shape)
+        masked_content = buffer(context, "corner_pin.masked", roi_shape)
+        composite = buffer(context, "corner_pin.composite", roi_shape)
+        
+        def mask_stripe(r0, r1, stripe_context):
+            rows, pool = slice(r0, r1), stripe_context.get("frame_pool")
+            kernels.expand_matte(matte[rows], out=expanded[rows])
             
-            # Scale both X and Y coordinates with the same factor to maintain aspect ratio
-            scaled_corners = {
-                'ul': [int(corners['ul'][0] * scale_factor), int(corners['ul'][1] * scale_factor)],
-                'ur': [int(corners['ur'][0] * scale_factor), int(corners['ur'][1] * scale_factor)],
-                'lr': [int(corners['lr'][0] * scale_factor), int(corners['lr'][1] * scale_factor)],
-                'll': [int(corners['ll'][0] * scale_factor), int(corners['ll'][1] * scale_factor)]
-            }
+            # First apply the mask to get the masked content
+            kernels.premultiply(warped[rows], expanded[rows], out=masked_content[rows], pool=pool)
             
-            logger.debug(
-                "Corner pin scaling",
-                original_corners=corners,
-                scaled_corners=scaled_corners,
-                scale_factor=scale_factor,
-                original_resolution=original_resolution,
-                current_width=current_width
+            # Composite in place over a copy of the frame's region.
+            np.copyto(composite[rows], frame[y0 + r0:y0 + r1, x0:x1])
+            if not blur_enabled:
+                # Just composite the original content
+                kernels.alpha_over(masked_content[rows], composite[rows], expanded[rows], out=composite[rows], pool=pool)
+        
+        run_stripes(mask_stripe, roi_shape[0], stripes, context)
+        
+        if blur_enabled:
+            # Create a blurred version of the masked content
+            blurred_content = gauss_blur_effect(
+                masked_content, t, context, sigma=blur_sigma,
+                out=scratch(context, "corner_pin.blurred", roi_shape),
             )
             
-            warped = apply_corner_pin(user_frame, scaled_corners, context["output_size"])
-            
-            if use_mask:
-                h, w = context["output_size"][1], context["output_size"][0]
-                corner_mask = np.zeros((h, w), dtype=np.uint8)
-                pts = np.array([scaled_corners['ul'], scaled_corners['ur'], scaled_corners['lr'], scaled_corners['ll']], dtype=np.int32)
-                pts = pts.reshape((-1, 1, 2))
-                cv2.fillConvexPoly(corner_mask, pts, 255)
-                corner_mask_3 = cv2.cvtColor(corner_mask, cv2.COLOR_GRAY2BGR)
-                corner_mask_norm = corner_mask_3.astype(np.float32) / 255.0
-                
-                if "mask_clip" in context and context["mask_clip"] is not None:
-                    if t < context["mask_clip"].duration:
-                        matte_mask_frame = context["mask_clip"].get_frame(t)
-                    else:
-                        matte_mask_frame = np.zeros((h, w), dtype=np.uint8)
-                    if matte_mask_frame.ndim == 3 and matte_mask_frame.shape[2] == 3:
-                        matte_mask_gray = cv2.cvtColor(matte_mask_frame, cv2.COLOR_RGB2GRAY)
-                    else:
-                        matte_mask_gray = matte_mask_frame
-                    matte_mask_norm = matte_mask_gray.astype(np.float32) / 255.0
-                    matte_mask_3 = cv2.merge([matte_mask_norm, matte_mask_norm, matte_mask_norm])
-                else:
-                    matte_mask_3 = np.ones_like(corner_mask_norm)
-                
-                final_mask = corner_mask_norm * matte_mask_3
-                
-                # First apply the mask to get the masked content
-                masked_content = (warped.astype(np.float32) * final_mask).astype(np.uint8)
+            def glow_stripe(r0, r1, stripe_context):
+                rows, pool = slice(r0, r1), stripe_context.get("frame_pool")
+                # Create a glow layer by blending the blurred content with the original
+                glow_layer = cv2.addWeighted(
+                    masked_content[rows], 1 - blur_opacity, blurred_content[rows], blur_opacity, 0,
+                    dst=blurred_content[rows],
+                )
                 
-                if blur_enabled:
-                    # Create a blurred version of the masked content
-                    blurred_content = gauss_blur_effect(masked_content, t, context, sigma=blur_sigma)
-                    
-                    # Create a glow layer by blending the blurred content with the original
-                    glow_layer = cv2.addWeighted(masked_content, 1 - blur_opacity, blurred_content, blur_opacity, 0)
-                    
-                    # Composite the glow layer behind the original content
-                    # First, composite the glow onto the background
-                    composite = (glow_layer.astype(np.float32) +
-                                frame.astype(np.float32) * (1 - final_mask)).astype(np.uint8)
-                    
-                    # Then, composite the original sharp content on top
-                    composite = (masked_content.astype(np.float32) * final_mask +
-                                composite.astype(np.float32) * (1 - final_mask)).astype(np.uint8)
-                else:
-                    # Just composite the original content
-                    composite = (masked_content.astype(np.float32) +
-                                frame.astype(np.float32) * (1 - final_mask)).astype(np.uint8)
-            else:
-                user_mask = np.any(warped != 0, axis=2).astype(np.uint8)
-                user_mask_3 = cv2.merge([user_mask, user_mask, user_mask]).astype(np.float32)
-                
-                # First apply the mask to get the masked content
-                masked_content = (warped.astype(np.float32) * user_mask_3).astype(np.uint8)
+                # Composite the glow layer behind the original content
+                # First, composite the glow onto the background
+                kernels.alpha_over(glow_layer, composite[rows], expanded[rows], out=composite[rows], pool=pool)
                 
-                if blur_enabled:
-                    # Create a blurred version of the masked content
-                    blurred_content = gauss_blur_effect(masked_content, t, context, sigma=blur_sigma)
-                    
-                    # Create a glow layer by blending the blurred content with the original
-                    glow_layer = cv2.addWeighted(masked_content, 1 - blur_opacity, blurred_content, blur_opacity, 0)
-                    
-                    # Composite the glow layer behind the original content
-                    # First, composite the glow onto the background
-                    composite = (glow_layer.astype(np.float32) +
-                                frame.astype(np.float32) * (1 - user_mask_3)).astype(np.uint8)
-                    
-                    # Then, composite the original sharp content on top
-                    composite = (masked_content.astype(np.float32) * user_mask_3 +
-                                composite.astype(np.float32) * (1 - user_mask_3)).astype(np.uint8)
-                else:
-                    # Just composite the original content
-                    composite = (masked_content.astype(np.float32) +
-                                frame.astype(np.float32) * (1 - user_mask_3)).astype(np.uint8)
+                # Then, composite the original sharp content on top
+                kernels.lerp(masked_content[rows], composite[rows], expanded[rows], out=composite[rows], pool=pool)
             
-            return composite
-        else:
-            logger.warning("No corner pin data found for frame", frame_number=frame_num)
+            run_stripes(glow_stripe, roi_shape[0], stripes, context)
+        
+        return roi, composite
+    else:
+        logger.warning("No corner pin data found for frame", frame_number=frame_num)
+        return None
+
+def corner_pin_effect(frame, t, use_mask, context, blur_enabled=False, blur_sigma=1.5, blur_opacity=0.3, out=None):
+    """
+    Applies a corner-pin transformation on the user layer and composites it
+    over the current frame. Only the layer's region of interest is rendered
+    (see corner_pin_region); the rest of the frame is passed through.
+    
+    Args:
+        frame: Current frame
+        t: Current time
+        use_mask: Whether to use the mask clip
+        context: Context dictionary containing clips and data
+        blur_enabled: Whether to apply blur effect
+        blur_sigma: Sigma value for Gaussian blur
+        blur_opacity: Opacity of the blurred version (0.0 to 1.0)
+        out: Optional destination frame; may be the input frame itself
+    """
+    try:
+        region = corner_pin_region(frame, t, use_mask, context, blur_enabled, blur_sigma, blur_opacity)
+        if region is None:
             return frame
+        (x0, y0, x1, y1), pixels = region
+        if out is None:
+            out = frame.copy()
+        elif out is not frame:
+            np.copyto(out, frame)
+        out[y0:y1, x0:x1] = pixels
+        return out
     except Exception as e:
         logger.error("Error in corner_pin_effect", error=str(e), exc_info=True)
         raise
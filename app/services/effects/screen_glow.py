@@ -1,15 +1,19 @@
 import cv2
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .blur_effect import gauss_blur_effect
 from .blending_effects import screen_blend
+from . import kernels
+from .frame_pool import scratch
+from .tiling import run_stripes, stripe_count
 
 def screen_glow_effect(
     frame: np.ndarray,
     t: float,
     context: Dict[str, Any],
     blur_sigma: float = 2.0,
-    glow_opacity: float = 0.5
+    glow_opacity: float = 0.5,
+    out: Optional[np.ndarray] = None
 ) -> np.ndarray:
     """
     Creates a screen glow effect by blurring the input frame and blending it with the original.
@@ -20,19 +24,26 @@ def screen_glow_effect(
         context (Dict[str, Any]): Additional context
         blur_sigma (float): Standard deviation for Gaussian blur
         glow_opacity (float): Opacity of the glow effect (0.0 to 1.0)
+        out (Optional[np.ndarray]): Destination frame; may be the input frame itself
         
     Returns:
         np.ndarray: Frame with glow effect applied
     """
-    # Create a blurred version of the frame
-    blurred = gauss_blur_effect(frame, t, context, sigma=blur_sigma)
+    # Create a blurred version of the frame (tiled with a halo of rows)
+    blurred = gauss_blur_effect(
+        frame, t, context, sigma=blur_sigma, out=scratch(context, "screen_glow.blurred", frame.shape)
+    )
+    if out is None:
+        out = np.empty_like(frame)
     
-    # Screen blend the blurred version with the original
-    # This creates the glow effect
-    glow = screen_blend(frame, blurred)
-    
-    # Blend the glow with the original frame based on opacity
-    result = (frame.astype(np.float32) * (1 - glow_opacity) +
-             glow.astype(np.float32) * glow_opacity).astype(np.uint8)
+    def glow_stripe(y0, y1, stripe_context):
+        # Screen blend the blurred version with the original
+        # This creates the glow effect
+        glow = screen_blend(frame[y0:y1], blurred[y0:y1], out=blurred[y0:y1], pool=stripe_context.get("frame_pool"))
+        
+        # Blend the glow with the original frame based on opacity
+        kernels.mix(frame[y0:y1], glow, glow_opacity, out=out[y0:y1])
     
-    return result 
\ No newline at end of file
+    # Every step after the blur is per-pixel, so stripes need no halo.
+    run_stripes(glow_stripe, frame.shape[0], stripe_count(frame.shape, context), context)
+    return out
@@ -0,0 +1,110 @@
+# app/services/effects/tiling.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config.resources import cpu_limit
+
+# Horizontal-stripe tiling of a single frame.
+#
+# Effects split their kernels into bands of whole rows and run the bands on
+# a thread pool shared by the process. Row bands of a C-contiguous frame are
+# contiguous, so OpenCV and NumPy write straight into slices of the
+# destination, and the per-pixel kernels give exactly the untiled result.
+# Blurs read a halo of rows past each band (see blur_effect.blur_halo).
+#
+# Each band gets its own context with a child FramePool (FramePool.stripe)
+# and tile_stripes pinned to 1, so bands never share scratch buffers and
+# never tile again inside a band.
+
+TILE_STRIPES_ENV = "RENDER_TILE_STRIPES"  # stripes per frame; automatic by default
+
+# A band must be worth a thread hand-off: at least this many rows and
+# pixels, and several times the rows its halo adds.
+TILE_MIN_ROWS = 32
+TILE_MIN_PIXELS = 1 << 17
+TILE_HALO_RATIO = 4
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def tile_executor() -> ThreadPoolExecutor:
+    """The shared tiling pool, sized to the CPU limit (recreated after a fork)."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=cpu_limit(), thread_name_prefix="tile")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def stripe_count(shape: Tuple[int, ...], context: Optional[Dict[str, Any]] = None, halo: int = 0) -> int:
+    """
+    Number of stripes to split a frame (or region) of shape into.
+    context["tile_stripes"] or RENDER_TILE_STRIPES fix it; otherwise it is
+    context["tile_cpus"] (the CPUs this render may use, the CPU limit by
+    default), reduced until every stripe holds at least TILE_MIN_ROWS rows
+    (and TILE_HALO_RATIO times its halo) and TILE_MIN_PIXELS pixels.
+    """
+    rows, cols = shape[0], shape[1]
+    context = context or {}
+    forced = context.get("tile_stripes") or os.getenv(TILE_STRIPES_ENV)
+    if forced:
+        return max(1, min(int(forced), rows))
+    min_rows = max(TILE_MIN_ROWS, TILE_HALO_RATIO * halo)
+    cpus = context.get("tile_cpus") or cpu_limit()
+    return max(1, min(cpus, rows // min_rows, rows * cols // TILE_MIN_PIXELS))
+
+
+def stripe_bounds(rows: int, stripes: int, align: int = 1) -> List[Tuple[int, int]]:
+    """(y0, y1) row ranges of about equal height, starting on multiples of align."""
+    edges = [0]
+    for index in range(1, stripes):
+        edge = round(rows * index / stripes / align) * align
+        if edges[-1] < edge < rows:
+            edges.append(edge)
+    edges.append(rows)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def stripe_context(context: Optional[Dict[str, Any]], index: int) -> Dict[str, Any]:
+    """The context a stripe's kernels run with (see the module notes)."""
+    context = dict(context or {}, tile_stripes=1)
+    pool = context.get("frame_pool")
+    if pool is not None:
+        context["frame_pool"] = pool.stripe(index)
+    return context
+
+
+def run_stripes(
+    fn: Callable[[int, int, Dict[str, Any]], Any],
+    rows: int,
+    stripes: int,
+    context: Optional[Dict[str, Any]] = None,
+    align: int = 1,
+) -> None:
+    """
+    Calls fn(y0, y1, stripe_context) for every stripe of rows and returns
+    once all of them are done. A single stripe runs inline with context
+    itself; otherwise the calling thread takes the first stripe and the
+    shared pool the rest. The first exception raised by a stripe is
+    re-raised here.
+    """
+    bounds = stripe_bounds(rows, stripes, align)
+    if len(bounds) == 1:
+        fn(0, rows, context if context is not None else {})
+        return
+    contexts = [stripe_context(context, index) for index in range(len(bounds))]
+    executor = tile_executor()
+    futures = [executor.submit(fn, y0, y1, contexts[index]) for index, (y0, y1) in enumerate(bounds) if index]
+    try:
+        fn(bounds[0][0], bounds[0][1], contexts[0])
+    finally:
+        # Wait for every stripe, so none is still writing when this returns.
+        errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
@@ -0,0 +1,288 @@
+# app/services/encoder.py
+
+import queue
+import tempfile
+import threading
+import subprocess as sp
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from moviepy.config import get_setting
+from app.config.logging import get_logger
+from app.config.renditions import rendition_profile
+from app.config.resources import cpu_limit
+
+logger = get_logger(component="encoder")
+
+DEFAULT_PRESET = "medium"
+DEFAULT_CRF = 23
+# None uses the worker's CPU limit (its cgroup quota); 0 lets libx264 pick
+# from the visible cores, which oversubscribes small containers on big hosts.
+DEFAULT_THREADS = None
+DEFAULT_QUEUE_SIZE = 8
+
+_STOP = object()
+
+
+def x264_rate_args(
+    tune: Optional[str] = None, gop: Optional[int] = None, maxrate: Optional[str] = None, bufsize: Optional[str] = None,
+) -> List[str]:
+    """The optional libx264 arguments of an encoder profile (see app.config.encoder_profiles)."""
+    args: List[str] = []
+    if tune:
+        args += ["-tune", tune]
+    if gop:
+        args += ["-g", str(gop)]
+    if maxrate:
+        args += ["-maxrate", str(maxrate), "-bufsize", str(bufsize or maxrate)]
+    return args
+
+
+class FrameEncoder:
+    """
+    Encoder sink that writes NumPy frames straight into a persistent
+    ffmpeg/libx264 stdin pipe.
+
+    Frames are handed to a writer thread through a bounded queue, so the
+    caller can composite frame N+1 while ffmpeg is still consuming frame N.
+    A frame passed to ``write_frame`` must not be modified until
+    ``max_pending_frames`` further frames have been written.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        size: Tuple[int, int],
+        fps: float = 24,
+        preset: str = DEFAULT_PRESET,
+        crf: int = DEFAULT_CRF,
+        threads: Optional[int] = DEFAULT_THREADS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        tune: Optional[str] = None,
+        gop: Optional[int] = None,
+        maxrate: Optional[str] = None,
+        bufsize: Optional[str] = None,
+    ) -> None:
+        self.output_path = output_path
+        self.size = (int(size[0]), int(size[1]))
+        self.fps = fps
+        self.preset = preset
+        self.crf = crf
+        self.threads = cpu_limit() if threads is None else threads
+        self.tune = tune
+        self.gop = gop
+        self.maxrate = maxrate
+        self.bufsize = bufsize
+        self.frames_written = 0
+        # Frames passed to write_frame that may still be read: the queued ones
+        # plus the one the writer thread is sending.
+        self.max_pending_frames = max(1, queue_size) + 1
+
+        w, h = self.size
+        self._shape = (h, w, 3)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        cmd = [
+            get_setting("FFMPEG_BINARY"), "-y",
+            "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-s", f"{w}x{h}",
+            "-r", str(fps),
+            "-i", "-",
+        ] + self._output_args()
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = sp.Popen(cmd, stdin=sp.PIPE, stdout=sp.DEVNULL, stderr=self._stderr)
+        self._writer = threading.Thread(target=self._drain, name="frame-encoder", daemon=True)
+        self._writer.start()
+        logger.debug(
+            "encoder_started",
+            output_path=output_path,
+            size=self.size,
+            preset=preset,
+            crf=crf,
+            threads=threads,
+        )
+
+    def _output_args(self) -> List[str]:
+        return [
+            "-an",
+            "-c:v", "libx264",
+            "-preset", self.preset,
+            "-crf", str(self.crf),
+        ] + x264_rate_args(self.tune, self.gop, self.maxrate, self.bufsize) + [
+            "-threads", str(self.threads),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            self.output_path,
+        ]
+
+    def _drain(self) -> None:
+        """Writer thread: move queued frames into ffmpeg's stdin."""
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is _STOP:
+                    break
+                self._proc.stdin.write(memoryview(frame).cast("B"))
+        except BaseException as e:  # noqa: B036 - re-raised on the caller's thread
+            self._error = e
+            # Keep consuming so a blocked producer can make progress and see the error.
+            while self._queue.get() is not _STOP:
+                pass
+
+    def write_frame(self, frame: np.ndarray) -> None:
+        """Queue one RGB uint8 frame of the configured size for encoding."""
+        if self._error is not None:
+            raise IOError(f"Encoder for {self.output_path} failed: {self._error}")
+        if frame.shape != self._shape:
+            raise ValueError(
+                f"Frame shape {frame.shape} does not match encoder shape {self._shape}"
+            )
+        self._queue.put(np.ascontiguousarray(frame, dtype=np.uint8))
+        self.frames_written += 1
+
+    def _stderr_text(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode("utf8", errors="replace").strip()
+
+    def close(self) -> None:
+        """Flush queued frames, finish the stream and check ffmpeg's exit status."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        returncode = self._proc.wait()
+        stderr = self._stderr_text()
+        self._stderr.close()
+
+        if self._error is not None or returncode != 0:
+            logger.error("encoder_failed", output_path=self.output_path, error=stderr)
+            raise IOError(f"Failed to encode {self.output_path}: {stderr or self._error}")
+        logger.debug("encoder_finished", output_path=self.output_path, frames=self.frames_written)
+
+    def abort(self) -> None:
+        """Stop ffmpeg without waiting for queued frames."""
+        if self._closed:
+            return
+        self._closed = True
+        self._proc.kill()
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._proc.wait()
+        self._stderr.close()
+
+    def __enter__(self) -> "FrameEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def rendition_output_args(
+    outputs: Dict[str, str],
+    size: Tuple[int, int],
+    preset: Optional[str] = None,
+    crf: Optional[int] = None,
+    threads: Optional[int] = DEFAULT_THREADS,
+    tune: Optional[str] = None,
+    gop: Optional[int] = None,
+) -> List[str]:
+    """
+    ffmpeg arguments that fan the first input's video out to several
+    renditions (see app.config.renditions) through one split/scale graph.
+    outputs maps rendition names to output paths. preset and crf override
+    the libx264 renditions' own (e.g. for preview drafts); tune and gop
+    apply to them too.
+    """
+    threads = cpu_limit() if threads is None else threads
+    names = list(outputs)
+    graph = [f"[0:v]split={len(names)}" + "".join(f"[s{i}]" for i in range(len(names)))]
+    args: List[str] = []
+    for index, name in enumerate(names):
+        profile = rendition_profile(name)
+        filters = [f"fps={profile['fps']}"] if profile.get("fps") else []
+        height = min(profile["height"], int(size[1]))
+        filters.append(f"scale=-2:{height}:flags=area")
+        graph.append(f"[s{index}]{','.join(filters)}[r{index}]")
+
+        args += ["-map", f"[r{index}]", "-an"]
+        if profile.get("duration"):
+            args += ["-t", str(profile["duration"])]
+        args += ["-c:v", profile["codec"], "-threads", str(threads)]
+        if profile.get("pix_fmt"):
+            args += ["-pix_fmt", profile["pix_fmt"]]
+        if profile["codec"] == "libx264":
+            args += [
+                "-preset", preset or profile["preset"],
+                "-crf", str(crf if crf is not None else profile["crf"]),
+            ] + x264_rate_args(tune, gop) + [
+                "-movflags", "+faststart",
+            ]
+        else:
+            args += profile.get("args", [])
+        args.append(outputs[name])
+    return ["-filter_complex", ";".join(graph)] + args
+
+
+class RenditionEncoder(FrameEncoder):
+    """
+    FrameEncoder that encodes every frame into several renditions at once:
+    outputs maps rendition names to output paths. The raw frames cross the
+    pipe once and ffmpeg splits and scales them for each encoder.
+    """
+
+    def __init__(
+        self,
+        outputs: Dict[str, str],
+        size: Tuple[int, int],
+        fps: float = 24,
+        preset: Optional[str] = None,
+        crf: Optional[int] = None,
+        threads: Optional[int] = DEFAULT_THREADS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        tune: Optional[str] = None,
+        gop: Optional[int] = None,
+    ) -> None:
+        if not outputs:
+            raise ValueError("RenditionEncoder needs at least one output")
+        self.outputs = dict(outputs)
+        super().__init__(
+            ", ".join(self.outputs.values()), size, fps=fps, preset=preset, crf=crf,
+            threads=threads, queue_size=queue_size, tune=tune, gop=gop,
+        )
+
+    def _output_args(self) -> List[str]:
+        return rendition_output_args(
+            self.outputs, self.size, self.preset, self.crf, self.threads, self.tune, self.gop
+        )
+
+
+def transcode_renditions(
+    source_path: str, outputs: Dict[str, str], size: Tuple[int, int], threads: Optional[int] = DEFAULT_THREADS,
+) -> None:
+    """
+    Encodes the renditions in outputs from an already rendered video (e.g. an
+    assembled timeline), decoding it once for all of them.
+    """
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y",
+        "-loglevel", "error",
+        "-i", source_path,
+    ] + rendition_output_args(outputs, size, threads=threads)
+    try:
+        sp.run(cmd, stdin=sp.DEVNULL, capture_output=True, check=True)
+    except sp.CalledProcessError as e:
+        error = e.stderr.decode("utf8", errors="replace").strip()
+        logger.error("rendition_transcode_failed", file=source_path, error=error)
+        raise OSError(f"Failed to encode renditions of {source_path}: {error}")
+    logger.debug("renditions_encoded", source=source_path, renditions=list(outputs))
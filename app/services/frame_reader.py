@@ -0,0 +1,157 @@
+# app/services/frame_reader.py
+
+import subprocess as sp
+import numpy as np
+from typing import Optional, Tuple
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from app.config.logging import get_logger
+
+logger = get_logger(component="frame_reader")
+
+# Bytes per pixel for the rawvideo formats we decode into.
+PIX_FMT_DEPTH = {
+    "rgb24": 3,
+    "gray": 1,
+}
+
+# Forward jumps larger than this are served by restarting ffmpeg with a seek
+# instead of decoding and discarding the frames in between.
+MAX_SKIP_FRAMES = 48
+
+
+def scaled_size(size: Tuple[int, int], scale: float) -> Tuple[int, int]:
+    """(width, height) scaled by scale and rounded to even numbers, as yuv420p needs."""
+    if scale == 1:
+        return tuple(size)
+    return tuple(max(2, int(round(d * scale / 2)) * 2) for d in size)
+
+
+class FrameReader:
+    """
+    Frame-indexed reader that streams a video once, in order, from an ffmpeg
+    rawvideo pipe.
+
+    Sequential access (frame N, then N or N+1) costs one pipe read per frame.
+    Backward or long forward jumps restart the pipe at the requested frame.
+    Exposes ``duration``, ``size``, ``fps`` and ``get_frame(t)`` so it can be
+    dropped into the effect context in place of a MoviePy clip. With scale,
+    ffmpeg area-downsamples every frame (see scaled_size for the size).
+    """
+
+    def __init__(self, path: str, pix_fmt: str = "rgb24", scale: float = 1.0) -> None:
+        if pix_fmt not in PIX_FMT_DEPTH:
+            raise ValueError(f"Unsupported pixel format: {pix_fmt}")
+
+        infos = ffmpeg_parse_infos(path)
+        if not infos.get("video_found"):
+            raise IOError(f"No video stream found in {path}")
+
+        self.path = path
+        self.pix_fmt = pix_fmt
+        self.fps = infos["video_fps"]
+        self.scale = scale
+        self.size: Tuple[int, int] = scaled_size(infos["video_size"], scale)
+        self.duration = infos["video_duration"]
+        self.nframes = infos["video_nframes"]
+
+        w, h = self.size
+        self._depth = PIX_FMT_DEPTH[pix_fmt]
+        self._frame_bytes = w * h * self._depth
+        self._shape = (h, w) if self._depth == 1 else (h, w, self._depth)
+
+        self._proc: Optional[sp.Popen] = None
+        self._next_index = 0
+        self._last_index = -1
+        self._last_frame: Optional[np.ndarray] = None
+
+    def _open(self, start_index: int = 0) -> None:
+        """(Re)start the ffmpeg pipe so the next read returns ``start_index``."""
+        self._close_proc()
+
+        cmd = [get_setting("FFMPEG_BINARY"), "-loglevel", "error"]
+        if start_index > 0:
+            cmd += ["-ss", "%.06f" % (start_index / self.fps)]
+        cmd += ["-i", self.path, "-an"]
+        if self.scale != 1:
+            cmd += ["-vf", "scale=%d:%d:flags=area" % self.size]
+        cmd += [
+            "-f", "rawvideo",
+            "-pix_fmt", self.pix_fmt,
+            "-",
+        ]
+        self._proc = sp.Popen(
+            cmd,
+            stdin=sp.DEVNULL,
+            stdout=sp.PIPE,
+            stderr=sp.DEVNULL,
+            bufsize=self._frame_bytes,
+        )
+        self._next_index = start_index
+        logger.debug("frame_reader_opened", path=self.path, start_index=start_index)
+
+    def _read_next(self) -> Optional[np.ndarray]:
+        data = self._proc.stdout.read(self._frame_bytes)
+        if len(data) != self._frame_bytes:
+            return None
+        self._next_index += 1
+        return np.frombuffer(data, dtype=np.uint8).reshape(self._shape)
+
+    def get_frame_index(self, index: int) -> np.ndarray:
+        """
+        Return frame ``index`` as a read-only uint8 array.
+
+        Past the end of the stream the last decoded frame is returned, which
+        matches MoviePy's behaviour for trailing partial frames.
+        """
+        index = max(0, min(index, self.nframes - 1))
+        if index == self._last_index:
+            return self._last_frame
+
+        if (
+            self._proc is None
+            or index < self._next_index
+            or index - self._next_index > MAX_SKIP_FRAMES
+        ):
+            self._open(index)
+
+        frame = None
+        while self._next_index <= index:
+            frame = self._read_next()
+            if frame is None:
+                break
+
+        if frame is None:
+            if self._last_frame is None:
+                raise IOError(f"Failed to read frame {index} from {self.path}")
+            logger.debug("frame_reader_short_read", path=self.path, index=index)
+            return self._last_frame
+
+        self._last_index = index
+        self._last_frame = frame
+        return frame
+
+    def frame_index(self, t: float) -> int:
+        """Map a time in seconds to a frame index the way MoviePy does."""
+        return int(self.fps * t + 0.00001)
+
+    def get_frame(self, t: float) -> np.ndarray:
+        return self.get_frame_index(self.frame_index(t))
+
+    def _close_proc(self) -> None:
+        if self._proc is not None:
+            self._proc.stdout.close()
+            self._proc.terminate()
+            self._proc.wait()
+            self._proc = None
+
+    def close(self) -> None:
+        self._close_proc()
+        self._last_frame = None
+        self._last_index = -1
+
+    def __enter__(self) -> "FrameReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
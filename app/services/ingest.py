@@ -0,0 +1,174 @@
+# app/services/ingest.py
+
+import os
+import uuid
+import subprocess as sp
+from typing import Any, Dict, Optional, Tuple
+from moviepy.config import get_setting
+from app.config import load_mockup_config
+from app.config.logging import get_logger
+from app.services.corner_pin_track import load_corner_pin_track
+from app.services.media_probe import probe_streams
+
+logger = get_logger(component="ingest")
+
+# User uploads are normalised once into a "mezzanine": constant 24 fps,
+# 8-bit 4:2:0 H.264 with a short, B-frame free GOP (cheap to seek and decode
+# in order), no larger than the biggest screen any template pins it into.
+MEZZANINE_FPS = 24
+MEZZANINE_GOP = 12
+MEZZANINE_CRF = 16
+MEZZANINE_PRESET = "veryfast"
+# Bump when the mezzanine encoding changes, so stale ones are rebuilt.
+MEZZANINE_VERSION = 1
+MEZZANINE_MAX_SIZE_ENV = "MEZZANINE_MAX_SIZE"  # "WxH" override of the template-derived cap
+DEFAULT_MAX_SIZE = (1920, 1920)
+
+_max_quad_size: Optional[Tuple[int, int]] = None
+
+
+class MezzanineNotReady(Exception):
+    """The mezzanine of an upload has not been built yet (see fetch_mezzanine)."""
+
+
+class UploadNotFound(Exception):
+    """There is no upload with the given key (or it has expired)."""
+
+
+def mezzanine_key(video_key: str) -> str:
+    """Storage key of an upload's mezzanine, next to the original."""
+    return f"{os.path.splitext(video_key)[0]}.mezz{MEZZANINE_VERSION}.mp4"
+
+
+def max_quad_size() -> Tuple[int, int]:
+    """
+    (width, height) of the largest screen quad bounding box across every
+    template scene, computed once per process from the corner pin tracks.
+    Larger user frames only get shrunk again by the corner pin warp.
+    """
+    global _max_quad_size
+    override = os.getenv(MEZZANINE_MAX_SIZE_ENV)
+    if override:
+        w, h = override.lower().split("x")
+        return int(w), int(h)
+    if _max_quad_size is not None:
+        return _max_quad_size
+
+    max_w = max_h = 0
+    for mockup in load_mockup_config().values():
+        for scene in mockup.get("scenes", []):
+            path = scene.get("assets", {}).get("corner_pin_data")
+            if not path or not os.path.exists(path):
+                continue
+            track = load_corner_pin_track(path)
+            corners = track.corners[track.valid]
+            if len(corners):
+                extent = corners.max(axis=1) - corners.min(axis=1)
+                max_w = max(max_w, int(extent[:, 0].max()) + 1)
+                max_h = max(max_h, int(extent[:, 1].max()) + 1)
+    _max_quad_size = (max_w, max_h) if max_w and max_h else DEFAULT_MAX_SIZE
+    return _max_quad_size
+
+
+def mezzanine_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    The upload's size scaled down (never up), keeping its aspect ratio,
+    until one side matches the quad it has to cover; even numbers.
+    """
+    w, h = size
+    scale = min(1.0, max(max_size[0] / w, max_size[1] / h))
+    return max(2, int(round(w * scale / 2)) * 2), max(2, int(round(h * scale / 2)) * 2)
+
+
+def normalize_upload(source_path: str, output_path: str, max_size: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """
+    Transcodes an upload into a mezzanine at output_path. Variable frame
+    rate captures are resampled to a constant MEZZANINE_FPS; 10-bit and
+    4:2:2/4:4:4 sources become 8-bit 4:2:0; the first audio stream is kept.
+    Returns {"size": (w, h), "audio": bool}.
+    """
+    info = probe_streams(source_path)
+    if info is None or info["video"] is None:
+        raise ValueError(f"No video stream found in {source_path}")
+    video = info["video"]
+    size = (int(video["width"]), int(video["height"]))
+    # Phone captures store rotation as metadata; ffmpeg applies it while decoding.
+    rotation = int(video.get("tags", {}).get("rotate", 0)) % 180
+    for side_data in video.get("side_data_list", []):
+        rotation = int(side_data.get("rotation", rotation)) % 180
+    if rotation:
+        size = size[::-1]
+    target = mezzanine_size(size, max_size or max_quad_size())
+
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y",
+        "-loglevel", "error",
+        "-i", source_path,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-vf", f"fps={MEZZANINE_FPS},scale={target[0]}:{target[1]}:flags=area",
+        "-c:v", "libx264",
+        "-preset", MEZZANINE_PRESET,
+        "-crf", str(MEZZANINE_CRF),
+        "-pix_fmt", "yuv420p",
+        "-g", str(MEZZANINE_GOP),
+        "-keyint_min", str(MEZZANINE_GOP),
+        "-sc_threshold", "0",
+        "-bf", "0",
+        "-c:a", "aac",
+        "-b:a", "192k",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    try:
+        sp.run(cmd, stdin=sp.DEVNULL, capture_output=True, check=True)
+    except sp.CalledProcessError as e:
+        error = e.stderr.decode("utf8", errors="replace").strip()
+        logger.error("mezzanine_encode_failed", file=source_path, error=error)
+        raise OSError(f"Failed to normalise upload {source_path}: {error}")
+    logger.info("mezzanine_created", source_size=list(size), size=list(target), audio=info["audio"] is not None)
+    return {"size": target, "audio": info["audio"] is not None}
+
+
+def ingest_upload(video_key: str, storage, local_path: Optional[str] = None) -> str:
+    """
+    Builds and stores the mezzanine of an uploaded video unless it already
+    exists, and returns its storage key. With local_path, the mezzanine is
+    also left there for rendering, without downloading it a second time.
+    """
+    key = mezzanine_key(video_key)
+    if storage.object_exists(key):
+        if local_path is not None:
+            storage.get_object(key, local_path)
+        return key
+
+    token = uuid.uuid4()
+    source_path = f"/tmp/{token}_source"
+    output_path = local_path or f"/tmp/{token}_mezz.mp4"
+    try:
+        storage.get_object(video_key, source_path)
+        normalize_upload(source_path, output_path)
+        storage.put_object(key, output_path)
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+        if local_path is None and os.path.exists(output_path):
+            os.remove(output_path)
+    return key
+
+
+def fetch_mezzanine(video_key: str, storage, local_path: str) -> str:
+    """
+    Downloads the mezzanine of an upload to local_path and returns its key,
+    without ever building it: request handlers must not transcode, so
+    while the upload's ingest task is still running this raises
+    MezzanineNotReady for the caller to retry. Raises UploadNotFound if
+    there is no such upload.
+    """
+    key = mezzanine_key(video_key)
+    if not storage.object_exists(key):
+        if not storage.object_exists(video_key):
+            raise UploadNotFound(f"Video {video_key} not found")
+        raise MezzanineNotReady(f"Video {video_key} is still being prepared")
+    storage.get_object(key, local_path)
+    return key
@@ -0,0 +1,44 @@
+# app/services/media_probe.py
+
+import os
+import json
+import subprocess as sp
+from typing import Any, Dict, Optional
+from app.config.logging import get_logger
+
+logger = get_logger(component="media_probe")
+
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+
+def probe_streams(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Describe the first video and audio stream of a media file with ffprobe.
+
+    Returns a dict with "video" and "audio" entries (either may be None), each
+    holding ffprobe's stream fields including the codec extradata, plus the
+    container "format" fields. Returns None if ffprobe is unavailable or cannot
+    read the file, so callers can fall back to a slower but safer path.
+    """
+    cmd = [
+        FFPROBE_BINARY,
+        "-v", "error",
+        "-show_streams",
+        "-show_format",
+        "-show_data",
+        "-of", "json",
+        path,
+    ]
+    try:
+        result = sp.run(cmd, stdin=sp.DEVNULL, capture_output=True, check=True)
+        info = json.loads(result.stdout)
+    except (OSError, sp.CalledProcessError, json.JSONDecodeError) as e:
+        logger.warning("probe_failed", file=path, error=str(e))
+        return None
+
+    streams = info.get("streams", [])
+    return {
+        "video": next((s for s in streams if s.get("codec_type") == "video"), None),
+        "audio": next((s for s in streams if s.get("codec_type") == "audio"), None),
+        "format": info.get("format", {}),
+    }
@@ -0,0 +1,151 @@
+# app/services/parallel_render.py
+
+import json
+import math
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from app.config.logging import get_logger
+from app.config.resources import cpu_limit
+from app.services.scene_processor import process_scene_with_effect_chain, scene_frame_count
+
+logger = get_logger(component="parallel_render")
+
+# The directory app is imported from, so scene processes find it from any cwd.
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Shorter chunks cost more in per-process setup and keyframes than they save.
+MIN_CHUNK_FRAMES = 24
+
+
+def split_frame_range(frame_count: int, chunks: int, min_chunk_frames: int = MIN_CHUNK_FRAMES) -> List[Tuple[int, int]]:
+    """
+    Split frames [0, frame_count) into at most ``chunks`` contiguous, balanced
+    (start, end) ranges of at least ``min_chunk_frames`` frames each (a scene
+    shorter than that stays in one piece).
+    """
+    if frame_count <= 0:
+        raise ValueError(f"Cannot split {frame_count} frames")
+    chunks = max(1, min(chunks, frame_count // max(1, min_chunk_frames)))
+    base, extra = divmod(frame_count, chunks)
+    ranges = []
+    start = 0
+    for i in range(chunks):
+        end = start + base + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def shard_scene_jobs(scene_jobs: List[Dict[str, Any]], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Split scene jobs into closed-GOP chunk jobs, in timeline order.
+
+    The chunk length targets an even share of the whole job per worker, so
+    long scenes are cut into several chunks while short ones stay whole.
+    Each chunk job is the scene job plus a "frame_range" key.
+    """
+    workers = workers or cpu_limit()
+    frame_counts = [scene_frame_count(job["scene_timing"]) for job in scene_jobs]
+    chunk_frames = max(MIN_CHUNK_FRAMES, math.ceil(sum(frame_counts) / workers))
+
+    chunk_jobs = []
+    for job, frame_count in zip(scene_jobs, frame_counts):
+        for frame_range in split_frame_range(frame_count, math.ceil(frame_count / chunk_frames)):
+            chunk_jobs.append(dict(job, frame_range=frame_range))
+    return chunk_jobs
+
+
+def render_scene_process(scene_args: Dict[str, Any]) -> None:
+    """
+    Runs process_scene_with_effect_chain(**scene_args) in a new Python
+    interpreter (see main below).
+
+    Celery's prefork workers are daemonic processes, which multiprocessing
+    does not let start children, so scenes are rendered by plain
+    subprocesses instead of a process pool. Raises RuntimeError with the
+    tail of the child's stderr if it fails.
+    """
+    python_path = os.pathsep.join(filter(None, [APP_ROOT, os.getenv("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-m", "app.services.parallel_render"],
+        input=json.dumps(scene_args).encode(),
+        stderr=subprocess.PIPE,
+        env=dict(os.environ, PYTHONPATH=python_path),
+    )
+    if result.returncode != 0:
+        error = result.stderr.decode("utf8", errors="replace").strip().splitlines()[-20:]
+        raise RuntimeError(
+            f"Rendering {scene_args['output_path']} failed with exit code {result.returncode}: " + "\n".join(error)
+        )
+
+
+def render_scenes_parallel(
+    scene_jobs: List[Dict[str, Any]],
+    user_video_path: str,
+    output_paths: List[str],
+    max_workers: Optional[int] = None,
+    encoder_options: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """
+    Render independent scenes concurrently, each in its own process.
+
+    Each scene job carries its own config, timing and precomputed user video
+    offset, so scenes can run in any order. Jobs may also carry a
+    "frame_range" (see shard_scene_jobs) to render one chunk of a scene. At
+    most the worker's CPU limit of scenes run at once (see
+    render_scene_process), and libx264 threads, compositor threads and
+    tiling CPUs are split between the concurrent scenes so the container
+    is not oversubscribed. Returns
+    output_paths, in scene order, once every scene has finished.
+    """
+    if len(scene_jobs) != len(output_paths):
+        raise ValueError("Expected one output path per scene job")
+
+    cpus = cpu_limit()
+    workers = max(1, min(max_workers or cpus, len(scene_jobs)))
+    options = dict(encoder_options or {})
+    options.setdefault("threads", max(1, cpus // workers))
+    scene_workers = max(1, cpus // workers)
+
+    logger.info("parallel_render_started", scene_count=len(scene_jobs), workers=workers, cpus=cpus)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                render_scene_process,
+                {
+                    "mockup_config": job["mockup_config"],
+                    "user_video_path": user_video_path,
+                    "scene_timing": job["scene_timing"],
+                    "output_path": output_path,
+                    "user_video_offset": job["user_video_offset"],
+                    "encoder_options": options,
+                    "frame_range": job.get("frame_range"),
+                    "workers": scene_workers,
+                },
+            )
+            for job, output_path in zip(scene_jobs, output_paths)
+        ]
+        try:
+            # Surface the first failure in scene order.
+            for future in futures:
+                future.result()
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    logger.info("parallel_render_completed", scene_count=len(scene_jobs))
+    return output_paths
+
+
+def main() -> None:
+    """Entry point of render_scene_process: renders the scene job read from stdin."""
+    process_scene_with_effect_chain(**json.load(sys.stdin))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# app/services/poster.py
+
+import os
+import cv2
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+from app.config.logging import get_logger
+from app.config.quality import QUALITY_FULL, quality_profile
+from app.services.frame_reader import FrameReader
+from app.services.render_plan import compile_effect_chain
+from app.services.scene_processor import (
+    close_scene_context,
+    get_effects_chain,
+    load_scene_context,
+    open_static_plate,
+)
+
+logger = get_logger(component="poster")
+
+# format -> (OpenCV extension, media type)
+POSTER_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "png": (".png", "image/png"),
+}
+JPEG_QUALITY = 90
+
+POSTER_CACHE_SIZE_ENV = "POSTER_CACHE_SIZE"
+POSTER_VIDEO_CACHE_SIZE_ENV = "POSTER_VIDEO_CACHE_SIZE"
+POSTER_VIDEO_DIR = os.path.join(tempfile.gettempdir(), "poster_videos")
+
+
+def find_scene(mockup_config: Dict[str, Any], scene_id: str) -> Dict[str, Any]:
+    """The scene of a mockup with the given id; raises ValueError if there is none."""
+    scene = next((s for s in mockup_config.get("scenes", []) if s.get("scene_id") == scene_id), None)
+    if scene is None:
+        raise ValueError(f"Scene {scene_id} not found in mockup configuration")
+    return scene
+
+
+def render_poster_frame(
+    scene_config: Dict[str, Any],
+    user_clip,
+    frame_index: int,
+    user_video_offset: float = 0.0,
+    quality: str = QUALITY_FULL,
+    fps: int = 24,
+) -> np.ndarray:
+    """
+    Composites a single frame (a template frame index) of a scene with the
+    user's video, exactly as the scene renders it in a full job.
+
+    Template assets come from the memory-mapped template store, so any
+    frame is a direct read; user_clip should seek (FrameReader restarts its
+    decode at the keyframe before the requested time).
+    """
+    profile = quality_profile(quality)
+    context = load_scene_context(scene_config, user_clip, user_video_offset, fps, scale=profile["scale"])
+    try:
+        nframes = getattr(context["background_clip"], "nframes", None)
+        if frame_index < 0 or (nframes is not None and frame_index >= nframes):
+            raise ValueError(f"Frame {frame_index} is outside the scene's {nframes} frames")
+        plan = compile_effect_chain(get_effects_chain(scene_config), scale=profile["scale"])
+        plate = open_static_plate(context, plan)
+        if plate is not None:
+            plan.use_static_plate(plate)
+        try:
+            return plan.render(frame_index / fps, context)
+        finally:
+            if plate is not None:
+                plate.close()
+    finally:
+        close_scene_context(context)
+
+
+def encode_poster(frame: np.ndarray, fmt: str = "jpeg") -> bytes:
+    """Encodes an RGB frame as a JPEG or PNG image."""
+    if fmt not in POSTER_FORMATS:
+        raise ValueError(f"Invalid poster format: {fmt}; expected one of {', '.join(POSTER_FORMATS)}")
+    extension = POSTER_FORMATS[fmt][0]
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if fmt == "jpeg" else []
+    ok, data = cv2.imencode(extension, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), params)
+    if not ok:
+        raise ValueError(f"Failed to encode poster as {fmt}")
+    return data.tobytes()
+
+
+class PosterRenderer:
+    """
+    Renders single-frame posters of a scene with a user's uploaded video.
+
+    Encoded images are kept in an LRU cache, and the user videos they are
+    made from stay downloaded and open (one seeking FrameReader each), so
+    scrubbing through a scene only decodes the frames it asks for. Renders
+    are serialised; FrameReader is not thread-safe. Videos are fetched
+    outside that lock, one download per video at a time, so fetching a new
+    upload never holds up posters of the videos already open.
+    """
+
+    def __init__(
+        self,
+        fetch_video: Callable[[str, str], None],
+        cache_size: Optional[int] = None,
+        video_cache_size: Optional[int] = None,
+        video_dir: str = POSTER_VIDEO_DIR,
+    ) -> None:
+        self.fetch_video = fetch_video
+        self.cache_size = int(cache_size or os.getenv(POSTER_CACHE_SIZE_ENV, 256))
+        self.video_cache_size = int(video_cache_size or os.getenv(POSTER_VIDEO_CACHE_SIZE_ENV, 8))
+        self.video_dir = video_dir
+        self._posters: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._videos: "OrderedDict[str, FrameReader]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-video download locks, and how many requests are using each
+        # video outside the render lock (their files are never evicted).
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._pending: Dict[str, int] = {}
+
+    def _video_path(self, video_key: str) -> str:
+        return os.path.join(self.video_dir, hashlib.sha256(video_key.encode()).hexdigest()[:32] + ".mp4")
+
+    def _fetch(self, video_key: str) -> str:
+        """The local copy of video_key, downloaded unless it is already there."""
+        path = self._video_path(video_key)
+        if not os.path.exists(path):
+            os.makedirs(self.video_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                self.fetch_video(video_key, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
+
+    def _user_video(self, video_key: str, path: str) -> FrameReader:
+        """The open reader of a fetched video; call with the render lock held."""
+        reader = self._videos.get(video_key)
+        if reader is not None:
+            self._videos.move_to_end(video_key)
+            return reader
+        reader = FrameReader(path)
+        self._videos[video_key] = reader
+
+        while len(self._videos) > self.video_cache_size:
+            evicted_key, evicted = self._videos.popitem(last=False)
+            evicted.close()
+            if evicted_key not in self._pending and os.path.exists(evicted.path):
+                os.remove(evicted.path)
+        return reader
+
+    def render(
+        self,
+        mockup_config: Dict[str, Any],
+        cache_key: Tuple,
+        scene_id: str,
+        frame_index: int,
+        video_key: str,
+        fmt: str = "jpeg",
+        user_video_offset: float = 0.0,
+        quality: str = QUALITY_FULL,
+    ) -> bytes:
+        """
+        Returns the encoded poster. cache_key identifies mockup_config (e.g.
+        its mockup id); the other arguments complete the cache key. Errors
+        of fetch_video (e.g. a video that is not ready yet) propagate.
+        """
+        if fmt not in POSTER_FORMATS:
+            raise ValueError(f"Invalid poster format: {fmt}; expected one of {', '.join(POSTER_FORMATS)}")
+        key = (cache_key, scene_id, frame_index, video_key, fmt, user_video_offset, quality)
+        with self._lock:
+            data = self._posters.get(key)
+            if data is not None:
+                self._posters.move_to_end(key)
+                return data
+            self._pending[video_key] = self._pending.get(video_key, 0) + 1
+            fetch_lock = self._fetch_locks.setdefault(video_key, threading.Lock())
+
+        try:
+            with fetch_lock:
+                path = self._fetch(video_key)
+
+            with self._lock:
+                # Another request may have rendered it while this one fetched.
+                data = self._posters.get(key)
+                if data is not None:
+                    self._posters.move_to_end(key)
+                    return data
+
+                scene_config = find_scene(mockup_config, scene_id)
+                frame = render_poster_frame(
+                    scene_config, self._user_video(video_key, path), frame_index, user_video_offset, quality
+                )
+                data = encode_poster(frame, fmt)
+                self._posters[key] = data
+                while len(self._posters) > self.cache_size:
+                    self._posters.popitem(last=False)
+                logger.info("poster_rendered", scene_id=scene_id, frame=frame_index, format=fmt, bytes=len(data))
+                return data
+        finally:
+            with self._lock:
+                self._pending[video_key] -= 1
+                if not self._pending[video_key]:
+                    del self._pending[video_key]
+                    del self._fetch_locks[video_key]
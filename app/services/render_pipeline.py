@@ -0,0 +1,253 @@
+# app/services/render_pipeline.py
+
+import os
+import time
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.config.logging import get_logger
+from app.config.resources import cpu_limit
+from app.services.effects.frame_pool import FramePool
+
+logger = get_logger(component="render_pipeline")
+
+RENDER_WORKERS_ENV = "RENDER_WORKERS"          # compositor threads per scene; CPU limit by default
+RENDER_QUEUE_DEPTH_ENV = "RENDER_QUEUE_DEPTH"  # frames being composited or awaiting their turn
+RENDER_PREFETCH_ENV = "RENDER_PREFETCH"        # frames each sequential clip is decoded ahead
+
+# Context clips read frame by frame during a render. Those that are not
+# thread_safe (ffmpeg pipes, MoviePy clips) are decoded on a prefetch thread.
+PREFETCH_CLIPS = ("background_clip", "user_clip", "reflections_clip", "mask_clip")
+
+
+def pipeline_settings(workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Compositor threads, queue depth and prefetch depth for a render, from
+    the arguments or environment; a single worker means the serial path.
+    """
+    workers = workers or int(os.getenv(RENDER_WORKERS_ENV) or cpu_limit())
+    queue_depth = int(os.getenv(RENDER_QUEUE_DEPTH_ENV) or 2 * workers)
+    prefetch = int(os.getenv(RENDER_PREFETCH_ENV) or queue_depth + 2)
+    return {"workers": max(1, workers), "queue_depth": max(workers, queue_depth), "prefetch": max(1, prefetch)}
+
+
+class PrefetchedClip:
+    """
+    Thread-safe stand-in for a sequential clip. A background thread decodes
+    its frames in order from start_index, up to depth frames past the
+    furthest one requested, and get_frame(t) hands them out in any order
+    from that window. Requests that fall behind the window are read from
+    the clip directly (serialised with the decoder), which is correct but
+    costs a seek.
+    """
+
+    def __init__(self, clip, start_index: int = 0, depth: int = 8) -> None:
+        self.clip = clip
+        self.path = getattr(clip, "path", None)
+        self.duration = clip.duration
+        self.size = clip.size
+        self.fps = clip.fps
+        self.nframes = getattr(clip, "nframes", None) or int(clip.duration * clip.fps + 0.00001) + 1
+        self.depth = depth
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.misses = 0
+
+        self._frames: Dict[int, np.ndarray] = {}
+        self._next = self._clamp(start_index)
+        self._wanted = self._next
+        self._error: Optional[BaseException] = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._read_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._decode, name="clip-prefetch", daemon=True)
+        self._thread.start()
+
+    def _clamp(self, index: int) -> int:
+        return max(0, min(index, self.nframes - 1))
+
+    def _read(self, index: int) -> np.ndarray:
+        with self._read_lock:
+            if hasattr(self.clip, "get_frame_index"):
+                return self.clip.get_frame_index(index)
+            return self.clip.get_frame(index / self.fps)
+
+    def _decode(self) -> None:
+        """Prefetch thread: decode ahead of the furthest requested frame."""
+        try:
+            while True:
+                with self._cond:
+                    while not self._stopped and (
+                        self._next > self._wanted + self.depth or self._next >= self.nframes
+                    ):
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    index = self._next
+                start = time.perf_counter()
+                frame = self._read(index)
+                self.decode_seconds += time.perf_counter() - start
+                with self._cond:
+                    self._frames[index] = frame
+                    self._next = index + 1
+                    # Frames well behind every request can no longer be asked for.
+                    for old in [key for key in self._frames if key < self._wanted - self.depth]:
+                        del self._frames[old]
+                    self._cond.notify_all()
+        except BaseException as e:  # noqa: B036 - re-raised on the requesting thread
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    def frame_index(self, t: float) -> int:
+        return int(self.fps * t + 0.00001)
+
+    def get_frame_index(self, index: int) -> np.ndarray:
+        index = self._clamp(index)
+        start = time.perf_counter()
+        with self._cond:
+            if index > self._wanted:
+                self._wanted = index
+                self._cond.notify_all()
+            while index not in self._frames and index >= self._next and self._error is None:
+                self._cond.wait()
+            frame = self._frames.get(index)
+            error = self._error
+            self.wait_seconds += time.perf_counter() - start
+            if frame is None and error is None:
+                self.misses += 1
+        if frame is not None:
+            return frame
+        if error is not None:
+            raise IOError(f"Prefetch of {self.path} failed: {error}")
+        return self._read(index)
+
+    def get_frame(self, t: float) -> np.ndarray:
+        return self.get_frame_index(self.frame_index(t))
+
+    def close(self) -> None:
+        """Stops the prefetch thread; the wrapped clip stays open."""
+        with self._cond:
+            self._stopped = True
+            self._frames.clear()
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def prefetch_context_clips(context: Dict[str, Any], start_time: float, fps: float, depth: int) -> Dict[str, PrefetchedClip]:
+    """
+    PrefetchedClips for the context's sequential clips, decoding from
+    start_time. depth counts output frames at fps, so clips at a higher
+    frame rate than the output are decoded (and kept) further ahead.
+    """
+    clips = {}
+    for key in PREFETCH_CLIPS:
+        clip = context.get(key)
+        if clip is None or getattr(clip, "thread_safe", False):
+            continue
+        t = start_time + (context.get("user_offset", 0) if key == "user_clip" else 0)
+        if t >= clip.duration:
+            continue
+        clip_depth = int(np.ceil(depth * max(1.0, clip.fps / fps)))
+        clips[key] = PrefetchedClip(clip, int(clip.fps * t + 0.00001), clip_depth)
+    return clips
+
+
+def render_frames_pipelined(plan, context: Dict[str, Any], frame_range: Tuple[int, int], fps: float, encoder, settings: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Renders frame_range with plan on settings["workers"] compositor threads.
+
+    Frames are handed out in order but may finish out of order; a reorder
+    buffer writes them to the encoder in sequence. At most queue_depth
+    frames are in flight, which bounds the reorder buffer and lets output
+    frames come from a fixed ring of buffers (one for each frame in flight
+    or still held by the encoder). Each worker has its own context and
+    FramePool, so scratch buffers are never shared between threads, and
+    renders its frames untiled (see effects/tiling.py).
+    Returns the stage timings.
+    """
+    start, end = frame_range
+    workers, queue_depth = settings["workers"], settings["queue_depth"]
+    h, w = context["output_size"][1], context["output_size"][0]
+    ring = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(min(end - start, queue_depth + encoder.max_pending_frames + 1))]
+
+    clips = prefetch_context_clips(context, start / fps, fps, settings["prefetch"])
+    tasks: "queue.Queue" = queue.Queue()
+    done: Dict[int, np.ndarray] = {}
+    errors: List[BaseException] = []
+    cond = threading.Condition()
+    composite_seconds = [0.0] * workers
+
+    def composite(worker: int) -> None:
+        # Frames are already spread over the workers, so effects do not tile them.
+        worker_context = dict(context, frame_pool=FramePool(context["output_size"], ring_size=1), tile_stripes=1, **clips)
+        while True:
+            index = tasks.get()
+            if index is None:
+                return
+            try:
+                began = time.perf_counter()
+                frame = plan.render(index / fps, worker_context, out=ring[index % len(ring)])
+                composite_seconds[worker] += time.perf_counter() - began
+            except BaseException as e:  # noqa: B036 - re-raised on the render thread
+                with cond:
+                    errors.append(e)
+                    cond.notify_all()
+                return
+            with cond:
+                done[index] = frame
+                cond.notify_all()
+
+    threads = [threading.Thread(target=composite, args=(worker,), name=f"compositor-{worker}", daemon=True) for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    began = time.perf_counter()
+    reorder_wait = encode_wait = 0.0
+    issued = start
+    try:
+        for index in range(start, end):
+            # Frames may be issued up to queue_depth ahead of the next write.
+            while issued < min(end, index + queue_depth):
+                tasks.put(issued)
+                issued += 1
+            waited = time.perf_counter()
+            with cond:
+                while index not in done and not errors:
+                    cond.wait()
+                if errors:
+                    raise errors[0]
+                frame = done.pop(index)
+            written = time.perf_counter()
+            reorder_wait += written - waited
+            encoder.write_frame(frame)
+            encode_wait += time.perf_counter() - written
+    finally:
+        # Drain unstarted work, then stop every worker.
+        try:
+            while True:
+                tasks.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+        for clip in clips.values():
+            clip.close()
+
+    elapsed = time.perf_counter() - began
+    stats = {
+        "frames": end - start,
+        "seconds": round(elapsed, 3),
+        "fps": round((end - start) / elapsed, 2) if elapsed > 0 else None,
+        "composite_seconds": round(sum(composite_seconds), 3),
+        "reorder_wait_seconds": round(reorder_wait, 3),
+        "encode_wait_seconds": round(encode_wait, 3),
+        "decode_seconds": {key: round(clip.decode_seconds, 3) for key, clip in clips.items()},
+        "decode_wait_seconds": {key: round(clip.wait_seconds, 3) for key, clip in clips.items()},
+        "prefetch_misses": sum(clip.misses for clip in clips.values()),
+    }
+    logger.info("render_pipeline_finished", **settings, **stats)
+    return stats
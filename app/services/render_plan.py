@@ -0,0 +1,241 @@
+# app/services/render_plan.py
+
+import inspect
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.effects import EFFECT_REGISTRY, EFFECT_TRAITS
+from app.services.effects.blending_effects import BLEND_MODES, blend_reflections, reflections_frame
+from app.services.effects.frame_pool import black_frame
+from app.services.effects.perspective_transformations import corner_pin_region
+from app.config.logging import get_logger
+
+logger = get_logger(component="render_plan")
+
+# Arguments supplied by the renderer rather than the chain's params.
+RUNTIME_ARGS = ("frame", "t", "context", "out")
+
+# Params whose value must be one of a fixed set of names.
+PARAM_CHOICES = {
+    "blend_mode": BLEND_MODES,
+}
+
+# Params measured in output pixels, scaled with the render resolution.
+PIXEL_PARAMS = ("sigma", "blur_sigma")
+
+# Part of every static plate's store key; bump when the baked pixels of a
+# step change (e.g. its blending math), so stale plates are rebuilt.
+STATIC_PLATE_VERSION = 1
+
+
+class RenderStep:
+    """
+    One compiled step of a render plan: the effect (or fused effects) it
+    runs, its validated params and its traits from EFFECT_TRAITS. The step
+    is called as step.run(frame, t=t, context=context, out=out).
+
+    Steps whose output outside the corner pin region only depends on the
+    template also carry bake, which renders that static part of a frame
+    with the same call signature; step.run then accepts the baked frame as
+    plate and only renders the region itself.
+    """
+
+    def __init__(
+        self, name: str, run: Callable, params: Dict[str, Any], inputs: Tuple[str, ...], roi: str, in_place: bool,
+        bake: Optional[Callable] = None,
+    ) -> None:
+        self.name = name
+        self.run = run
+        self.params = params
+        self.inputs = inputs
+        self.roi = roi
+        self.in_place = in_place
+        self.bake = bake
+
+    @property
+    def user_dependent(self) -> bool:
+        return "user" in self.inputs
+
+    def __repr__(self) -> str:
+        return f"RenderStep({self.name!r}, inputs={self.inputs}, roi={self.roi!r})"
+
+
+class RenderPlan:
+    """
+    A scene's effects chain compiled once at scene start. Rendering a frame
+    is a straight run through pre-bound callables: no registry lookups,
+    params unpacking or per-frame validation.
+
+    With a static plate attached (see use_static_plate), frames the plate
+    covers start from the baked frame and only the first step's corner pin
+    region is rendered.
+    """
+
+    def __init__(self, steps: List[RenderStep]) -> None:
+        self.steps = steps
+        self._runs = [step.run for step in steps]
+        self._plated_runs = self._runs[1:]
+        self.plate = None
+
+    @property
+    def static_plate_step(self) -> Optional[RenderStep]:
+        """The first step if it can be prebaked onto a static plate, else None."""
+        if self.steps and self.steps[0].bake is not None:
+            return self.steps[0]
+        return None
+
+    def use_static_plate(self, plate) -> None:
+        """
+        Renders frames from plate, the static_plate_step baked over the
+        background (see bake_static_plate), where it covers them.
+        """
+        self.plate = plate
+
+    def render(self, t: float, context: Dict[str, Any], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Renders the frame at local scene time t, like apply_effect_chain,
+        into out, else the next output buffer of the context's frame pool.
+        """
+        if out is None:
+            pool = context.get("frame_pool")
+            out = pool.next_output() if pool is not None else None
+        bg_clip = context["background_clip"]
+        if t < bg_clip.duration:
+            frame = bg_clip.get_frame(t)
+        else:
+            h, w = context["output_size"][1], context["output_size"][0]
+            frame = black_frame(context, (h, w, 3))
+            return self._run(self._runs, frame, t, context, out)
+
+        if self.plate is not None:
+            index = self.plate.frame_index(t)
+            if index < self.plate.nframes:
+                plate = self.plate.get_frame_index(index)
+                frame = self._runs[0](frame, t=t, context=context, out=out, plate=plate)
+                return self._run(self._plated_runs, frame, t, context, out)
+        return self._run(self._runs, frame, t, context, out)
+
+    @staticmethod
+    def _run(runs, frame, t, context, out):
+        for run in runs:
+            frame = run(frame, t=t, context=context, out=out)
+        return frame
+
+
+def bake_static_plate(context: Dict[str, Any], step: RenderStep, frames: np.ndarray) -> None:
+    """
+    Fills frames (an (N, h, w, 3) uint8 array) with the static part of
+    step over each background frame, at t = n / fps. The plate only depends
+    on the template and the step's params, never on the user's video.
+    """
+    fps = context["fps"]
+    bg_clip = context["background_clip"]
+    for index in range(frames.shape[0]):
+        t = index / fps
+        step.bake(bg_clip.get_frame(t), t=t, context=context, out=frames[index])
+
+
+def validate_effect(name: str, params: Dict[str, Any]) -> Callable:
+    """
+    Returns the registered callable for an effect after checking params
+    against its signature. Raises ValueError for unknown effects, unknown
+    params and missing required params.
+    """
+    func = EFFECT_REGISTRY.get(name)
+    if func is None:
+        raise ValueError(f"Effect '{name}' not found in registry")
+    if not isinstance(params, dict):
+        raise ValueError(f"Params of effect '{name}' must be a mapping")
+
+    signature = inspect.signature(func)
+    accepted = {key: p for key, p in signature.parameters.items() if key not in RUNTIME_ARGS}
+    unknown = sorted(set(params) - set(accepted))
+    if unknown:
+        raise ValueError(f"Unknown params for effect '{name}': {', '.join(unknown)}")
+    missing = sorted(
+        key for key, p in accepted.items()
+        if p.default is inspect.Parameter.empty and key not in params
+    )
+    if missing:
+        raise ValueError(f"Missing params for effect '{name}': {', '.join(missing)}")
+    for key, choices in PARAM_CHOICES.items():
+        if key in params and params[key] not in choices:
+            raise ValueError(f"Invalid {key} '{params[key]}' for effect '{name}'; expected one of {', '.join(choices)}")
+    return func
+
+
+def corner_pin_reflections(frame, t, context, out, corner_pin_params, opacity, blend_mode="screen", plate=None):
+    """
+    corner_pin followed by reflections in a single pass. Reflections are
+    per-pixel, so the frame is blended once: the input frame outside the
+    corner pin's region and the composited region inside it, which saves
+    corner_pin's full-frame copy. With plate, the frame already blended
+    with its reflections (see blend_template_reflections), outside the
+    region is a plain copy.
+    """
+    region = corner_pin_region(frame, t, context=context, **corner_pin_params)
+    refl_frame = reflections_frame(t, context)
+    if out is None:
+        out = np.empty_like(frame)
+    if plate is not None:
+        np.copyto(out, plate)
+    else:
+        blend_reflections(frame, refl_frame, opacity, context, blend_mode, out=out)
+    if region is not None:
+        (x0, y0, x1, y1), pixels = region
+        blend_reflections(pixels, refl_frame[y0:y1, x0:x1], opacity, context, blend_mode, out=out[y0:y1, x0:x1])
+    return out
+
+
+def blend_template_reflections(frame, t, context, out, opacity, blend_mode="screen"):
+    """The reflections pass of corner_pin_reflections without the corner pin."""
+    return blend_reflections(frame, reflections_frame(t, context), opacity, context, blend_mode, out=out)
+
+
+def _fuse_corner_pin_reflections(first: RenderStep, second: RenderStep) -> RenderStep:
+    run = partial(corner_pin_reflections, corner_pin_params=first.params, **second.params)
+    inputs = tuple(dict.fromkeys(first.inputs + second.inputs))
+    return RenderStep(
+        "corner_pin+reflections", run,
+        {"corner_pin": first.params, "reflections": second.params}, inputs, "frame", True,
+        bake=partial(blend_template_reflections, **second.params),
+    )
+
+
+# Adjacent effects that have a combined kernel: (first, second) -> fuser.
+FUSED_PAIRS = {
+    ("corner_pin", "reflections"): _fuse_corner_pin_reflections,
+}
+
+
+def compile_effect_chain(effects_chain: List[Dict[str, Any]], fuse: bool = True, scale: float = 1.0) -> RenderPlan:
+    """
+    Validates an effects chain and compiles it into a RenderPlan. With fuse,
+    adjacent pairs in FUSED_PAIRS are replaced by their combined kernel; the
+    output is identical either way. scale is the render resolution relative
+    to the template's (below 1 for previews); PIXEL_PARAMS are scaled with it.
+    """
+    steps: List[RenderStep] = []
+    for index, item in enumerate(effects_chain):
+        if not isinstance(item, dict) or "effect" not in item:
+            raise ValueError(f"Effects chain entry {index} has no 'effect'")
+        name = item["effect"]
+        params = item.get("params") or {}
+        func = validate_effect(name, params)
+        params = dict(params)
+        if scale != 1:
+            params.update({key: params[key] * scale for key in PIXEL_PARAMS if key in params})
+        steps.append(RenderStep(name, partial(func, **params), params, **EFFECT_TRAITS[name]))
+
+    if fuse:
+        fused: List[RenderStep] = []
+        for step in steps:
+            fuser = FUSED_PAIRS.get((fused[-1].name, step.name)) if fused else None
+            if fuser is not None:
+                fused[-1] = fuser(fused[-1], step)
+            else:
+                fused.append(step)
+        steps = fused
+
+    logger.debug("effect_chain_compiled", steps=[step.name for step in steps])
+    return RenderPlan(steps)
@@ -1,9 +1,15 @@
 import os
 import gc
-import json
-import numpy as np
 import moviepy.editor as mpy
 from app.services.effects import EFFECT_REGISTRY
+from app.services.effects.frame_pool import FramePool, black_frame
+from app.services.effects.perspective_transformations import bake_scene_matte
+from app.services.corner_pin_track import load_corner_pin_track
+from app.services.render_plan import STATIC_PLATE_VERSION, bake_static_plate, compile_effect_chain
+from app.services.template_store import content_hash, get_template_store, open_template_asset
+from app.services.encoder import FrameEncoder, RenditionEncoder
+from app.services.render_pipeline import pipeline_settings, render_frames_pipelined
+from app.config.quality import QUALITY_FULL, quality_profile
 from app.config.logging import get_logger
 
 logger = get_logger(component="scene_processor")
@@ -11,16 +17,22 @@ logger = get_logger(component="scene_processor")
 def apply_effect_chain(t, context, effects_chain):
     """
     Applies each effect in the chain sequentially to the base frame.
+    This is the interpreted reference path; scenes are rendered through a
+    compiled plan (see app.services.render_plan) that produces the same frames.
     Here, 't' is the local scene time. This function does NOT modify 't' for mockup clips.
     Only the user_clip frame selection inside corner_pin_effect uses the global offset.
+    With a FramePool in context["frame_pool"], every effect writes into the
+    frame's pooled destination buffer instead of allocating its own.
     """
     try:
+        pool = context.get("frame_pool")
+        out = pool.next_output() if pool is not None else None
         bg_clip = context["background_clip"]
         if t < bg_clip.duration:
             frame = bg_clip.get_frame(t)
         else:
             h, w = context["output_size"][1], context["output_size"][0]
-            frame = np.zeros((h, w, 3), dtype=np.uint8)
+            frame = black_frame(context, (h, w, 3))
         
         for effect_item in effects_chain:
             effect_name = effect_item["effect"]
@@ -28,7 +40,7 @@ def apply_effect_chain(t, context, effects_chain):
             effect_func = EFFECT_REGISTRY.get(effect_name)
             if effect_func:
                 # Pass t as-is to all effects; the corner_pin_effect will adjust for the user video.
-                frame = effect_func(frame, t=t, **params, context=context)
+                frame = effect_func(frame, t=t, **params, context=context, out=out)
             else:
                 raise ValueError(f"Effect '{effect_name}' not found in registry")
         return frame
@@ -52,64 +64,287 @@ def assemble_timeline(scene_file_paths, output_path):
         logger.error("Error in assemble_timeline", error=str(e), exc_info=True)
         raise
 
-def process_scene_with_effect_chain(mockup_config, user_video_path, scene_timing, output_path, user_video_offset):
+def load_scene_context(mockup_config, user_clip, user_video_offset, fps=24, scale=1.0):
+    """
+    Opens the template assets of one scene and builds the effect context.
+    The user clip is opened by the caller so it can be shared between scenes.
+    With scale below 1 the scene renders from downscaled template proxies,
+    with the corner pin track scaled to match.
+    """
+    assets = mockup_config.get("assets", {})
+    background_path = assets.get("background")
+    reflections_path = assets.get("reflections")
+    mask_path = assets.get("mask")
+    corner_pin_data_path = assets.get("corner_pin_data")
+    
+    # Load asset clips. Template assets come pre-decoded from the shared
+    # template store (or an ffmpeg pipe when it is disabled); the mask is
+    # decoded straight to single-channel gray.
+    background_clip = open_template_asset(background_path, scale=scale)
+    reflections_clip = open_template_asset(reflections_path, scale=scale)
+    mask_clip = open_template_asset(mask_path, pix_fmt="gray", scale=scale) if mask_path else None
+
+    # Load the compiled corner pin track (cached per process, see corner_pin_track).
+    corner_pin_track = load_corner_pin_track(corner_pin_data_path).scaled(scale)
+    
+    # Build the context dictionary. Note: 'user_offset' is used only when selecting from user_clip.
+    context = {
+        "background_clip": background_clip,
+        "user_clip": user_clip,
+        "reflections_clip": reflections_clip,
+        "mask_clip": mask_clip,
+        "corner_pin_track": corner_pin_track,
+        "output_size": tuple(background_clip.size),  # Use original video size
+        "fps": fps,
+        "user_offset": user_video_offset,
+        "assets": assets,
+        "render_scale": scale,
+    }
+    if uses_corner_pin_matte(get_effects_chain(mockup_config)):
+        context["matte_clip"] = open_scene_matte(context, corner_pin_data_path, mask_path)
+    return context
+
+def uses_corner_pin_matte(effects_chain):
+    """True if the chain has a masked corner pin, which needs the scene's matte."""
+    return any(
+        step.get("effect") == "corner_pin" and step.get("params", {}).get("use_mask")
+        for step in effects_chain
+    )
+
+def open_scene_matte(context, corner_pin_data_path, mask_path):
+    """
+    Returns the scene's baked composite mattes (corner polygon x mask clip,
+    one uint8 frame per tracked frame) from the template store, baking them
+    on first use. Returns None when the store is disabled, in which case
+    corner_pin_effect builds each matte on the fly.
+    """
+    store = get_template_store()
+    frame_count = context["corner_pin_track"].nframes
+    if store is None or frame_count == 0:
+        return None
+
+    w, h = context["output_size"]
+    key = store.make_key(
+        "matte",
+        content_hash(corner_pin_data_path),
+        content_hash(mask_path) if mask_path else None,
+        [w, h],
+        context["fps"],
+    )
+    meta = {
+        "source": corner_pin_data_path,
+        "fps": context["fps"],
+        "duration": frame_count / context["fps"],
+        "size": [w, h],
+    }
+    return store.get_or_build(key, (frame_count, h, w), lambda frames: bake_scene_matte(context, frames), meta)
+
+def open_static_plate(context, plan):
+    """
+    Returns the scene's static plate for plan: the background with the
+    plan's first step prebaked over it everywhere outside the corner pin
+    region, one frame per background frame. It is baked into the template
+    store on first use and shared by every job on the same template and
+    params. Returns None when the plan has no such step or the store is
+    disabled.
+    """
+    step = plan.static_plate_step
+    store = get_template_store()
+    bg_clip = context["background_clip"]
+    if step is None or store is None or bg_clip.nframes == 0:
+        return None
+
+    assets = context.get("assets", {})
+    w, h = context["output_size"]
+    key = store.make_key(
+        "plate",
+        STATIC_PLATE_VERSION,
+        step.name,
+        step.params,
+        content_hash(assets["background"]),
+        content_hash(assets["reflections"]),
+        [w, h],
+        context["fps"],
+    )
+    meta = {
+        "source": assets["background"],
+        "fps": context["fps"],
+        "duration": bg_clip.duration,
+        "size": [w, h],
+    }
+    # Baking runs without the frame pool, so it cannot touch the render's buffers.
+    bake_context = {k: v for k, v in context.items() if k != "frame_pool"}
+    return store.get_or_build(
+        key, (bg_clip.nframes, h, w, 3), lambda frames: bake_static_plate(bake_context, step, frames), meta
+    )
+
+def close_scene_context(context):
+    """Closes the template clips opened by load_scene_context (not the user clip)."""
+    for key in ("background_clip", "reflections_clip", "mask_clip", "matte_clip"):
+        clip = context.get(key)
+        if clip is not None:
+            clip.close()
+
+def scene_frame_count(scene_timing):
+    """Returns the number of frames covered by a scene's in/out frames."""
+    frame_count = scene_timing["out_frame"] - scene_timing["in_frame"]
+    if frame_count <= 0:
+        raise ValueError(
+            f"Invalid scene timing: out_frame ({scene_timing['out_frame']}) must be "
+            f"greater than in_frame ({scene_timing['in_frame']})"
+        )
+    return frame_count
+
+def output_frame_count(frame_count, fps, output_fps):
+    """Number of output frames covering frame_count template frames when rendering at output_fps."""
+    return -(-frame_count * output_fps // fps)
+
+def resolve_frame_range(frame_count, frame_range=None):
+    """
+    Validates a (start, end) sub-range of a scene's local frames, end exclusive.
+    Returns the whole scene when frame_range is None.
+    """
+    if frame_range is None:
+        return 0, frame_count
+    start, end = frame_range
+    if not 0 <= start < end <= frame_count:
+        raise ValueError(
+            f"Invalid frame range {tuple(frame_range)} for a scene of {frame_count} frames"
+        )
+    return start, end
+
+def render_scene_frames(context, effects_chain, frame_range, encoder, workers=None):
+    """
+    Renders each frame of the (start, end) range at its local scene time and
+    streams it to the encoder. Frames are counted at context["output_fps"]
+    when it is set (a preview rate), otherwise at the template's fps. Effects are stateless per frame, so any
+    sub-range renders exactly like the same frames of a full pass.
+    The chain is compiled (and validated) once, before the first frame,
+    and its template-only part comes from the scene's static plate when
+    there is one.
+    With more than one worker (see render_pipeline.pipeline_settings;
+    RENDER_WORKERS or the CPU limit by default), frames are composited on
+    a pool of threads with prefetched decoding, for identical output. An
+    explicit workers count also caps how many CPUs a frame is tiled over
+    (see effects/tiling.py), for scenes rendered side by side.
+    """
+    plan = compile_effect_chain(effects_chain, scale=context.get("render_scale", 1.0))
+    plate = open_static_plate(context, plan)
+    if plate is not None:
+        plan.use_static_plate(plate)
+    fps = context.get("output_fps") or context["fps"]
+    start, end = frame_range
+    settings = pipeline_settings(workers)
+    if workers:
+        context["tile_cpus"] = workers
+    try:
+        if settings["workers"] > 1 and end - start > 1:
+            render_frames_pipelined(plan, context, frame_range, fps, encoder, settings)
+            return
+        # Output buffers are recycled once the encoder can no longer hold them.
+        context["frame_pool"] = FramePool(context["output_size"], ring_size=encoder.max_pending_frames + 1)
+        for index in range(start, end):
+            encoder.write_frame(plan.render(index / fps, context))
+    finally:
+        context.pop("frame_pool", None)
+        if plate is not None:
+            plate.close()
+
+def get_effects_chain(mockup_config):
+    """Chooses the scene's effects chain, falling back to default if necessary."""
+    return mockup_config.get("effects_chain") or mockup_config.get("default_effects_chain", [])
+
+def open_quality_context(mockup_config, user_clip, user_video_offset, profile, fps=24):
+    """load_scene_context for a quality profile (see app.config.quality)."""
+    context = load_scene_context(mockup_config, user_clip, user_video_offset, fps, scale=profile["scale"])
+    context["output_fps"] = profile["fps"] or fps
+    return context
+
+def process_scene_with_effect_chain(mockup_config, user_video_path, scene_timing, output_path, user_video_offset, encoder_options=None, frame_range=None, quality=QUALITY_FULL, workers=None):
     """
     Processes a single scene using the defined effects chain.
     The scene's duration is based on its timing (in/out frames), and only the user_clip
     frame selection (in corner_pin_effect) is adjusted with the global offset.
+    Frames are piped straight into a FrameEncoder; encoder_options (preset, crf,
+    threads, queue_size) are forwarded to it.
+    frame_range optionally restricts the output to a (start, end) slice of the
+    scene's local frames. Each slice is its own closed-GOP encode, so slices
+    rendered separately can be joined losslessly with assemble_timeline.
+    quality picks a tier from app.config.quality; its encoder options are
+    defaults that encoder_options overrides, and frame_range counts frames
+    at its frame rate. workers is the number of compositor threads (see
+    render_scene_frames).
     """
     try:
-        assets = mockup_config.get("assets", {})
-        background_path = assets.get("background")
-        reflections_path = assets.get("reflections")
-        mask_path = assets.get("mask")
-        corner_pin_data_path = assets.get("corner_pin_data")
-        
-        # Load asset clips.
-        background_clip = mpy.VideoFileClip(background_path)
-        user_clip = mpy.VideoFileClip(user_video_path)
-        reflections_clip = mpy.VideoFileClip(reflections_path)
-        mask_clip = mpy.VideoFileClip(mask_path) if mask_path else None
-
         fps = 24
-        # Calculate scene duration from the provided in/out frame numbers.
-        scene_duration = (scene_timing["out_frame"] - scene_timing["in_frame"]) / fps
+        profile = quality_profile(quality)
+        output_fps = profile["fps"] or fps
+        frame_count = output_frame_count(scene_frame_count(scene_timing), fps, output_fps)
+        frame_range = resolve_frame_range(frame_count, frame_range)
+        options = dict(profile["encoder_options"], **(encoder_options or {}))
 
-        # Load corner pin tracking data.
-        with open(corner_pin_data_path, 'r') as f:
-            corner_pin_data = json.load(f)
-        
-        # Build the context dictionary. Note: 'user_offset' is used only when selecting from user_clip.
-        context = {
-            "background_clip": background_clip,
-            "user_clip": user_clip,
-            "reflections_clip": reflections_clip,
-            "mask_clip": mask_clip,
-            "corner_pin_data": corner_pin_data,
-            "output_size": background_clip.size,  # Use original video size
-            "fps": fps,
-            "user_offset": user_video_offset
-        }
-        
-        # Choose the scene's effects chain, falling back to default if necessary.
-        effects_chain = mockup_config.get("effects_chain") or mockup_config.get("default_effects_chain", [])
-        
-        # Define the frame-making function using the local scene time.
-        def make_frame(t):
-            return apply_effect_chain(t, context, effects_chain)
-        
-        # Create the composite clip for the scene with the duration derived from scene_timing.
-        full_clip = mpy.VideoClip(make_frame, duration=scene_duration)
-        full_clip.write_videofile(output_path, fps=fps, codec="libx264", audio_codec="aac")
-        
-        # Clean up to free memory.
-        full_clip.close()
-        background_clip.close()
-        user_clip.close()
-        reflections_clip.close()
-        if mask_clip:
-            mask_clip.close()
-        gc.collect()
+        user_clip = mpy.VideoFileClip(user_video_path)
+        context = open_quality_context(mockup_config, user_clip, user_video_offset, profile, fps)
+        try:
+            with FrameEncoder(output_path, context["output_size"], fps=output_fps, **options) as encoder:
+                render_scene_frames(context, get_effects_chain(mockup_config), frame_range, encoder, workers=workers)
+        finally:
+            # Clean up to free memory.
+            close_scene_context(context)
+            user_clip.close()
+            gc.collect()
     except Exception as e:
         logger.error("Error in process_scene_with_effect_chain", error=str(e), exc_info=True)
         raise
+
+def process_timeline_with_effect_chains(scene_jobs, user_video_path, output_path, encoder_options=None, quality=QUALITY_FULL, renditions=None):
+    """
+    Renders every scene of a job into one continuous encoder stream.
+
+    scene_jobs is an ordered list of dicts with "mockup_config", "scene_timing"
+    and "user_video_offset" keys. No per-scene files are written and no
+    assembly pass is needed; all scenes must share the same output size.
+    quality is handled as in process_scene_with_effect_chain.
+    renditions optionally maps rendition names (see app.config.renditions)
+    to output paths; they are all encoded from the one composite pass in
+    place of output_path.
+    """
+    fps = 24
+    encoder = None
+    user_clip = None
+    try:
+        profile = quality_profile(quality)
+        output_fps = profile["fps"] or fps
+        options = dict(profile["encoder_options"], **(encoder_options or {}))
+        frame_counts = [
+            output_frame_count(scene_frame_count(job["scene_timing"]), fps, output_fps) for job in scene_jobs
+        ]
+        user_clip = mpy.VideoFileClip(user_video_path)
+
+        for job, frame_count in zip(scene_jobs, frame_counts):
+            context = open_quality_context(job["mockup_config"], user_clip, job["user_video_offset"], profile, fps)
+            try:
+                if encoder is None and renditions:
+                    encoder = RenditionEncoder(renditions, context["output_size"], fps=output_fps, **options)
+                elif encoder is None:
+                    encoder = FrameEncoder(output_path, context["output_size"], fps=output_fps, **options)
+                elif tuple(encoder.size) != tuple(context["output_size"]):
+                    raise ValueError(
+                        f"Video resolution mismatch: scene {job['mockup_config'].get('scene_id')} has size "
+                        f"{context['output_size']}, expected {encoder.size}"
+                    )
+                render_scene_frames(context, get_effects_chain(job["mockup_config"]), (0, frame_count), encoder)
+            finally:
+                close_scene_context(context)
+                gc.collect()
+
+        if encoder is not None:
+            encoder.close()
+    except Exception as e:
+        if encoder is not None:
+            encoder.abort()
+        logger.error("Error in process_timeline_with_effect_chains", error=str(e), exc_info=True)
+        raise
+    finally:
+        if user_clip is not None:
+            user_clip.close()
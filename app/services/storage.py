@@ -2,9 +2,13 @@ import os
 from datetime import timedelta
 from urllib.parse import urlparse
 from minio import Minio
+from minio.error import S3Error
 from app.config.logging import get_logger
 from app.config.exceptions import StorageError
 
+# S3 error codes of an object that does not exist (or no longer does).
+MISSING_OBJECT_CODES = ("NoSuchKey", "NoSuchObject")
+
 logger = get_logger(component="storage")
 
 
@@ -44,6 +48,15 @@ class MinioStorage:
     def get_object(self, object_name: str, file_path: str) -> None:
         self._internal.fget_object(self.bucket, object_name, file_path)
 
+    def object_exists(self, object_name: str) -> bool:
+        try:
+            self._internal.stat_object(self.bucket, object_name)
+            return True
+        except S3Error as e:
+            if e.code in MISSING_OBJECT_CODES:
+                return False
+            raise
+
     def remove_object(self, object_name: str) -> None:
         self._internal.remove_object(self.bucket, object_name)
 
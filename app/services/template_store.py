@@ -0,0 +1,249 @@
+# app/services/template_store.py
+
+import os
+import json
+import fcntl
+import hashlib
+import tempfile
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from app.config.logging import get_logger
+from app.services.frame_reader import FrameReader
+
+logger = get_logger(component="template_store")
+
+TEMPLATE_STORE_ENV = "TEMPLATE_STORE"  # set to "off" to decode assets on every job
+TEMPLATE_CACHE_DIR_ENV = "TEMPLATE_CACHE_DIR"
+TEMPLATE_CACHE_MAX_BYTES_ENV = "TEMPLATE_CACHE_MAX_BYTES"
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "template_store")
+DEFAULT_MAX_BYTES = 16 * 1024 ** 3
+
+# (path, size, mtime) -> sha256 of the file contents, so a worker only hashes
+# each template file once while it is unchanged on disk.
+_content_hashes: Dict[Tuple[str, int, float], str] = {}
+
+
+def content_hash(path: str) -> str:
+    """Return the sha256 of a file's contents, cached per (path, size, mtime)."""
+    st = os.stat(path)
+    cache_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    digest = _content_hashes.get(cache_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _content_hashes[cache_key] = digest
+    return digest
+
+
+class StoredFrames:
+    """
+    Read-only, memory-mapped frame sequence from the template store.
+
+    Offers the same surface as FrameReader (duration, size, fps, nframes,
+    get_frame(t), get_frame_index(n)) so it can replace it in the effect
+    context. Pages are shared through the OS page cache between every worker
+    process that maps the same entry. Reads are random access and safe
+    from several threads at once.
+    """
+
+    thread_safe = True
+
+    def __init__(self, frames_path: str, meta: Dict[str, Any]) -> None:
+        self.path = meta.get("source", frames_path)
+        self.fps = meta["fps"]
+        self.duration = meta["duration"]
+        self.size: Tuple[int, int] = tuple(meta["size"])
+        self.meta = meta
+        self.frames = np.memmap(frames_path, dtype=np.uint8, mode="r", shape=tuple(meta["shape"]))
+        self.nframes = self.frames.shape[0]
+
+    def frame_index(self, t: float) -> int:
+        return int(self.fps * t + 0.00001)
+
+    def get_frame_index(self, index: int) -> np.ndarray:
+        return self.frames[max(0, min(index, self.nframes - 1))]
+
+    def get_frame(self, t: float) -> np.ndarray:
+        return self.get_frame_index(self.frame_index(t))
+
+    def close(self) -> None:
+        self.frames = None
+
+    def __enter__(self) -> "StoredFrames":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TemplateFrameStore:
+    """
+    On-disk store of pre-decoded template frames.
+
+    Each entry is a raw uint8 frame file plus a JSON header, keyed by a hash
+    of its inputs (typically asset path and content hash). Entries are built
+    once under a file lock, so concurrent workers do not decode the same
+    asset twice. Least recently used entries are evicted to keep the store
+    under max_bytes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+        self.cache_dir = cache_dir or os.getenv(TEMPLATE_CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.getenv(TEMPLATE_CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".frames", base + ".json"
+
+    def _load(self, key: str) -> Optional[StoredFrames]:
+        frames_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            stored = StoredFrames(frames_path, meta)
+        except (OSError, ValueError, KeyError):
+            return None
+        # Opening counts as a use for LRU eviction.
+        os.utime(meta_path)
+        return stored
+
+    def get_or_build(
+        self,
+        key: str,
+        shape: Tuple[int, ...],
+        fill: Callable[[np.memmap], None],
+        meta: Dict[str, Any],
+    ) -> StoredFrames:
+        """
+        Return the entry for key, building it first if needed.
+
+        fill receives a writable (N, ...) uint8 memmap of the given shape and
+        must populate every frame. meta must contain fps, duration and size.
+        """
+        stored = self._load(key)
+        if stored is not None:
+            return stored
+
+        frames_path, meta_path = self._paths(key)
+        with open(os.path.join(self.cache_dir, key + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have finished the entry while we waited.
+                stored = self._load(key)
+                if stored is not None:
+                    return stored
+
+                self.evict(reserve=int(np.prod(shape)), keep=(key,))
+                tmp_path = f"{frames_path}.{os.getpid()}.tmp"
+                try:
+                    frames = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=shape)
+                    fill(frames)
+                    frames.flush()
+                    del frames
+                    os.replace(tmp_path, frames_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+                meta = dict(meta, shape=list(shape))
+                tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+                with open(tmp_meta, "w") as f:
+                    json.dump(meta, f)
+                os.replace(tmp_meta, meta_path)
+                logger.info("template_store_entry_built", key=key, source=meta.get("source"), bytes=int(np.prod(shape)))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        return StoredFrames(frames_path, meta)
+
+    def open_asset(self, path: str, pix_fmt: str = "rgb24", scale: float = 1.0) -> StoredFrames:
+        """
+        Open a decoded copy of a template video, decoding it on first use.
+        With scale, the copy is a downscaled proxy (see FrameReader).
+        """
+        parts = ["asset", os.path.abspath(path), content_hash(path), pix_fmt]
+        if scale != 1:
+            parts.append(scale)
+        key = self.make_key(*parts)
+        stored = self._load(key)
+        if stored is not None:
+            return stored
+
+        with FrameReader(path, pix_fmt=pix_fmt, scale=scale) as reader:
+            w, h = reader.size
+            shape = (reader.nframes, h, w) if pix_fmt == "gray" else (reader.nframes, h, w, 3)
+
+            def fill(frames: np.memmap) -> None:
+                for index in range(reader.nframes):
+                    frames[index] = reader.get_frame_index(index)
+
+            meta = {
+                "source": path,
+                "pix_fmt": pix_fmt,
+                "fps": reader.fps,
+                "duration": reader.duration,
+                "size": list(reader.size),
+            }
+            return self.get_or_build(key, shape, fill, meta)
+
+    def _entries(self) -> Iterable[Tuple[float, int, str]]:
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            frames_path, meta_path = self._paths(key)
+            try:
+                yield os.path.getmtime(meta_path), os.path.getsize(frames_path), key
+            except OSError:
+                continue
+
+    def evict(self, reserve: int = 0, keep: Iterable[str] = ()) -> None:
+        """Delete least recently used entries until reserve more bytes fit under max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        keep = set(keep)
+        for _, size, key in entries:
+            if total + reserve <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            logger.info("template_store_entry_evicted", key=key, bytes=size)
+
+
+_store: Optional[TemplateFrameStore] = None
+
+
+def get_template_store() -> Optional[TemplateFrameStore]:
+    """Return the process-wide store, or None when it is disabled."""
+    global _store
+    if os.getenv(TEMPLATE_STORE_ENV, "on").lower() in ("off", "0", "false"):
+        return None
+    if _store is None:
+        _store = TemplateFrameStore()
+    return _store
+
+
+def open_template_asset(path: str, pix_fmt: str = "rgb24", scale: float = 1.0):
+    """
+    Open a template asset for frame-indexed reads: from the memory-mapped
+    store when it is enabled, otherwise through a sequential FrameReader.
+    A scale below 1 opens a downscaled proxy of the asset.
+    """
+    store = get_template_store()
+    if store is None:
+        return FrameReader(path, pix_fmt=pix_fmt, scale=scale)
+    return store.open_asset(path, pix_fmt=pix_fmt, scale=scale)
@@ -3,9 +3,16 @@
 import os
 import gc
 import psutil
+import tempfile
+import subprocess as sp
 import moviepy.editor as mpy
-from typing import List
+from typing import Any, Dict, List, Optional
+from moviepy.config import get_setting
 from app.config.logging import get_logger
+from app.config.resources import cpu_limit
+from app.config.encoder_profiles import ENCODER_ARGS, encoder_profile
+from app.services.encoder import FrameEncoder, x264_rate_args
+from app.services.media_probe import probe_streams
 
 logger = get_logger(component="timeline_assembler")
 
@@ -19,13 +26,83 @@ def log_memory_usage():
         vms_mb=mem_info.vms / 1024 / 1024
     )
 
-def assemble_timeline(scene_file_paths: List[str], output_path: str) -> None:
+# Stream properties that must be identical for the concat demuxer to join
+# files with "-c copy". The codec extradata carries the SPS/PPS, so it also
+# pins down the encoder's GOP structure (profile, reference frames, B-frames).
+VIDEO_COPY_KEYS = (
+    "codec_name", "profile", "level", "width", "height", "pix_fmt",
+    "time_base", "r_frame_rate", "has_b_frames", "refs", "field_order", "extradata",
+)
+AUDIO_COPY_KEYS = (
+    "codec_name", "profile", "sample_rate", "channels", "channel_layout", "time_base",
+)
+
+def _copy_signature(streams: Dict[str, Any]) -> tuple:
+    video = streams["video"] or {}
+    audio = streams["audio"]
+    video_sig = tuple(video.get(key) for key in VIDEO_COPY_KEYS)
+    audio_sig = tuple(audio.get(key) for key in AUDIO_COPY_KEYS) if audio else None
+    return video_sig, audio_sig
+
+def can_stream_copy(stream_infos: List[Dict[str, Any]]) -> bool:
+    """Return True if all probed files can be joined without re-encoding."""
+    if not stream_infos or any(info["video"] is None for info in stream_infos):
+        return False
+    signatures = {_copy_signature(info) for info in stream_infos}
+    return len(signatures) == 1
+
+def concat_stream_copy(scene_file_paths: List[str], output_path: str) -> None:
+    """Join compatible files with the ffmpeg concat demuxer and "-c copy"."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as list_file:
+        for fp in scene_file_paths:
+            escaped = os.path.abspath(fp).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+        list_path = list_file.name
+
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y",
+        "-loglevel", "error",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    try:
+        sp.run(cmd, stdin=sp.DEVNULL, capture_output=True, check=True)
+    except sp.CalledProcessError as e:
+        error = e.stderr.decode("utf8", errors="replace").strip()
+        logger.error("failed_to_write_output", file=output_path, error=error)
+        raise OSError(f"Failed to write output file {output_path}: {error}")
+    finally:
+        os.remove(list_path)
+
+def _check_resolutions(scene_file_paths: List[str], stream_infos: List[Dict[str, Any]]) -> None:
+    base_size: Optional[list] = None
+    for fp, info in zip(scene_file_paths, stream_infos):
+        size = [info["video"]["width"], info["video"]["height"]] if info["video"] else None
+        if base_size is None:
+            base_size = size
+        elif size != base_size:
+            raise ValueError(
+                f"Video resolution mismatch: {fp} has size {size}, "
+                f"expected {base_size}"
+            )
+
+def assemble_timeline(scene_file_paths: List[str], output_path: str, profile: Optional[Dict[str, Any]] = None) -> None:
     """
     Join scene clips in the user-defined order and write the final MP4.
     
+    If every scene shares codec, resolution, pixel format, timebase and
+    encoder parameters, the files are remuxed with "-c copy". Otherwise the
+    clips are decoded and re-encoded through MoviePy.
+    
     Args:
         scene_file_paths: List of paths to processed scene videos
         output_path: Path where the final composite video should be written
+        profile: Encoder profile settings for a re-encode (see
+            app.config.encoder_profiles); the default profile if None
         
     Raises:
         FileNotFoundError: If any input file doesn't exist
@@ -49,6 +126,17 @@ def assemble_timeline(scene_file_paths: List[str], output_path: str) -> None:
             logger.error("failed_to_create_output_directory", error=str(e))
             raise OSError(f"Failed to create output directory {output_dir}: {str(e)}")
     
+    # Probe the inputs; when they are compatible, remux instead of re-encoding
+    stream_infos = [probe_streams(fp) for fp in scene_file_paths]
+    if all(info is not None for info in stream_infos):
+        _check_resolutions(scene_file_paths, stream_infos)
+        if can_stream_copy(stream_infos):
+            concat_stream_copy(scene_file_paths, output_path)
+            logger.info("timeline_assembly_completed", method="stream_copy")
+            log_memory_usage()
+            return
+        logger.info("stream_copy_incompatible", scene_count=len(scene_file_paths))
+    
     clips = []
     base_size = None
     
@@ -79,19 +167,32 @@ def assemble_timeline(scene_file_paths: List[str], output_path: str) -> None:
         
         # Concatenate the scene clips in order
         final_clip = mpy.concatenate_videoclips(clips, method="compose")
+        profile = profile if profile is not None else encoder_profile()
+        options = {key: value for key, value in profile.items() if key in ENCODER_ARGS}
         
         try:
             # Write the final composite timeline video
-            final_clip.write_videofile(
-                output_path,
-                fps=24,
-                codec="libx264",
-                audio_codec="aac",
-                threads=4,  # Use multiple threads for faster encoding
-                preset="medium"  # Balance between speed and compression
-            )
+            if final_clip.audio is None:
+                # Video-only timelines skip MoviePy's writer and feed frames
+                # straight into the encoder pipe.
+                with FrameEncoder(output_path, final_clip.size, fps=24, **options) as encoder:
+                    for frame in final_clip.iter_frames(fps=24, dtype="uint8"):
+                        encoder.write_frame(frame)
+            else:
+                final_clip.write_videofile(
+                    output_path,
+                    fps=24,
+                    codec="libx264",
+                    audio_codec=profile.get("audio_codec", "aac"),
+                    audio_bitrate=profile.get("audio_bitrate"),
+                    threads=options.get("threads") or cpu_limit(),
+                    preset=options.get("preset", "medium"),
+                    ffmpeg_params=["-crf", str(options.get("crf", 23))] + x264_rate_args(
+                        options.get("tune"), options.get("gop"), options.get("maxrate"), options.get("bufsize")
+                    ),
+                )
             
-            logger.info("timeline_assembly_completed")
+            logger.info("timeline_assembly_completed", method="reencode")
             log_memory_usage()
             
         except (IOError, OSError) as e:
@@ -1,21 +1,48 @@
 from celery import Celery
 from app.config.logging import get_logger, init_logging
 from app.config.exceptions import VideoProcessingError
-from app.services.scene_processor import process_scene_with_effect_chain
+from app.services.scene_processor import (
+    process_scene_with_effect_chain,
+    process_timeline_with_effect_chains,
+)
 from app.services.timeline_assembler import assemble_timeline
+from app.services.parallel_render import render_scenes_parallel, shard_scene_jobs
 from app.services.storage import storage
+from app.services.ingest import ingest_upload
+from app.config.quality import QUALITY_FULL, QUALITY_PREVIEW, quality_profile
+from app.config.renditions import rendition_profile
+from app.config.encoder_profiles import ENCODER_ARGS, default_encoder_profile, encoder_profile as get_encoder_profile
+from app.services.encoder import transcode_renditions
+from app.services.media_probe import probe_streams
+from app.services.audio import audio_spans, mux_user_audio
 import os
 import uuid
 import json
 import subprocess
 import gc
 import psutil
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from app.tasks.celery_app import celery_app  # Import the pre-configured Celery app
 
 # Get logger
 logger = get_logger(component="worker")
 
+# Render modes: "single_pass" feeds every scene into one encoder stream,
+# "per_scene" encodes each scene to its own file and assembles them afterwards,
+# "parallel" does the same but renders the scenes concurrently, one process per scene,
+# "sharded" also splits long scenes into frame-range chunks rendered concurrently.
+RENDER_MODE_SINGLE_PASS = "single_pass"
+RENDER_MODE_PER_SCENE = "per_scene"
+RENDER_MODE_PARALLEL = "parallel"
+RENDER_MODE_SHARDED = "sharded"
+RENDER_MODES = (
+    RENDER_MODE_SINGLE_PASS,
+    RENDER_MODE_PER_SCENE,
+    RENDER_MODE_PARALLEL,
+    RENDER_MODE_SHARDED,
+)
+DEFAULT_RENDER_MODE = os.getenv("RENDER_MODE", RENDER_MODE_SINGLE_PASS)
+
 def log_memory_usage():
     """Log current memory usage."""
     process = psutil.Process()
@@ -49,28 +76,105 @@ def parse_scenes(video_path: str) -> List[Dict[str, Any]]:
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON format: {str(e)}")
 
+def build_scene_jobs(mockup_config: Dict[str, Any], scenes: List[Dict[str, Any]], fps: int = 24) -> List[Dict[str, Any]]:
+    """
+    Resolve each entry of the scene order against the mockup configuration and
+    precompute the offset into the user video at which each scene starts.
+    """
+    scene_jobs = []
+    user_video_offset = 0.0
+    for scene in scenes:
+        scene_id = scene["scene_id"]
+        scene_timing = {
+            "in_frame": scene["in_frame"],
+            "out_frame": scene["out_frame"]
+        }
+
+        # Get scene config
+        scene_config = next(
+            (s for s in mockup_config["scenes"] if s["scene_id"] == scene_id),
+            None
+        )
+        if not scene_config:
+            raise ValueError(f"Scene {scene_id} not found in mockup configuration")
+
+        scene_jobs.append({
+            "mockup_config": scene_config,
+            "scene_timing": scene_timing,
+            "user_video_offset": user_video_offset
+        })
+        user_video_offset += (scene_timing["out_frame"] - scene_timing["in_frame"]) / fps
+    return scene_jobs
+
+@celery_app.task(name='ingest_upload')
+def ingest_upload_task(video_key: str) -> str:
+    """
+    Normalises an uploaded video into its mezzanine (see app.services.ingest)
+    ahead of the jobs and posters that render from it.
+    """
+    return ingest_upload(video_key, storage)
+
 @celery_app.task(bind=True, name='process_video')
-def process_video(self, mockup_id: str, scene_order_json: str, video_key: str) -> Dict[str, Any]:
-    """Process a video with the given mockup and scene order."""
+def process_video(
+    self,
+    mockup_id: str,
+    scene_order_json: str,
+    video_key: str,
+    render_mode: str | None = None,
+    quality: str = QUALITY_FULL,
+    renditions: Optional[List[str]] = None,
+    encoder_profile: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Process a video with the given mockup and scene order, at the given
+    quality tier ("full" or a "preview" draft, see app.config.quality).
+
+    With renditions (names from app.config.renditions), the composited
+    frames are encoded into each of them instead of one full-size MP4, and
+    they are uploaded under outputs/{job_id}/.
+
+    encoder_profile names the encoder settings (see
+    app.config.encoder_profiles); it defaults to the mockup's
+    "encoder_profile", then the worker's default. A preview's own encoder
+    options take precedence, and renditions keep their own CRF.
+    """
     job_id = self.request.id
+    render_mode = render_mode or DEFAULT_RENDER_MODE
     task_logger = logger.bind(job_id=job_id, mockup_id=mockup_id)
 
     try:
         task_logger.info(
             "starting_video_processing",
             scene_order=scene_order_json,
-            video_key=video_key
+            video_key=video_key,
+            render_mode=render_mode,
+            quality=quality
         )
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Invalid render mode: {render_mode}")
+        quality_profile(quality)
+        if encoder_profile is not None:
+            get_encoder_profile(encoder_profile)
+        renditions = list(dict.fromkeys(renditions or []))
+        rendition_files = {name: f"{name}.{rendition_profile(name)['extension']}" for name in renditions}
+        rendition_paths = {name: f"/tmp/{job_id}_{filename}" for name, filename in rendition_files.items()}
+        # Previews are small enough that process startup and assembly
+        # would cost more than they save, so they always render in one pass.
+        if quality == QUALITY_PREVIEW:
+            render_mode = RENDER_MODE_SINGLE_PASS
         log_memory_usage()
 
-        # Download the input video from MinIO
+        # Download the upload's mezzanine from MinIO (built now if the
+        # ingest task has not run yet)
         temp_video_path = f"/tmp/{uuid.uuid4()}.mp4"
         try:
-            storage.get_object(video_key, temp_video_path)
+            ingest_upload(video_key, storage, temp_video_path)
         except Exception as e:
             task_logger.error("failed_to_download_video", error=str(e))
             raise VideoProcessingError(f"Failed to download video: {str(e)}")
 
+        processed_scene_paths = []
+        final_output = f"/tmp/{job_id}_final.mp4"
         try:
             # Load mockup configuration
             from app.config import load_mockup_config
@@ -78,61 +182,103 @@ def process_video(self, mockup_id: str, scene_order_json: str, video_key: str) -
             if mockup_id not in config:
                 raise ValueError(f"Invalid mockup identifier: {mockup_id}")
             mockup_config = config[mockup_id]
+            profile = get_encoder_profile(encoder_profile or mockup_config.get("encoder_profile"))
+            encoder_options = {key: value for key, value in profile.items() if key in ENCODER_ARGS}
+            if rendition_paths:
+                for key in ("crf", "maxrate", "bufsize"):
+                    encoder_options.pop(key, None)
+            encoder_options.update(quality_profile(quality)["encoder_options"])
 
-            # Parse scene order
+            # Parse scene order and resolve every scene up front
             scenes = json.loads(scene_order_json)
-            processed_scene_paths = []
-            user_video_offset = 0.0
-            fps = 24
-
-            # Process each scene
-            for index, scene in enumerate(scenes, start=1):
-                scene_id = scene["scene_id"]
-                scene_timing = {
-                    "in_frame": scene["in_frame"],
-                    "out_frame": scene["out_frame"]
-                }
-
-                # Get scene config
-                scene_config = next(
-                    (s for s in mockup_config["scenes"] if s["scene_id"] == scene_id),
-                    None
-                )
-                if not scene_config:
-                    raise ValueError(f"Scene {scene_id} not found in mockup configuration")
-
-                # Process scene
-                scene_output = f"/tmp/{job_id}_scene_{index}.mp4"
-                process_scene_with_effect_chain(
-                    mockup_config=scene_config,
-                    user_video_path=temp_video_path,
-                    scene_timing=scene_timing,
-                    output_path=scene_output,
-                    user_video_offset=user_video_offset
-                )
-                processed_scene_paths.append(scene_output)
-                user_video_offset += (scene_timing["out_frame"] - scene_timing["in_frame"]) / fps
+            scene_jobs = build_scene_jobs(mockup_config, scenes)
+            spans = audio_spans(scene_jobs)
 
-                # Clean up after each scene
-                gc.collect()
+            if render_mode == RENDER_MODE_SINGLE_PASS:
+                # All scenes feed one encoder stream; no intermediates to assemble
+                process_timeline_with_effect_chains(
+                    scene_jobs, temp_video_path, final_output, encoder_options=encoder_options,
+                    quality=quality, renditions=rendition_paths
+                )
+                log_memory_usage()
+            elif render_mode in (RENDER_MODE_PARALLEL, RENDER_MODE_SHARDED):
+                # Offsets are already known, so scenes (or scene chunks) render
+                # concurrently; assembly still follows scene_order
+                if render_mode == RENDER_MODE_SHARDED:
+                    scene_jobs = shard_scene_jobs(scene_jobs)
+                scene_outputs = [
+                    f"/tmp/{job_id}_scene_{index}.mp4"
+                    for index in range(1, len(scene_jobs) + 1)
+                ]
+                processed_scene_paths.extend(scene_outputs)
+                render_scenes_parallel(scene_jobs, temp_video_path, scene_outputs, encoder_options=encoder_options)
                 log_memory_usage()
+                assemble_timeline(processed_scene_paths, final_output, profile)
+            else:
+                # Process each scene
+                for index, scene_job in enumerate(scene_jobs, start=1):
+                    scene_output = f"/tmp/{job_id}_scene_{index}.mp4"
+                    process_scene_with_effect_chain(
+                        mockup_config=scene_job["mockup_config"],
+                        user_video_path=temp_video_path,
+                        scene_timing=scene_job["scene_timing"],
+                        output_path=scene_output,
+                        user_video_offset=scene_job["user_video_offset"],
+                        encoder_options=encoder_options,
+                        quality=quality
+                    )
+                    processed_scene_paths.append(scene_output)
 
-            # Assemble final timeline
-            final_output = f"/tmp/{job_id}_final.mp4"
-            assemble_timeline(processed_scene_paths, final_output)
+                    # Clean up after each scene
+                    gc.collect()
+                    log_memory_usage()
+
+                # Assemble final timeline
+                assemble_timeline(processed_scene_paths, final_output, profile)
+
+            if rendition_paths and render_mode != RENDER_MODE_SINGLE_PASS:
+                # Scene files were assembled into one video; fan it out from
+                # a single decode of it
+                video = probe_streams(final_output)["video"]
+                transcode_renditions(final_output, rendition_paths, (video["width"], video["height"]))
+
+            # Mux the user's soundtrack for the span of it the scenes show;
+            # scenes themselves are rendered and encoded without audio
+            user_streams = probe_streams(temp_video_path)
+            if user_streams is not None and user_streams["audio"] is not None:
+                audio_outputs = (
+                    [path for name, path in rendition_paths.items() if rendition_profile(name).get("audio")]
+                    if rendition_paths else [final_output]
+                )
+                for path in audio_outputs:
+                    mux_user_audio(
+                        path, temp_video_path, spans, profile.get("audio_codec", "aac"), profile.get("audio_bitrate")
+                    )
 
-            # Upload final video to MinIO
-            final_key = f"outputs/{job_id}.mp4"
-            storage.put_object(final_key, final_output)
+            # Upload the final video (or each rendition) to MinIO
+            rendition_keys = {}
+            if rendition_paths:
+                for name, path in rendition_paths.items():
+                    rendition_keys[name] = f"outputs/{job_id}/{rendition_files[name]}"
+                    storage.put_object(rendition_keys[name], path)
+                final_key = rendition_keys[renditions[0]]
+            else:
+                final_key = f"outputs/{job_id}.mp4"
+                storage.put_object(final_key, final_output)
 
-            task_logger.info("video_processing_completed")
+            task_logger.info("video_processing_completed", renditions=renditions)
             log_memory_usage()
 
-            return {
+            result = {
                 "status": "success",
                 "job_id": job_id,
-                "output_path": final_key
+                "output_path": final_key,
+                "quality": quality,
+                "encoder_profile": encoder_profile or mockup_config.get("encoder_profile") or default_encoder_profile()
             }
+            if rendition_keys:
+                result["renditions"] = rendition_keys
+            return result
 
         finally:
             # Clean up temporary files
@@ -141,8 +287,9 @@ def process_video(self, mockup_id: str, scene_order_json: str, video_key: str) -
             for scene_path in processed_scene_paths:
                 if os.path.exists(scene_path):
                     os.remove(scene_path)
-            if os.path.exists(final_output):
-                os.remove(final_output)
+            for path in [final_output] + list(rendition_paths.values()):
+                if os.path.exists(path):
+                    os.remove(path)
 
     except ValueError as e:
         task_logger.error("video_processing_failed_value_error", error=str(e))
@@ -11,6 +11,9 @@ import logging
 from pathlib import Path
 import tempfile
 import subprocess
+import time
+import numpy as np
+import moviepy.editor as mpy
 
 # insert the project root (one directory up) onto Python's import path
 sys.path.insert(
@@ -143,3 +146,103 @@ def parse_log_line(log_line: str) -> dict:
     """Parse a JSON log line into a dictionary."""
     return json.loads(log_line)
 
+class StillClip:
+    """A clip that shows the same frame at every time."""
+    def __init__(self, frame, duration=1.0):
+        self.frame = frame
+        self.duration = duration
+
+    def get_frame(self, t):
+        return self.frame
+
+@pytest.fixture
+def still_clip():
+    """The StillClip class, for tests that build their own effect contexts."""
+    return StillClip
+
+@pytest.fixture
+def effect_context():
+    """
+    Builds a small effect context from a seeded generator: random still
+    background, reflections, user and mask clips, and a corner pin quad
+    (in template coordinates) on a 96 x 64 output.
+    """
+    def make(seed=0):
+        rng = np.random.default_rng(seed)
+        return {
+            "background_clip": StillClip(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8)),
+            "reflections_clip": StillClip(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8)),
+            "user_clip": StillClip(rng.integers(0, 256, (40, 60, 3), dtype=np.uint8)),
+            "mask_clip": StillClip(rng.integers(0, 256, (64, 96), dtype=np.uint8)),
+            "corner_pin_data": {"0": {"ul": [20, 10], "ur": [170, 20], "lr": [180, 110], "ll": [10, 120]}},
+            "output_size": (96, 64),
+            "fps": 24,
+            "user_offset": 0.0,
+        }
+    return make
+
+def write_video(path, make_frame, duration=1.0):
+    clip = mpy.VideoClip(make_frame, duration=duration)
+    clip.write_videofile(path, fps=24, codec="libx264", audio=False, logger=None)
+    clip.close()
+
+@pytest.fixture
+def make_scene(tmp_path, monkeypatch):
+    """
+    Builds a tiny 64x64 template scene with TEMPLATE_STORE off, so its clips
+    are decoded through ffmpeg pipes, and writes a two second user video.
+    Each layer takes a make_frame function, corner_pin maps a frame index to
+    its quad (in the 3840-wide After Effects space, halved on load), and
+    effects_chain replaces the corner pin and reflections chain.
+    Returns (config, user video path).
+    """
+    monkeypatch.setenv("TEMPLATE_STORE", "off")
+
+    def make(
+        background=lambda t: np.full((64, 64, 3), 40 + int(t * 100), dtype=np.uint8),
+        reflections=lambda t: np.full((64, 64, 3), 30, dtype=np.uint8),
+        mask=lambda t: np.full((64, 64, 3), 255, dtype=np.uint8),
+        user=lambda t: np.full((32, 48, 3), int(t * 100), dtype=np.uint8),
+        corner_pin=lambda i: {"ul": [20, 16], "ur": [100, 20], "lr": [96, 100], "ll": [16, 96]},
+        effects_chain=None,
+    ):
+        layers = {"background": background, "reflections": reflections, "mask": mask}
+        paths = {name: str(tmp_path / f"{name}.mp4") for name in (*layers, "user")}
+        for name, make_frame in layers.items():
+            write_video(paths[name], make_frame)
+        write_video(paths["user"], user, duration=2.0)
+        corner_pin_path = str(tmp_path / "corner_pin_data.json")
+        with open(corner_pin_path, "w") as f:
+            json.dump({str(i): corner_pin(i) for i in range(24)}, f)
+        config = {
+            "scene_id": "scene1",
+            "assets": {
+                "background": paths["background"],
+                "reflections": paths["reflections"],
+                "mask": paths["mask"],
+                "corner_pin_data": corner_pin_path,
+            },
+            "effects_chain": effects_chain or [
+                {"effect": "corner_pin", "params": {"use_mask": True}},
+                {"effect": "reflections", "params": {"opacity": 0.5}},
+            ],
+        }
+        return config, paths["user"]
+    return make
+
+class CaptureEncoder:
+    """An encoder that keeps copies of the frames written to it."""
+    max_pending_frames = 2
+
+    def __init__(self, delay=0.0):
+        self.frames = []
+        self.delay = delay
+
+    def write_frame(self, frame):
+        time.sleep(self.delay)
+        self.frames.append(frame.copy())
+
+@pytest.fixture
+def capture_encoder():
+    """The CaptureEncoder class; delay slows each write to stress pipelining."""
+    return CaptureEncoder
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Encode benchmark matrix: renders one fixed scene with every encoder profile
+(app/config/encoder_profiles.py) and reports render fps, output size and
+SSIM/PSNR against a lossless render of the same frames.
+
+    python tests/perf/encode_profiles.py --video tests/assets/screen-preview.mov
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from moviepy.config import get_setting  # noqa: E402
+from app.config import load_mockup_config  # noqa: E402
+from app.config.encoder_profiles import ENCODER_PROFILES, encoder_options  # noqa: E402
+from app.services.scene_processor import process_scene_with_effect_chain  # noqa: E402
+
+# Lossless H.264 (in the same 4:2:0 pixel format the profiles encode to)
+REFERENCE_OPTIONS = {"preset": "ultrafast", "crf": 0}
+
+def quality_metrics(distorted_path, reference_path):
+    """Returns (SSIM, PSNR in dB) of a video against a reference of the same size and length."""
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-hide_banner", "-nostats",
+        "-i", distorted_path,
+        "-i", reference_path,
+        "-lavfi", "[0:v]split[d0][d1];[1:v]split[r0][r1];[d0][r0]ssim;[d1][r1]psnr",
+        "-f", "null", "-",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    ssim = re.search(r"SSIM .*All:([0-9.]+)", result.stderr)
+    psnr = re.search(r"PSNR .*average:([0-9.]+|inf)", result.stderr)
+    return (
+        float(ssim.group(1)) if ssim else None,
+        float(psnr.group(1)) if psnr else None,
+    )
+
+def render(scene_config, video, frames, output_path, options):
+    """Renders the first frames of a scene; returns the wall time in seconds."""
+    start = time.time()
+    process_scene_with_effect_chain(
+        scene_config, video, {"in_frame": 0, "out_frame": frames}, output_path, 0.0, encoder_options=options
+    )
+    return time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoder profile benchmark")
+    parser.add_argument("--video", type=str, default="tests/assets/screen-preview.mov",
+                        help="Path to the user video")
+    parser.add_argument("--mockup", type=str, default="mockup1", help="Mockup id")
+    parser.add_argument("--scene", type=int, default=0, help="Scene index in the mockup")
+    parser.add_argument("--frames", type=int, default=48, help="Frames to render")
+    parser.add_argument("--profiles", type=str, default=",".join(ENCODER_PROFILES),
+                        help="Comma-separated profiles to compare")
+    parser.add_argument("--output-dir", type=str, default="tests/perf/output",
+                        help="Directory for rendered videos")
+    args = parser.parse_args()
+
+    scene_config = load_mockup_config()[args.mockup]["scenes"][args.scene]
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # A first render warms the template store, so the matrix times encoding
+    # rather than one-off template decoding.
+    reference = str(output_dir / "reference.mp4")
+    print(f"Rendering lossless reference ({args.frames} frames)")
+    render(scene_config, args.video, args.frames, reference, REFERENCE_OPTIONS)
+
+    results = []
+    for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        output_path = str(output_dir / f"{name}.mp4")
+        seconds = render(scene_config, args.video, args.frames, output_path, encoder_options(name))
+        ssim, psnr = quality_metrics(output_path, reference)
+        results.append({
+            "profile": name,
+            "settings": ENCODER_PROFILES[name],
+            "seconds": seconds,
+            "fps": args.frames / seconds,
+            "bytes": os.path.getsize(output_path),
+            "ssim": ssim,
+            "psnr": psnr,
+        })
+
+    print(f"\n{'profile':<12}{'fps':>8}{'KiB':>10}{'SSIM':>9}{'PSNR':>8}")
+    for r in results:
+        print(f"{r['profile']:<12}{r['fps']:>8.2f}{r['bytes'] / 1024:>10.0f}{r['ssim'] or 0:>9.4f}{r['psnr'] or 0:>8.2f}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "video": args.video,
+        "mockup": args.mockup,
+        "scene": args.scene,
+        "frames": args.frames,
+        "results": results,
+    }
+    output_file = Path("report") / "encode-profiles.json"
+    output_file.parent.mkdir(exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+if __name__ == "__main__":
+    main()
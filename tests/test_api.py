@@ -1,6 +1,9 @@
 import pytest
 from fastapi import status
 from app.config.exceptions import TemplateNotFoundError
+from minio.error import S3Error
+from app.api import routes
+from app.services.poster import PosterRenderer
 
 def test_health_check(client, setup_logging):
     """Test the health check endpoint."""
@@ -41,4 +44,49 @@ def test_error_handling(client, setup_logging):
     # Verify error logging
     log_content = setup_logging.getvalue()
     assert "request_failed" in log_content
-    assert "status_code=404" in log_content 
\ No newline at end of file
+    assert "status_code=404" in log_content 
+
+def get_poster(client, monkeypatch, tmp_path, video_key, fetch_video=None):
+    monkeypatch.setenv("API_KEY", "test-key")
+    monkeypatch.setattr(routes, "poster_renderer", PosterRenderer(
+        fetch_video or routes.poster_renderer.fetch_video, video_dir=str(tmp_path)
+    ))
+    return client.get(
+        "/api/poster/mockup1/scene1/0",
+        params={"video_key": video_key},
+        headers={"X-API-Key": "test-key"},
+    )
+
+def test_poster_of_video_being_ingested(client, setup_logging, monkeypatch, tmp_path):
+    """Posters never transcode in the request: a missing mezzanine is a retryable 409."""
+    monkeypatch.setattr(routes.storage, "object_exists", lambda key: key == "uploads/new.mp4")
+
+    response = get_poster(client, monkeypatch, tmp_path, "uploads/new.mp4")
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["detail"]["error_code"] == "VIDEO_NOT_READY"
+    assert response.headers["Retry-After"] == "2"
+
+def test_poster_of_unknown_video(client, setup_logging, monkeypatch, tmp_path):
+    """An unknown or expired video_key is a 404, not a render error."""
+    monkeypatch.setattr(routes.storage, "object_exists", lambda key: False)
+    response = get_poster(client, monkeypatch, tmp_path, "uploads/gone.mp4")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"]["error_code"] == "VIDEO_NOT_FOUND"
+
+    def expired(video_key, path):
+        raise S3Error(None, "NoSuchKey", "The specified key does not exist.", video_key, "1", "host")
+
+    response = get_poster(client, monkeypatch, tmp_path, "uploads/gone.mp4", expired)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_poster_render_failure(client, setup_logging, monkeypatch, tmp_path):
+    """Render failures are a 500 that does not echo the exception."""
+    def broken(video_key, path):
+        raise RuntimeError("secret internal detail")
+
+    response = get_poster(client, monkeypatch, tmp_path, "uploads/a.mp4", broken)
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert response.json()["detail"]["error_code"] == "POSTER_RENDER_ERROR"
+    assert "secret" not in response.text
+    assert "poster_render_failed" in setup_logging.getvalue()
@@ -0,0 +1,45 @@
+import pytest
+import subprocess as sp
+from moviepy.config import get_setting
+from app.services.audio import audio_spans, mux_user_audio
+from app.services.media_probe import probe_streams
+
+def write_video(path, duration, audio=True):
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+           "-f", "lavfi", "-i", f"testsrc=size=64x64:rate=24:duration={duration}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-c:a", "aac"]
+    cmd += ["-c:v", "libx264", "-pix_fmt", "yuv420p", path]
+    sp.run(cmd, check=True)
+
+def audio_stream(path):
+    return probe_streams(path)["audio"]
+
+def job(offset, frames):
+    return {"user_video_offset": offset, "scene_timing": {"in_frame": 0, "out_frame": frames}}
+
+def test_audio_spans():
+    assert audio_spans([job(0.0, 24), job(1.0, 12)]) == [(0.0, 1.5)]
+    assert audio_spans([job(0.0, 24), job(2.0, 24)]) == [(0.0, 1.0), (2.0, 3.0)]
+
+def test_mux_copies_matching_audio(tmp_path):
+    video, user = str(tmp_path / "render.mp4"), str(tmp_path / "user.mp4")
+    write_video(video, 2, audio=False)
+    write_video(user, 2)
+    assert mux_user_audio(video, user, [(0.0, 2.0)])
+    assert audio_stream(video)["codec_name"] == "aac"
+    assert probe_streams(video)["video"]["codec_name"] == "h264"
+
+def test_mux_trims_longer_audio(tmp_path):
+    video, user = str(tmp_path / "render.mp4"), str(tmp_path / "user.mp4")
+    write_video(video, 2, audio=False)
+    write_video(user, 5)
+    assert mux_user_audio(video, user, [(0.0, 1.0), (3.0, 4.0)], audio_bitrate="96k")
+    assert float(audio_stream(video)["duration"]) == pytest.approx(2.0, abs=0.1)
+
+def test_mux_without_user_audio(tmp_path):
+    video, user = str(tmp_path / "render.mp4"), str(tmp_path / "user.mp4")
+    write_video(video, 1, audio=False)
+    write_video(user, 1, audio=False)
+    assert not mux_user_audio(video, user, [(0.0, 1.0)])
+    assert audio_stream(video) is None
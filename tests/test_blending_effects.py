@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from app.services.effects.blending_effects import screen_blend, reflections_effect
+from app.services.effects.blending_effects import BLEND_MODES, blend, blend_lut, lut_blend, screen_blend, reflections_effect
 
 @pytest.fixture
 def base_frame():
@@ -124,4 +124,26 @@ def test_reflections_effect_partial_opacity(base_frame, mock_reflections_clip):
     diff_blend = np.abs(result.astype(float) - full_blend.astype(float))
     
     # Result should be closer to base frame than to full blend
-    assert np.mean(diff_base) < np.mean(diff_blend) 
\ No newline at end of file
+    assert np.mean(diff_base) < np.mean(diff_blend) 
+
+@pytest.mark.parametrize("mode", sorted(BLEND_MODES))
+@pytest.mark.parametrize("opacity", [0.5, 1.0])
+def test_blend_matches_lookup_table(mode, opacity):
+    """blend() agrees with its precomputed table on every pair of inputs."""
+    table = blend_lut(mode, opacity)
+    assert table.shape == (256, 256)
+    assert blend_lut(mode, opacity) is table
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (50, 40, 3), dtype=np.uint8)
+    layer = rng.integers(0, 256, (50, 40, 3), dtype=np.uint8)
+    assert np.array_equal(lut_blend(base, layer, mode, opacity), blend(base, layer, mode, opacity))
+    assert np.array_equal(table[base, layer], blend(base, layer, mode, opacity))
+
+def test_reflections_blend_mode(base_frame, mock_reflections_clip):
+    context = {"reflections_clip": mock_reflections_clip, "output_size": (100, 100)}
+    result = reflections_effect(base_frame, t=0.5, opacity=1.0, context=context, blend_mode="multiply")
+    # Multiplying by the black surround darkens everything outside the reflection.
+    assert not result[:30].any()
+    assert result[50, 50, 0] == 128 * 128 // 255
+    with pytest.raises(ValueError, match="Unknown blend mode"):
+        reflections_effect(base_frame, t=0.5, opacity=1.0, context=context, blend_mode="dissolve")
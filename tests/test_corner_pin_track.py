@@ -0,0 +1,72 @@
+import pytest
+import os
+import json
+import numpy as np
+from app.services.corner_pin_track import (
+    compile_corner_pin_track,
+    load_corner_pin_track,
+    sidecar_path,
+)
+from app.services.effects.perspective_transformations import corner_pin_effect, scale_corners
+
+@pytest.fixture
+def corner_pin_data():
+    return {
+        "0": {"ul": [20.7, 20.2], "ur": [160.4, 21.9], "lr": [200, 199.5], "ll": [1.3, 200]},
+        "2": {"ul": [0, 0], "ur": [200, 0], "lr": [180.8, 180], "ll": [20, 200]},
+    }
+
+@pytest.fixture
+def corner_pin_path(tmp_path, corner_pin_data):
+    path = tmp_path / "corner_pin_data.json"
+    path.write_text(json.dumps(corner_pin_data))
+    return str(path)
+
+def test_compiled_track_matches_json(corner_pin_data):
+    """Compiled corners are the scaled JSON corners; untracked frames are marked."""
+    track = compile_corner_pin_track(corner_pin_data)
+    assert track.nframes == 3
+    assert track.corner_dict(0) == scale_corners(corner_pin_data["0"])
+    assert track.has_frame(2) and not track.has_frame(1) and not track.has_frame(3)
+
+def test_scaled_track(corner_pin_data):
+    """A scaled track maps the source frame onto the scaled quad."""
+    track = compile_corner_pin_track(corner_pin_data)
+    assert track.scaled(1) is track
+    half = track.scaled(0.5)
+    assert np.allclose(half.corners, track.corners * 0.5)
+    matrix = half.homography(0, (100, 50))
+    corners = np.array([[0, 0, 1], [100, 0, 1], [100, 50, 1], [0, 50, 1]], dtype=np.float64) @ matrix.T
+    assert np.allclose(corners[:, :2] / corners[:, 2:], half.corners[0], atol=1e-3)
+
+def test_sidecar_roundtrip(corner_pin_path):
+    """The sidecar is written on first load and rewritten when the JSON changes."""
+    track = load_corner_pin_track(corner_pin_path)
+    assert os.path.exists(sidecar_path(corner_pin_path))
+
+    with open(corner_pin_path) as f:
+        data = json.load(f)
+    data["3"] = data["0"]
+    with open(corner_pin_path, "w") as f:
+        json.dump(data, f)
+    os.utime(corner_pin_path, ns=(0, 10**9))
+
+    updated = load_corner_pin_track(corner_pin_path)
+    assert track.nframes == 3 and updated.nframes == 4
+
+def test_effect_with_track_matches_json(corner_pin_data):
+    """corner_pin_effect renders the same from a compiled track as from JSON data."""
+    class UserClip:
+        duration = 1.0
+        def get_frame(self, t):
+            return np.arange(90 * 160 * 3, dtype=np.uint32).reshape(90, 160, 3).astype(np.uint8)
+
+    frame = np.full((100, 100, 3), 40, dtype=np.uint8)
+    context = {"user_clip": UserClip(), "output_size": (100, 100), "fps": 24, "user_offset": 0.0}
+    json_context = dict(context, corner_pin_data=corner_pin_data)
+    track_context = dict(context, corner_pin_track=compile_corner_pin_track(corner_pin_data))
+
+    for t in (0.0, 1 / 24, 2 / 24):
+        for use_mask in (False, True):
+            expected = corner_pin_effect(frame, t, use_mask, json_context)
+            assert np.array_equal(corner_pin_effect(frame, t, use_mask, track_context), expected)
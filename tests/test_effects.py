@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from app.services.effects.blur_effect import gauss_blur_effect
+from app.services.effects.blur_effect import PYRAMID_MIN_SIGMA, gauss_blur_effect, pyramid_factor
 
 @pytest.fixture
 def sample_frame():
@@ -94,4 +94,39 @@ def test_gauss_blur_edge_cases(sample_frame):
     # Verify the output is still valid
     assert blurred_large.shape == sample_frame.shape
     assert blurred_large.dtype == np.uint8
-    assert np.all(blurred_large >= 0) and np.all(blurred_large <= 255) 
\ No newline at end of file
+    assert np.all(blurred_large >= 0) and np.all(blurred_large <= 255) 
+
+def edge_frames():
+    """Frames whose content runs to the edges: noise, and hard steps at the border."""
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (360, 640, 3), dtype=np.uint8)
+    steps = np.full((360, 640, 3), 255, dtype=np.uint8)
+    steps[:10] = steps[-10:] = steps[:, :10] = steps[:, -10:] = 0
+    steps[180:, 320:] = 96
+    return [noise, steps]
+
+@pytest.mark.parametrize("sigma", [8.0, 20.5, 40.0])
+@pytest.mark.parametrize("frame", edge_frames(), ids=["noise", "steps"])
+def test_large_sigma_blur_accuracy(sigma, frame, monkeypatch):
+    """The pyramid blur for large sigmas stays within 3 levels of a direct Gaussian, edges included."""
+    assert pyramid_factor(sigma) > 1
+
+    fast = gauss_blur_effect(frame, t=0.0, context={}, sigma=sigma)
+    monkeypatch.setattr("app.services.effects.blur_effect.pyramid_factor", lambda s: 1)
+    direct = gauss_blur_effect(frame, t=0.0, context={}, sigma=sigma)
+
+    diff = np.abs(fast.astype(int) - direct.astype(int))
+    assert diff.max() <= 3
+    assert diff.mean() < 0.5
+
+def test_moderate_sigma_blur_is_direct():
+    """Sigmas below 2 * PYRAMID_MIN_SIGMA are blurred directly, without resampling error."""
+    assert pyramid_factor(6.0) == 1
+    assert pyramid_factor(2 * PYRAMID_MIN_SIGMA) == 2
+
+def test_gauss_blur_roi_matches_full_blur(sample_frame, sample_mask):
+    """Inside the mask, blurring only the masked region matches a full-frame blur."""
+    full = gauss_blur_effect(sample_frame, t=0.0, context={}, sigma=3.0)
+    roi = gauss_blur_effect(sample_frame, t=0.0, context={}, sigma=3.0, roi_mask=sample_mask)
+    inside = sample_mask == 1
+    assert np.array_equal(roi[inside], full[inside])
@@ -0,0 +1,128 @@
+import pytest
+import os
+import subprocess
+import tempfile
+import numpy as np
+import moviepy.editor as mpy
+from app.config import renditions
+from app.config.encoder_profiles import encoder_options
+from app.services.encoder import FrameEncoder, RenditionEncoder, transcode_renditions
+from app.services.media_probe import FFPROBE_BINARY, probe_streams
+
+@pytest.fixture
+def output_path():
+    """Provide a temporary output path that is removed afterwards."""
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "encoded.mp4")
+    yield path
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(temp_dir)
+
+def make_frame(index, size=(160, 96)):
+    w, h = size
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    frame[:, :, 1] = min(index * 8, 255)
+    return frame
+
+def test_encode_frames(output_path):
+    """Frames written to the encoder come back with the right size, fps and count."""
+    with FrameEncoder(output_path, (160, 96), fps=24, preset="ultrafast", crf=18, threads=1) as encoder:
+        for index in range(24):
+            encoder.write_frame(make_frame(index))
+    assert encoder.frames_written == 24
+
+    clip = mpy.VideoFileClip(output_path)
+    assert tuple(clip.size) == (160, 96)
+    assert clip.fps == 24
+    assert clip.duration == pytest.approx(1.0, abs=0.05)
+    assert clip.audio is None
+
+    # Lossy, but the green ramp should survive encoding.
+    frame = clip.get_frame(10 / 24)
+    assert abs(int(frame[..., 1].mean()) - 80) <= 3
+    clip.close()
+
+def test_small_queue_still_encodes_everything(output_path):
+    """A queue of one frame applies back-pressure without dropping frames."""
+    with FrameEncoder(output_path, (160, 96), preset="ultrafast", queue_size=1) as encoder:
+        for index in range(12):
+            encoder.write_frame(make_frame(index))
+
+    clip = mpy.VideoFileClip(output_path)
+    assert clip.duration == pytest.approx(0.5, abs=0.05)
+    clip.close()
+
+def test_wrong_frame_shape(output_path):
+    """Frames that do not match the configured size are rejected."""
+    with pytest.raises(ValueError):
+        with FrameEncoder(output_path, (160, 96), preset="ultrafast") as encoder:
+            encoder.write_frame(np.zeros((10, 10, 3), dtype=np.uint8))
+
+def test_invalid_output_directory():
+    """An unwritable output path surfaces as an IOError on close."""
+    with pytest.raises(IOError):
+        with FrameEncoder("/nonexistent/dir/out.mp4", (160, 96), preset="ultrafast") as encoder:
+            encoder.write_frame(make_frame(0))
+
+def test_renditions_from_one_pass(tmp_path, monkeypatch):
+    """One frame stream fans out to scaled renditions, with fps and duration limits."""
+    monkeypatch.setitem(renditions.RENDITIONS, "teaser_webm", dict(renditions.RENDITIONS["teaser_webm"], duration=1))
+    outputs = {name: str(tmp_path / f"{name}.{ext}") for name, ext in (("720p", "mp4"), ("teaser_webm", "webm"), ("1080p", "mp4"))}
+    with RenditionEncoder(outputs, (640, 960), fps=24, preset="ultrafast") as encoder:
+        for index in range(48):
+            encoder.write_frame(make_frame(index, (640, 960)))
+
+    expected = {"720p": (480, 720, "h264"), "teaser_webm": (320, 480, "vp9"), "1080p": (640, 960, "h264")}
+    for name, (w, h, codec) in expected.items():
+        video = probe_streams(outputs[name])["video"]
+        assert (video["width"], video["height"], video["codec_name"]) == (w, h, codec)
+    teaser = mpy.VideoFileClip(outputs["teaser_webm"])
+    assert teaser.fps == 12
+    assert teaser.duration == pytest.approx(1.0, abs=0.1)
+    teaser.close()
+
+    # An already rendered video fans out the same way
+    webp = {"teaser_webp": str(tmp_path / "teaser.webp")}
+    transcode_renditions(outputs["1080p"], webp, (640, 960))
+    assert os.path.getsize(webp["teaser_webp"]) > 0
+
+def test_rendition_pixel_formats(tmp_path):
+    """Every rendition is 4:2:0 in a profile browsers and hardware decoders play."""
+    outputs = {name: str(tmp_path / f"{name}.{profile['extension']}") for name, profile in renditions.RENDITIONS.items()}
+    with RenditionEncoder(outputs, (160, 96), fps=24, preset="ultrafast") as encoder:
+        for index in range(12):
+            encoder.write_frame(make_frame(index))
+
+    expected = {"1080p": ("h264", "Baseline"), "720p": ("h264", "Baseline"), "teaser_webm": ("vp9", "Profile 0")}
+    for name, (codec, profile) in expected.items():
+        video = probe_streams(outputs[name])["video"]
+        assert video["codec_name"] == codec
+        assert video["pix_fmt"] == "yuv420p"
+        assert profile in video["profile"]
+    # ffprobe does not read animated WebP; its frames must be lossy VP8 without alpha.
+    with open(outputs["teaser_webp"], "rb") as f:
+        webp = f.read()
+    assert b"VP8 " in webp and b"VP8L" not in webp and b"ALPH" not in webp
+
+def test_invalid_rendition(tmp_path):
+    with pytest.raises(ValueError):
+        renditions.parse_renditions("720p, 4k")
+    assert renditions.parse_renditions(" 720p,,1080p,720p") == ["720p", "1080p"]
+
+def test_encoder_profile_options(output_path):
+    """Profile settings reach libx264: a fixed GOP puts a keyframe every gop frames."""
+    options = dict(encoder_options("streaming"), preset="ultrafast", gop=6)
+    with FrameEncoder(output_path, (160, 96), **options) as encoder:
+        for index in range(24):
+            encoder.write_frame(make_frame(index))
+    assert encoder.threads >= 1
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=flags", "-of", "csv=p=0", output_path],
+        capture_output=True, check=True, text=True,
+    )
+    assert sum("K" in flags for flags in result.stdout.split()) == 4
+
+    assert "threads" not in encoder_options("balanced")
+    with pytest.raises(ValueError):
+        encoder_options("lossless-ish")
@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from app.services.effects.frame_pool import FramePool
+from app.services.effects.blending_effects import reflections_effect
+from app.services.effects.screen_glow import screen_glow_effect
+from app.services.effects.perspective_transformations import corner_pin_effect
+from app.services.scene_processor import apply_effect_chain
+
+@pytest.fixture
+def context(effect_context):
+    return effect_context()
+
+def test_ring_recycles_outputs():
+    """Output buffers are handed out round-robin and reused."""
+    pool = FramePool((8, 4), ring_size=3)
+    outputs = [pool.next_output() for _ in range(4)]
+    assert outputs[0].shape == (4, 8, 3)
+    assert len({id(o) for o in outputs[:3]}) == 3
+    assert outputs[3] is outputs[0]
+    assert np.shares_memory(pool.get("scratch"), pool.get("scratch", (2, 2)))
+    assert not pool.black().flags.writeable
+
+def test_pooled_chain_matches_allocating_chain(context):
+    """Rendering into pooled buffers gives the same frame as allocating effects."""
+    chain = [
+        {"effect": "corner_pin", "params": {"use_mask": True, "blur_enabled": True, "blur_sigma": 2}},
+        {"effect": "reflections", "params": {"opacity": 0.5}},
+        {"effect": "screen_glow", "params": {"blur_sigma": 1.5}},
+    ]
+    expected = apply_effect_chain(0.0, context, chain)
+
+    pooled = dict(context, frame_pool=FramePool(context["output_size"], ring_size=2))
+    first = apply_effect_chain(0.0, pooled, chain)
+    assert np.array_equal(first, expected)
+    assert np.array_equal(apply_effect_chain(0.0, pooled, chain), expected)
+    # The background frame is never written to.
+    assert first is not context["background_clip"].frame
+
+@pytest.mark.parametrize("effect, params", [
+    (corner_pin_effect, {"use_mask": False, "blur_enabled": True}),
+    (reflections_effect, {"opacity": 0.3}),
+    (screen_glow_effect, {"glow_opacity": 0.7}),
+])
+def test_effects_work_in_place(context, effect, params):
+    """Effects accept their input frame as the destination."""
+    frame = context["background_clip"].frame
+    expected = effect(frame, t=0.0, context=context, **params)
+    buffer = frame.copy()
+    result = effect(buffer, t=0.0, context=context, out=buffer, **params)
+    assert result is buffer
+    assert np.array_equal(result, expected)
@@ -0,0 +1,76 @@
+import pytest
+import os
+import tempfile
+import numpy as np
+import moviepy.editor as mpy
+from app.services.frame_reader import FrameReader
+
+@pytest.fixture
+def counter_video():
+    """Create a short video whose brightness steps up every frame."""
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "counter.mp4")
+
+    def make_frame(t):
+        index = int(round(t * 24))
+        return np.full((64, 96, 3), index * 10, dtype=np.uint8)
+
+    clip = mpy.VideoClip(make_frame, duration=1.0)
+    clip.write_videofile(path, fps=24, codec="libx264", audio=False, logger=None)
+    clip.close()
+
+    yield path
+
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(temp_dir)
+
+def test_sequential_read_matches_moviepy(counter_video):
+    """Frames read in order should match MoviePy's decode."""
+    reference = mpy.VideoFileClip(counter_video)
+    with FrameReader(counter_video) as reader:
+        assert tuple(reader.size) == (96, 64)
+        assert reader.fps == 24
+        for index in range(reader.nframes):
+            t = index / reader.fps
+            frame = reader.get_frame(t)
+            assert frame.shape == (64, 96, 3)
+            assert frame.dtype == np.uint8
+            assert np.array_equal(frame, reference.get_frame(t))
+    reference.close()
+
+def test_repeated_index_returns_cached_frame(counter_video):
+    """Asking for the same frame twice must not advance the stream."""
+    with FrameReader(counter_video) as reader:
+        first = reader.get_frame_index(3)
+        again = reader.get_frame_index(3)
+        assert first is again
+        assert not np.array_equal(reader.get_frame_index(4), first)
+
+def test_backward_and_forward_seek(counter_video):
+    """Out-of-order access restarts the pipe and still returns the right frame."""
+    with FrameReader(counter_video) as reader:
+        late = reader.get_frame_index(20).copy()
+        early = reader.get_frame_index(2)
+        assert np.mean(early) < np.mean(late)
+        assert np.array_equal(reader.get_frame_index(20), late)
+
+def test_gray_pixel_format(counter_video):
+    """The gray pixel format yields single-channel frames."""
+    with FrameReader(counter_video, pix_fmt="gray") as reader:
+        frame = reader.get_frame_index(5)
+        assert frame.shape == (64, 96)
+        assert frame.dtype == np.uint8
+
+def test_scaled_proxy(counter_video):
+    """A scaled reader decodes downsampled frames of even size."""
+    with FrameReader(counter_video) as full, FrameReader(counter_video, scale=0.5) as proxy:
+        assert tuple(proxy.size) == (48, 32)
+        frame = proxy.get_frame_index(5)
+        assert frame.shape == (32, 48, 3)
+        assert abs(float(frame.mean()) - float(full.get_frame_index(5).mean())) < 4
+
+def test_invalid_path():
+    """Opening a missing file raises an IOError."""
+    with pytest.raises(IOError):
+        FrameReader("nonexistent.mp4")
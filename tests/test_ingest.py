@@ -0,0 +1,92 @@
+import pytest
+import shutil
+import subprocess as sp
+from moviepy.config import get_setting
+from app.services.ingest import (
+    MEZZANINE_FPS, MEZZANINE_GOP, MezzanineNotReady, fetch_mezzanine, ingest_upload, mezzanine_key,
+    mezzanine_size, normalize_upload,
+)
+from app.services.media_probe import FFPROBE_BINARY, probe_streams
+
+def write_source(path, size="300x200", rate=30, duration=1):
+    """A 4:4:4 test pattern, as a stand-in for a high-end camera upload."""
+    sp.run([
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate={rate}", "-t", str(duration),
+        "-c:v", "libx264", "-pix_fmt", "yuv444p", path,
+    ], check=True)
+
+def keyframe_count(path):
+    result = sp.run([
+        FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=flags", "-of", "csv=p=0", path,
+    ], capture_output=True, check=True, text=True)
+    return sum("K" in line for line in result.stdout.split())
+
+def test_mezzanine_size():
+    # Scaled down until one side covers the quad, never up, always even
+    assert mezzanine_size((3840, 2160), (1000, 1000)) == (1778, 1000)
+    assert mezzanine_size((640, 480), (1000, 1000)) == (640, 480)
+    assert mezzanine_size((301, 201), (1000, 1000)) == (300, 200)
+    assert mezzanine_key("uploads/abc.mov") == "uploads/abc.mezz1.mp4"
+
+def test_normalize_upload(tmp_path):
+    source = str(tmp_path / "source.mp4")
+    output = str(tmp_path / "mezz.mp4")
+    write_source(source)
+    result = normalize_upload(source, output, max_size=(100, 100))
+    assert result == {"size": (150, 100), "audio": False}
+
+    video = probe_streams(output)["video"]
+    assert (video["width"], video["height"]) == (150, 100)
+    assert video["pix_fmt"] == "yuv420p"
+    assert video["r_frame_rate"] == f"{MEZZANINE_FPS}/1"
+    assert int(video["nb_frames"]) == MEZZANINE_FPS
+    assert keyframe_count(output) == MEZZANINE_FPS // MEZZANINE_GOP
+
+class FakeStorage:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+
+    def object_exists(self, key):
+        return key in self.objects
+
+    def get_object(self, key, path):
+        shutil.copy(self.objects[key], path)
+
+    def put_object(self, key, path):
+        stored = path + ".stored"
+        shutil.copy(path, stored)
+        self.objects[key] = stored
+        return key
+
+def test_ingest_upload_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEZZANINE_MAX_SIZE", "100x100")
+    source = str(tmp_path / "source.mp4")
+    write_source(source)
+    storage = FakeStorage({"uploads/a.mp4": source})
+
+    local = str(tmp_path / "render.mp4")
+    key = ingest_upload("uploads/a.mp4", storage, local)
+    assert key == "uploads/a.mezz1.mp4" and key in storage.objects
+    assert probe_streams(local)["video"]["width"] == 150
+
+    # Already ingested: the stored mezzanine is reused
+    del storage.objects["uploads/a.mp4"]
+    assert ingest_upload("uploads/a.mp4", storage) == key
+    with pytest.raises(KeyError):
+        ingest_upload("uploads/b.mp4", storage)
+
+def test_fetch_mezzanine_never_builds(tmp_path):
+    source = str(tmp_path / "source.mp4")
+    write_source(source)
+    storage = FakeStorage({"uploads/a.mp4": source})
+
+    local = str(tmp_path / "poster.mp4")
+    with pytest.raises(MezzanineNotReady):
+        fetch_mezzanine("uploads/a.mp4", storage, local)
+    assert list(storage.objects) == ["uploads/a.mp4"]
+
+    storage.objects["uploads/a.mezz1.mp4"] = source
+    assert fetch_mezzanine("uploads/a.mp4", storage, local) == "uploads/a.mezz1.mp4"
+    assert probe_streams(local)["video"]["width"] == 300
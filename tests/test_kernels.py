@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+from app.services.effects import kernels
+
+@pytest.fixture
+def frames():
+    """Random uint8 frames and a matte covering the whole 0-255 range."""
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    b = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    matte = rng.integers(0, 256, (64, 64), dtype=np.uint8)
+    matte[:, :8] = 0
+    matte[:, -8:] = 255
+    return a, b, matte
+
+def within_one(result, expected):
+    return np.abs(result.astype(np.int32) - expected.astype(np.int32)).max() <= 1
+
+def test_premultiply_and_alpha_over(frames):
+    """Alpha-over matches the truncating float composite."""
+    fg, bg, matte = frames
+    alpha = (matte.astype(np.float32) / 255.0)[:, :, np.newaxis]
+    matte = kernels.expand_matte(matte)
+
+    masked = kernels.premultiply(fg, matte)
+    expected_masked = (fg.astype(np.float32) * alpha).astype(np.uint8)
+    assert within_one(masked, expected_masked)
+
+    over = kernels.alpha_over(masked, bg, matte)
+    expected = (expected_masked.astype(np.float32) + bg.astype(np.float32) * (1 - alpha)).astype(np.uint8)
+    assert within_one(over, expected)
+    assert np.array_equal(over[:, -8:], masked[:, -8:])
+    assert np.array_equal(over[:, :8], bg[:, :8])
+
+def test_lerp(frames):
+    fg, bg, matte = frames
+    alpha = (matte.astype(np.float32) / 255.0)[:, :, np.newaxis]
+    expected = (fg.astype(np.float32) * alpha + bg.astype(np.float32) * (1 - alpha)).astype(np.uint8)
+    assert within_one(kernels.lerp(fg, bg, kernels.expand_matte(matte)), expected)
+
+def test_screen(frames):
+    a, b, _ = frames
+    a_f = a.astype(np.float32) / 255.0
+    b_f = b.astype(np.float32) / 255.0
+    expected = np.clip((1 - (1 - a_f) * (1 - b_f)) * 255, 0, 255).astype(np.uint8)
+    assert within_one(kernels.screen(a, b), expected)
+    white = np.full_like(a, 255)
+    assert np.array_equal(kernels.screen(a, white), white)
+    assert np.array_equal(kernels.screen(a, np.zeros_like(a)), a)
+
+@pytest.mark.parametrize("opacity", [0.0, 0.3, 0.5, 1.0])
+def test_mix(frames, opacity):
+    a, b, _ = frames
+    expected = (a.astype(np.float32) * (1 - opacity) + b.astype(np.float32) * opacity).astype(np.uint8)
+    assert within_one(kernels.mix(a, b, opacity), expected)
+
+def test_sums_saturate():
+    """Overflowing composites clip to white instead of wrapping."""
+    glow = np.full((4, 4, 3), 200, dtype=np.uint8)
+    bg = np.full((4, 4, 3), 200, dtype=np.uint8)
+    matte = np.zeros((4, 4, 3), dtype=np.uint8)
+    assert (kernels.alpha_over(glow, bg, matte) == 255).all()
+
+def test_multiply_add_overlay(frames):
+    """The extra blend modes match their truncating float definitions."""
+    a, b, _ = frames
+    a_f = a.astype(np.float32) / 255.0
+    b_f = b.astype(np.float32) / 255.0
+    assert within_one(kernels.multiply(a, b), (a_f * b_f * 255).astype(np.uint8))
+    assert np.array_equal(kernels.add(a, b), np.minimum(a.astype(np.int32) + b, 255).astype(np.uint8))
+    overlay = np.where(a_f < 0.5, 2 * a_f * b_f, 1 - 2 * (1 - a_f) * (1 - b_f))
+    assert within_one(kernels.overlay(a, b), (overlay * 255).astype(np.uint8))
+    # In place over the base.
+    expected = kernels.overlay(a, b)
+    assert np.array_equal(kernels.overlay(a, b, out=a), expected)
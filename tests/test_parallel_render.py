@@ -0,0 +1,134 @@
+import pytest
+import os
+import numpy as np
+import moviepy.editor as mpy
+from app.config import load_mockup_config
+from app.config.resources import cpu_limit
+from app.services.parallel_render import render_scenes_parallel, shard_scene_jobs, split_frame_range
+from app.services.timeline_assembler import assemble_timeline
+from app.services.frame_reader import FrameReader
+
+@pytest.fixture
+def user_video(tmp_path):
+    """Create a short user video with moviepy."""
+    path = str(tmp_path / "user.mp4")
+    clip = mpy.ColorClip((320, 180), color=(200, 40, 40)).set_duration(1.0)
+    clip.write_videofile(path, fps=24, codec="libx264", audio=False, logger=None)
+    clip.close()
+    return path
+
+@pytest.fixture
+def scene_jobs():
+    """Two short mockup1 scenes with a cheap effects chain."""
+    scenes = load_mockup_config()["mockup1"]["scenes"]
+    chain = [{"effect": "reflections", "params": {"opacity": 0.5}}]
+    return [
+        {
+            "mockup_config": dict(scenes[1], effects_chain=chain),
+            "scene_timing": {"in_frame": 0, "out_frame": 4},
+            "user_video_offset": 0.0,
+        },
+        {
+            "mockup_config": dict(scenes[0], effects_chain=chain),
+            "scene_timing": {"in_frame": 0, "out_frame": 3},
+            "user_video_offset": 4 / 24,
+        },
+    ]
+
+def test_cpu_limit_override(monkeypatch):
+    """CPU_LIMIT overrides the detected CPU count."""
+    monkeypatch.setenv("CPU_LIMIT", "3")
+    assert cpu_limit() == 3
+    monkeypatch.delenv("CPU_LIMIT")
+    assert cpu_limit() >= 1
+
+def test_render_scenes_parallel(user_video, scene_jobs, tmp_path, monkeypatch):
+    """Every scene is rendered to its own output, in scene order."""
+    monkeypatch.setenv("CPU_LIMIT", "2")
+    output_paths = [str(tmp_path / f"scene_{i}.mp4") for i in range(len(scene_jobs))]
+
+    result = render_scenes_parallel(scene_jobs, user_video, output_paths)
+
+    assert result == output_paths
+    for path, expected_frames in zip(output_paths, [4, 3]):
+        assert os.path.exists(path)
+        clip = mpy.VideoFileClip(path)
+        assert clip.duration == pytest.approx(expected_frames / 24, abs=0.05)
+        clip.close()
+
+def test_render_scenes_parallel_splits_cpus(scene_jobs, monkeypatch):
+    """Each concurrent scene gets its share of the CPUs for encoding, compositing and tiling."""
+    monkeypatch.setenv("CPU_LIMIT", "8")
+    calls = []
+    monkeypatch.setattr("app.services.parallel_render.render_scene_process", calls.append)
+
+    render_scenes_parallel(scene_jobs, "user.mp4", ["a.mp4", "b.mp4"])
+
+    assert [(call["workers"], call["encoder_options"]["threads"]) for call in calls] == [(4, 4), (4, 4)]
+
+def test_render_scenes_parallel_mismatched_outputs(user_video, scene_jobs):
+    """One output path is required per scene."""
+    with pytest.raises(ValueError):
+        render_scenes_parallel(scene_jobs, user_video, ["only_one.mp4"])
+
+def test_split_frame_range():
+    """Ranges are contiguous, balanced and respect the minimum chunk length."""
+    assert split_frame_range(100, 4) == [(0, 25), (25, 50), (50, 75), (75, 100)]
+    assert split_frame_range(50, 4) == [(0, 25), (25, 50)]
+    assert split_frame_range(10, 4) == [(0, 10)]
+    assert split_frame_range(7, 3, min_chunk_frames=1) == [(0, 3), (3, 5), (5, 7)]
+    with pytest.raises(ValueError):
+        split_frame_range(0, 2)
+
+def test_shard_scene_jobs():
+    """Long scenes are split into chunks while short scenes stay whole."""
+    jobs = [
+        {"scene_timing": {"in_frame": 0, "out_frame": 96}, "user_video_offset": 0.0},
+        {"scene_timing": {"in_frame": 10, "out_frame": 30}, "user_video_offset": 4.0},
+    ]
+    chunks = shard_scene_jobs(jobs, workers=4)
+
+    assert [c["frame_range"] for c in chunks] == [(0, 24), (24, 48), (48, 72), (72, 96), (0, 20)]
+    assert [c["user_video_offset"] for c in chunks] == [0.0] * 4 + [4.0]
+
+def test_sharded_scene_joins_losslessly(user_video, scene_jobs, tmp_path):
+    """Chunks of one scene concatenate to the same frames as the chunk files."""
+    job = scene_jobs[0]
+    chunk_jobs = [dict(job, frame_range=(0, 2)), dict(job, frame_range=(2, 4))]
+    chunk_paths = [str(tmp_path / f"chunk_{i}.mp4") for i in range(2)]
+    render_scenes_parallel(chunk_jobs, user_video, chunk_paths, max_workers=2)
+
+    joined = str(tmp_path / "joined.mp4")
+    assemble_timeline(chunk_paths, joined)
+
+    joined_clip = mpy.VideoFileClip(joined)
+    assert joined_clip.duration == pytest.approx(4 / 24, abs=0.01)
+    joined_clip.close()
+
+    expected = []
+    for path in chunk_paths:
+        with FrameReader(path) as reader:
+            expected.extend(reader.get_frame_index(i).copy() for i in range(2))
+    with FrameReader(joined) as reader:
+        for index, reference in enumerate(expected):
+            assert np.array_equal(reader.get_frame_index(index), reference)
+
+def render_in_child(scene_jobs, user_video, output_paths):
+    return render_scenes_parallel(scene_jobs, user_video, output_paths, max_workers=2)
+
+def test_render_scenes_parallel_in_daemonic_worker(user_video, scene_jobs, tmp_path):
+    """Scenes render from inside a Celery prefork (billiard) pool child."""
+    billiard = pytest.importorskip("billiard")
+    output_paths = [str(tmp_path / f"scene_{i}.mp4") for i in range(len(scene_jobs))]
+
+    with billiard.Pool(1) as pool:
+        result = pool.apply(render_in_child, (scene_jobs, user_video, output_paths))
+
+    assert result == output_paths
+    assert all(os.path.getsize(path) > 0 for path in output_paths)
+
+def test_render_scenes_parallel_reports_failures(user_video, scene_jobs, tmp_path):
+    """A scene process that fails raises in the caller."""
+    job = dict(scene_jobs[0], frame_range=(3, 99))
+    with pytest.raises(RuntimeError, match="Invalid frame range"):
+        render_scenes_parallel([job], user_video, [str(tmp_path / "scene.mp4")])
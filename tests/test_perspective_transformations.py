@@ -5,7 +5,10 @@ import cv2
 from app.services.effects.perspective_transformations import (
     apply_corner_pin,
     load_corner_pin_data,
-    corner_pin_effect
+    corner_pin_effect,
+    bake_scene_matte,
+    mip_level,
+    user_frame_mip
 )
 
 @pytest.fixture
@@ -225,4 +228,87 @@ def test_corner_pin_effect_with_mask_clip(sample_frame, mock_user_clip, mock_cor
     # Verify that the effect was applied by checking specific regions
     original_center = sample_frame[45:55, 45:55, :]
     result_center = result[45:55, 45:55, :]
-    assert not np.array_equal(original_center, result_center) 
\ No newline at end of file
+    assert not np.array_equal(original_center, result_center) 
+
+def test_baked_matte_matches_live_matte(sample_frame, mock_user_clip):
+    """Corner pin renders the same with a baked matte as with one built per frame."""
+    class MockMaskClip:
+        duration = 1.0
+        def get_frame(self, t):
+            mask = np.zeros((100, 100), dtype=np.uint8)
+            mask[:, :60] = 200
+            return mask
+
+    corner_pin_data = {
+        "0": {"ul": [20, 20], "ur": [160, 20], "lr": [200, 200], "ll": [0, 200]},
+        "2": {"ul": [0, 0], "ur": [200, 0], "lr": [180, 180], "ll": [20, 200]},
+    }
+    context = {
+        "user_clip": mock_user_clip,
+        "output_size": (100, 100),
+        "corner_pin_data": corner_pin_data,
+        "fps": 24,
+        "user_offset": 0.0,
+        "mask_clip": MockMaskClip(),
+    }
+    mattes = np.empty((3, 100, 100), dtype=np.uint8)
+    bake_scene_matte(context, mattes)
+    assert not mattes[1].any()
+
+    class MatteClip:
+        nframes = 3
+        def get_frame_index(self, index):
+            return mattes[index]
+
+    for t in (0.0, 2 / 24):
+        live = corner_pin_effect(sample_frame, t, True, context, blur_enabled=True, blur_sigma=2)
+        baked = corner_pin_effect(sample_frame, t, True, dict(context, matte_clip=MatteClip()), blur_enabled=True, blur_sigma=2)
+        assert np.array_equal(live, baked)
+
+@pytest.mark.parametrize("use_mask, blur_enabled", [(True, True), (True, False), (False, True)])
+def test_roi_composite_matches_full_frame(monkeypatch, still_clip, use_mask, blur_enabled):
+    """Compositing inside the padded quad bounding box matches a full-frame pass."""
+    from app.services.effects import perspective_transformations
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    context = {
+        "user_clip": still_clip(rng.integers(1, 256, (90, 160, 3), dtype=np.uint8)),
+        "mask_clip": still_clip(rng.integers(0, 256, (240, 320), dtype=np.uint8)),
+        "corner_pin_data": {"0": {"ul": [200, 120], "ur": [400, 140], "lr": [380, 260], "ll": [180, 240]}},
+        "output_size": (320, 240),
+        "fps": 24,
+        "user_offset": 0.0,
+    }
+    roi_result = corner_pin_effect(frame, 0.0, use_mask, context, blur_enabled=blur_enabled, blur_sigma=3)
+
+    monkeypatch.setattr(perspective_transformations, "corner_pin_roi", lambda corners, size, padding=0: (0, 0, *size))
+    full_result = corner_pin_effect(frame, 0.0, use_mask, context, blur_enabled=blur_enabled, blur_sigma=3)
+
+    assert np.abs(roi_result.astype(int) - full_result.astype(int)).max() <= 1
+    # Far outside the quad and its blur halo, the frame is untouched.
+    assert np.array_equal(roi_result[:, 250:], frame[:, 250:])
+
+def test_mip_level():
+    quad = {"ul": [0, 0], "ur": [100, 0], "lr": [100, 50], "ll": [0, 50]}
+    assert mip_level(quad, (150, 75)) == 0
+    assert mip_level(quad, (400, 200)) == 2
+    # The less minified axis decides, so neither is undersampled
+    assert mip_level(quad, (800, 100)) == 1
+    assert mip_level(quad, (100000, 50000)) == 4
+    assert user_frame_mip(np.zeros((200, 400, 3), dtype=np.uint8), 2).shape == (50, 100, 3)
+
+def test_corner_pin_samples_matching_mip_level(still_clip):
+    """A fine pattern pinned into a small quad averages out instead of aliasing."""
+    stripes = np.zeros((512, 512, 3), dtype=np.uint8)
+    stripes[:, ::2] = 255
+    context = {
+        "user_clip": still_clip(stripes),
+        "corner_pin_data": {"0": {"ul": [40, 40], "ur": [168, 40], "lr": [168, 168], "ll": [40, 168]}},
+        "output_size": (100, 100),
+        "fps": 24,
+        "user_offset": 0.0,
+    }
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    result = corner_pin_effect(frame, 0.0, True, context)
+    inside = result[30:70, 30:70].astype(int)
+    assert np.abs(inside - 127).max() <= 2
@@ -0,0 +1,89 @@
+import pytest
+import os
+import shutil
+import threading
+import cv2
+import numpy as np
+from app.services.frame_reader import FrameReader
+from app.services.poster import PosterRenderer, encode_poster, render_poster_frame
+from app.services.scene_processor import close_scene_context, load_scene_context, render_scene_frames
+
+@pytest.fixture
+def scene(make_scene):
+    """A tiny 64x64 template scene and a user video."""
+    return make_scene()
+
+def test_poster_matches_scene_render(scene, capture_encoder):
+    """A poster is exactly the frame the scene renders at that index."""
+    config, user_path = scene
+    with FrameReader(user_path) as user_clip:
+        context = load_scene_context(config, user_clip, 0.5)
+        encoder = capture_encoder()
+        try:
+            render_scene_frames(context, config["effects_chain"], (0, 12), encoder)
+        finally:
+            close_scene_context(context)
+
+    with FrameReader(user_path) as user_clip:
+        for index in (11, 3):
+            poster = render_poster_frame(config, user_clip, index, user_video_offset=0.5)
+            assert np.array_equal(poster, encoder.frames[index])
+        with pytest.raises(ValueError):
+            render_poster_frame(config, user_clip, 500)
+
+def test_renderer_caches_posters(scene, tmp_path):
+    config, user_path = scene
+    fetched = []
+
+    def fetch_video(video_key, path):
+        fetched.append(video_key)
+        shutil.copy(user_path, path)
+
+    renderer = PosterRenderer(fetch_video, cache_size=2, video_dir=str(tmp_path / "videos"))
+    mockup = {"scenes": [config]}
+    png = renderer.render(mockup, "mockup", "scene1", 5, "uploads/user.mp4", fmt="png")
+    image = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape == (64, 64, 3)
+    assert renderer.render(mockup, "mockup", "scene1", 5, "uploads/user.mp4", fmt="png") is png
+    assert renderer.render(mockup, "mockup", "scene1", 6, "uploads/user.mp4")[:2] == b"\xff\xd8"
+    assert fetched == ["uploads/user.mp4"]
+
+    with pytest.raises(ValueError):
+        renderer.render(mockup, "mockup", "scene9", 5, "uploads/user.mp4")
+    with pytest.raises(ValueError):
+        encode_poster(image, "gif")
+
+def test_renderer_fetches_outside_render_lock(scene, tmp_path):
+    """A slow download of one video does not hold up posters of another."""
+    config, user_path = scene
+    release = threading.Event()
+
+    def fetch_video(video_key, path):
+        if video_key == "uploads/slow.mp4":
+            assert release.wait(10)
+        shutil.copy(user_path, path)
+
+    renderer = PosterRenderer(fetch_video, video_dir=str(tmp_path / "videos"))
+    mockup = {"scenes": [config]}
+    renderer.render(mockup, "mockup", "scene1", 1, "uploads/fast.mp4")
+
+    slow = threading.Thread(target=renderer.render, args=(mockup, "mockup", "scene1", 1, "uploads/slow.mp4"))
+    slow.start()
+    try:
+        assert renderer.render(mockup, "mockup", "scene1", 2, "uploads/fast.mp4")[:2] == b"\xff\xd8"
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join()
+    assert not renderer._pending and not renderer._fetch_locks
+
+def test_renderer_propagates_fetch_errors(scene, tmp_path):
+    config, _ = scene
+
+    def fetch_video(video_key, path):
+        raise LookupError(video_key)
+
+    renderer = PosterRenderer(fetch_video, video_dir=str(tmp_path / "videos"))
+    with pytest.raises(LookupError):
+        renderer.render({"scenes": [config]}, "mockup", "scene1", 1, "uploads/missing.mp4")
+    assert not renderer._pending and not os.listdir(tmp_path / "videos")
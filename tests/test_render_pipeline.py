@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+import moviepy.editor as mpy
+from app.services.frame_reader import FrameReader
+from app.services.render_pipeline import PrefetchedClip, pipeline_settings
+from app.services.scene_processor import close_scene_context, load_scene_context, render_scene_frames
+
+def ramp(t):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[..., 0] = int(t * 100)
+    frame[:, :, 1] = np.arange(64, dtype=np.uint8)[None] * 3
+    return frame
+
+@pytest.fixture
+def scene(make_scene):
+    """A tiny template scene with moving corners and a blurred corner pin."""
+    return make_scene(
+        reflections=lambda t: np.full((64, 64, 3), int(t * 120), dtype=np.uint8),
+        mask=lambda t: np.full((64, 64, 3), 200, dtype=np.uint8),
+        user=ramp,
+        corner_pin=lambda i: {"ul": [20 + i, 16], "ur": [100, 20], "lr": [96, 100 - i], "ll": [16, 96]},
+        effects_chain=[
+            {"effect": "corner_pin", "params": {"use_mask": True, "blur_enabled": True, "blur_sigma": 2}},
+            {"effect": "reflections", "params": {"opacity": 0.5, "blend_mode": "overlay"}},
+        ],
+    )
+
+@pytest.fixture
+def render(capture_encoder):
+    def render(config, user_clip, workers, frame_range=(0, 24), delay=0.0):
+        context = load_scene_context(config, user_clip, 0.5)
+        encoder = capture_encoder(delay)
+        try:
+            render_scene_frames(context, config["effects_chain"], frame_range, encoder, workers=workers)
+        finally:
+            close_scene_context(context)
+        return encoder.frames
+    return render
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_pipelined_render_matches_serial(scene, render, workers):
+    config, user_path = scene
+    with FrameReader(user_path) as user_clip:
+        serial = render(config, user_clip, workers=1)
+    with FrameReader(user_path) as user_clip:
+        pipelined = render(config, user_clip, workers=workers, delay=0.002)
+    assert len(pipelined) == len(serial) == 24
+    for a, b in zip(serial, pipelined):
+        assert np.array_equal(a, b)
+
+def test_pipelined_render_with_moviepy_user_clip(scene, render):
+    config, user_path = scene
+    user_clip = mpy.VideoFileClip(user_path)
+    try:
+        serial = render(config, user_clip, workers=1, frame_range=(5, 20))
+        pipelined = render(config, user_clip, workers=3, frame_range=(5, 20))
+    finally:
+        user_clip.close()
+    assert all(np.array_equal(a, b) for a, b in zip(serial, pipelined))
+
+def test_prefetched_clip_out_of_order(scene):
+    _, user_path = scene
+    with FrameReader(user_path) as reader, FrameReader(user_path) as reference:
+        clip = PrefetchedClip(reader, start_index=4, depth=3)
+        try:
+            for index in (5, 4, 7, 6, 9, 8, 30, 2):
+                assert np.array_equal(clip.get_frame_index(index), reference.get_frame_index(index))
+            # 2 is behind the decode window: read directly
+            assert clip.misses == 1
+        finally:
+            clip.close()
+
+def test_pipeline_settings(monkeypatch):
+    monkeypatch.setenv("RENDER_WORKERS", "3")
+    monkeypatch.delenv("RENDER_QUEUE_DEPTH", raising=False)
+    monkeypatch.delenv("RENDER_PREFETCH", raising=False)
+    assert pipeline_settings() == {"workers": 3, "queue_depth": 6, "prefetch": 8}
+    assert pipeline_settings(1)["workers"] == 1
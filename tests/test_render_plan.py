@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+from app.services.effects.frame_pool import FramePool
+from app.services.render_plan import bake_static_plate, compile_effect_chain
+from app.services.template_store import TemplateFrameStore
+from app.services.scene_processor import apply_effect_chain
+
+@pytest.fixture
+def context(effect_context):
+    return effect_context(seed=1)
+
+CHAINS = [
+    [
+        {"effect": "corner_pin", "params": {"use_mask": True, "blur_enabled": True, "blur_sigma": 2}},
+        {"effect": "reflections", "params": {"opacity": 0.5}},
+    ],
+    [
+        {"effect": "gauss_blur", "params": {"sigma": 1.5}},
+        {"effect": "corner_pin", "params": {"use_mask": False}},
+        {"effect": "reflections", "params": {"opacity": 0.3}},
+        {"effect": "screen_glow", "params": {"blur_sigma": 1.5}},
+    ],
+    [{"effect": "reflections", "params": {"opacity": 0.7}}],
+    [
+        {"effect": "corner_pin", "params": {"use_mask": True}},
+        {"effect": "reflections", "params": {"opacity": 0.6, "blend_mode": "overlay"}},
+    ],
+]
+
+@pytest.mark.parametrize("chain", CHAINS)
+@pytest.mark.parametrize("pooled", [False, True])
+@pytest.mark.parametrize("t", [0.0, 2.0])
+def test_plan_matches_interpreted_chain(context, chain, pooled, t):
+    """The compiled (and fused) plan renders exactly what apply_effect_chain does."""
+    expected = apply_effect_chain(t, context, chain)
+    if pooled:
+        context["frame_pool"] = FramePool(context["output_size"], ring_size=2)
+    plan = compile_effect_chain(chain)
+    assert np.array_equal(plan.render(t, context), expected)
+    assert np.array_equal(compile_effect_chain(chain, fuse=False).render(t, context), expected)
+
+def test_corner_pin_reflections_are_fused():
+    plan = compile_effect_chain(CHAINS[1])
+    assert [step.name for step in plan.steps] == ["gauss_blur", "corner_pin+reflections", "screen_glow"]
+    assert plan.steps[1].user_dependent
+    assert not plan.steps[2].user_dependent
+    assert [step.name for step in compile_effect_chain(CHAINS[1], fuse=False).steps] == [
+        "gauss_blur", "corner_pin", "reflections", "screen_glow",
+    ]
+
+def test_pixel_params_follow_render_scale():
+    plan = compile_effect_chain(CHAINS[1], scale=0.25)
+    assert plan.steps[0].params == {"sigma": 1.5 * 0.25}
+    assert plan.steps[1].params["reflections"] == {"opacity": 0.3}
+    assert CHAINS[1][0]["params"] == {"sigma": 1.5}
+
+@pytest.mark.parametrize("chain, message", [
+    ([{"effect": "sparkle"}], "not found"),
+    ([{"effect": "reflections", "params": {}}], "Missing params"),
+    ([{"effect": "reflections", "params": {"opacity": 0.5, "gain": 2}}], "Unknown params"),
+    ([{"effect": "gauss_blur", "params": {"out": None}}], "Unknown params"),
+    ([{"params": {}}], "no 'effect'"),
+    ([{"effect": "reflections", "params": {"opacity": 0.5, "blend_mode": "dissolve"}}], "Invalid blend_mode"),
+])
+def test_invalid_chains_are_rejected(chain, message):
+    with pytest.raises(ValueError, match=message):
+        compile_effect_chain(chain)
+
+def test_static_plate_matches_full_render(context, tmp_path):
+    """Frames started from the baked plate equal fully rendered ones."""
+    chain = CHAINS[1][1:]
+    plan = compile_effect_chain(chain)
+    step = plan.static_plate_step
+    assert step.name == "corner_pin+reflections"
+    assert compile_effect_chain(CHAINS[1]).static_plate_step is None
+
+    store = TemplateFrameStore(str(tmp_path))
+    plate = store.get_or_build(
+        "plate", (24, 64, 96, 3), lambda frames: bake_static_plate(context, step, frames),
+        {"fps": 24, "duration": 1.0, "size": [96, 64]},
+    )
+    expected = [apply_effect_chain(t, context, chain) for t in (0.0, 0.5, 2.0)]
+    plan.use_static_plate(plate)
+    context["frame_pool"] = FramePool(context["output_size"], ring_size=2)
+    for t, frame in zip((0.0, 0.5, 2.0), expected):
+        assert np.array_equal(plan.render(t, context), frame)
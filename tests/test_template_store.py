@@ -0,0 +1,64 @@
+import pytest
+import os
+import numpy as np
+import moviepy.editor as mpy
+from app.services.frame_reader import FrameReader
+from app.services.template_store import StoredFrames, TemplateFrameStore, open_template_asset
+
+@pytest.fixture
+def template_video(tmp_path):
+    """Create a short template video whose frames differ over time."""
+    path = str(tmp_path / "template.mp4")
+    clip = mpy.VideoClip(
+        lambda t: np.full((48, 64, 3), int(t * 200) % 256, dtype=np.uint8), duration=0.5
+    )
+    clip.write_videofile(path, fps=24, codec="libx264", audio=False, logger=None)
+    clip.close()
+    return path
+
+@pytest.fixture
+def store(tmp_path):
+    return TemplateFrameStore(cache_dir=str(tmp_path / "store"))
+
+def test_stored_frames_match_decoder(template_video, store):
+    """Stored frames are identical to the frames decoded by FrameReader."""
+    stored = store.open_asset(template_video)
+    with FrameReader(template_video) as reader:
+        assert stored.nframes == reader.nframes
+        assert stored.size == reader.size
+        for index in range(reader.nframes):
+            assert np.array_equal(stored.get_frame_index(index), reader.get_frame_index(index))
+        assert np.array_equal(stored.get_frame(0.25), reader.get_frame(0.25))
+
+    gray = store.open_asset(template_video, pix_fmt="gray")
+    assert gray.get_frame(0).shape == (48, 64)
+
+def test_entry_is_reused(template_video, store, monkeypatch):
+    """A second open maps the existing entry instead of decoding again."""
+    store.open_asset(template_video)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("asset decoded twice")
+
+    monkeypatch.setattr("app.services.template_store.FrameReader", fail)
+    assert isinstance(store.open_asset(template_video), StoredFrames)
+
+def test_lru_eviction(store):
+    """Least recently used entries are evicted once the store is over budget."""
+    store.max_bytes = 2500
+    meta = {"fps": 24, "duration": 1, "size": [10, 10]}
+    for i, key in enumerate(["a", "b"]):
+        store.get_or_build(key, (10, 10, 10), lambda frames: frames.fill(i), meta)
+    # Touch "a" so "b" becomes the oldest entry.
+    os.utime(os.path.join(store.cache_dir, "b.json"), (0, 0))
+    store.get_or_build("c", (10, 10, 10), lambda frames: frames.fill(2), meta)
+
+    remaining = sorted(name for name in os.listdir(store.cache_dir) if name.endswith(".frames"))
+    assert remaining == ["a.frames", "c.frames"]
+
+def test_store_can_be_disabled(template_video, monkeypatch):
+    """TEMPLATE_STORE=off falls back to sequential decoding."""
+    monkeypatch.setenv("TEMPLATE_STORE", "off")
+    reader = open_template_asset(template_video)
+    assert isinstance(reader, FrameReader)
+    reader.close()
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from app.services.effects import tiling
+from app.services.effects.frame_pool import FramePool
+from app.services.effects.blur_effect import gaussian_blur, tiled_gaussian_blur
+from app.services.scene_processor import apply_effect_chain
+
+@pytest.fixture
+def context(effect_context):
+    return effect_context()
+
+def test_stripe_bounds():
+    assert tiling.stripe_bounds(10, 1) == [(0, 10)]
+    assert tiling.stripe_bounds(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    # Aligned stripes start on multiples of align; empty ones are dropped.
+    assert tiling.stripe_bounds(100, 3, align=16) == [(0, 32), (32, 64), (64, 100)]
+    assert tiling.stripe_bounds(8, 4, align=16) == [(0, 8)]
+
+def test_stripe_count(monkeypatch):
+    monkeypatch.delenv(tiling.TILE_STRIPES_ENV, raising=False)
+    monkeypatch.setattr(tiling, "cpu_limit", lambda: 8)
+    assert tiling.stripe_count((2160, 3840, 3)) == 8
+    assert tiling.stripe_count((64, 96, 3)) == 1
+    # Stripes keep enough rows for their halo.
+    assert tiling.stripe_count((2160, 3840, 3), halo=135) == 4
+    assert tiling.stripe_count((64, 96, 3), {"tile_stripes": 4}) == 4
+    # A render sharing the CPUs with others tiles over its share only.
+    assert tiling.stripe_count((2160, 3840, 3), {"tile_cpus": 2}) == 2
+    monkeypatch.setenv(tiling.TILE_STRIPES_ENV, "3")
+    assert tiling.stripe_count((2160, 3840, 3)) == 3
+    assert tiling.stripe_count((2160, 3840, 3), {"tile_stripes": 1}) == 1
+
+def test_run_stripes_raises_stripe_errors():
+    def fail(y0, y1, stripe_context):
+        if y0:
+            raise ValueError("stripe failed")
+
+    with pytest.raises(ValueError, match="stripe failed"):
+        tiling.run_stripes(fail, 64, 4)
+
+@pytest.mark.parametrize("sigma", [1.5, 7.0, 24.0])
+@pytest.mark.parametrize("stripes", [2, 5])
+def test_tiled_blur_matches_untiled(sigma, stripes):
+    """Halo rows make every stripe of the blur exact, pyramid blurs included."""
+    frame = np.random.default_rng(1).integers(0, 256, (203, 150, 3), dtype=np.uint8)
+    expected = gaussian_blur(frame, sigma)
+    context = {"tile_stripes": stripes, "frame_pool": FramePool((150, 203))}
+    assert np.array_equal(tiled_gaussian_blur(frame, sigma, context), expected)
+    in_place = frame.copy()
+    assert np.array_equal(tiled_gaussian_blur(in_place, sigma, context, out=in_place), expected)
+
+@pytest.mark.parametrize("pooled", [False, True])
+def test_tiled_chain_matches_untiled(context, pooled):
+    """Effects split into stripes render exactly the untiled frame."""
+    chain = [
+        {"effect": "corner_pin", "params": {"use_mask": True, "blur_enabled": True, "blur_sigma": 2}},
+        {"effect": "reflections", "params": {"opacity": 0.5, "blend_mode": "overlay"}},
+        {"effect": "screen_glow", "params": {"blur_sigma": 1.5}},
+    ]
+    expected = apply_effect_chain(0.0, dict(context, tile_stripes=1), chain)
+
+    tiled = dict(context, tile_stripes=5)
+    if pooled:
+        tiled["frame_pool"] = FramePool(context["output_size"], ring_size=2)
+    assert np.array_equal(apply_effect_chain(0.0, tiled, chain), expected)
+    assert np.array_equal(apply_effect_chain(0.0, tiled, chain), expected)
@@ -131,4 +131,57 @@ def test_audio_handling(temp_video_files):
         if os.path.exists(audio_path):
             os.remove(audio_path)
         if os.path.exists(output_path):
-            os.remove(output_path) 
\ No newline at end of file
+            os.remove(output_path) 
+
+def test_stream_copy_for_compatible_inputs(temp_video_files, monkeypatch):
+    """Compatible scene files are remuxed rather than re-encoded."""
+    import app.services.timeline_assembler as timeline_assembler
+
+    def fail_reencode(*args, **kwargs):
+        raise AssertionError("compatible inputs should not be decoded")
+
+    monkeypatch.setattr(timeline_assembler.mpy, "VideoFileClip", fail_reencode)
+    output_path = os.path.join(tempfile.gettempdir(), "output_copy_test.mp4")
+    
+    try:
+        assemble_timeline(temp_video_files, output_path)
+        monkeypatch.undo()
+        
+        output_clip = mpy.VideoFileClip(output_path)
+        assert tuple(output_clip.size) == (640, 480)
+        assert output_clip.duration == pytest.approx(3.0, abs=0.05)
+        output_clip.close()
+        
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_reencode_when_probe_unavailable(temp_video_files, monkeypatch):
+    """Without ffprobe the assembler falls back to the MoviePy re-encode."""
+    import app.services.timeline_assembler as timeline_assembler
+
+    monkeypatch.setattr(timeline_assembler, "probe_streams", lambda fp: None)
+    output_path = os.path.join(tempfile.gettempdir(), "output_fallback_test.mp4")
+    
+    try:
+        assemble_timeline(temp_video_files, output_path)
+        assert os.path.exists(output_path)
+        
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_can_stream_copy():
+    """Any difference in the compared stream parameters disables stream copy."""
+    from app.services.timeline_assembler import can_stream_copy
+
+    video = {"codec_name": "h264", "width": 640, "height": 480, "pix_fmt": "yuv420p",
+             "time_base": "1/12288", "r_frame_rate": "24/1", "extradata": "abc"}
+    same = {"video": dict(video), "audio": None}
+    other_pix_fmt = {"video": dict(video, pix_fmt="yuv444p"), "audio": None}
+    with_audio = {"video": dict(video), "audio": {"codec_name": "aac", "sample_rate": "44100"}}
+
+    assert can_stream_copy([same, {"video": dict(video), "audio": None}])
+    assert not can_stream_copy([same, other_pix_fmt])
+    assert not can_stream_copy([same, with_audio])
+    assert not can_stream_copy([])
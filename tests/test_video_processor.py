@@ -42,4 +42,26 @@ def test_invalid_scene_timing(mock_video_path, mock_output_path, mock_scene_conf
             scene_timing={"in_frame": 100, "out_frame": 0},  # Invalid timing
             output_path=mock_output_path,
             user_video_offset=0.0
-        ) 
\ No newline at end of file
+        ) 
+
+def test_process_timeline_single_pass(mock_video_path, tmp_path):
+    """Test that several scenes render into one continuous output file."""
+    from app.services.scene_processor import process_timeline_with_effect_chains
+    import moviepy.editor as mpy
+
+    scene_config = load_mockup_config()["mockup1"]["scenes"][0]
+    scene_config = dict(scene_config, effects_chain=[
+        {"effect": "reflections", "params": {"opacity": 0.5}}
+    ])
+    scene_jobs = [
+        {"mockup_config": scene_config, "scene_timing": {"in_frame": 0, "out_frame": 6}, "user_video_offset": 0.0},
+        {"mockup_config": scene_config, "scene_timing": {"in_frame": 0, "out_frame": 6}, "user_video_offset": 0.25},
+    ]
+    output_path = tmp_path / "timeline.mp4"
+
+    process_timeline_with_effect_chains(scene_jobs, str(mock_video_path), str(output_path))
+
+    assert output_path.exists()
+    clip = mpy.VideoFileClip(str(output_path))
+    assert clip.duration == pytest.approx(0.5, abs=0.05)
+    clip.close()
@@ -80,4 +80,21 @@ def test_video_processing_error(capsys, mock_job_id, mock_template_id):
     
     # Verify error logging
     assert "video_processing_failed" in log_content
-    assert "error=" in log_content 
\ No newline at end of file
+    assert "error=" in log_content 
+
+def test_build_scene_jobs_offsets():
+    """Scene jobs carry the user video offset accumulated from earlier scenes."""
+    from app.tasks.processing_tasks import build_scene_jobs
+
+    mockup_config = {"scenes": [{"scene_id": "scene1"}, {"scene_id": "scene2"}]}
+    scenes = [
+        {"scene_id": "scene2", "in_frame": 0, "out_frame": 48},
+        {"scene_id": "scene1", "in_frame": 12, "out_frame": 36},
+    ]
+    jobs = build_scene_jobs(mockup_config, scenes)
+
+    assert [job["mockup_config"]["scene_id"] for job in jobs] == ["scene2", "scene1"]
+    assert [job["user_video_offset"] for job in jobs] == [0.0, 2.0]
+
+    with pytest.raises(ValueError):
+        build_scene_jobs(mockup_config, [{"scene_id": "missing", "in_frame": 0, "out_frame": 1}])